@@ -0,0 +1,47 @@
+"""
+Clientes AWS perezosos
+Módulo compartido por las funciones Lambda del backend (el empaquetado lo
+agrega a cada function.zip).
+
+boto3 es la parte más cara del cold start. Con LazyClient cada función
+declara sus clientes a nivel de módulo, pero boto3 recién se importa la
+primera vez que se usa uno: los caminos que no llaman a AWS (errores de
+validación, 405, batches vacíos) no lo pagan, y una vez creado el cliente
+se reutiliza en las invocaciones siguientes del contenedor.
+"""
+
+
+class LazyClient:
+    """
+    Proxy que crea el objeto real (cliente, recurso o tabla de boto3) en el
+    primer acceso a cualquiera de sus atributos
+
+    Args:
+        factory: Función sin argumentos que crea el objeto real
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+
+    def __getattr__(self, name):
+        # Solo se llama para atributos que no existen en el proxy
+        if self._instance is None:
+            self._instance = self._factory()
+        return getattr(self._instance, name)
+
+
+def lazy_resource(service_name):
+    """boto3.resource(service_name), creado en el primer uso"""
+    def factory():
+        import boto3
+        return boto3.resource(service_name)
+    return LazyClient(factory)
+
+
+def lazy_client(service_name):
+    """boto3.client(service_name), creado en el primer uso"""
+    def factory():
+        import boto3
+        return boto3.client(service_name)
+    return LazyClient(factory)
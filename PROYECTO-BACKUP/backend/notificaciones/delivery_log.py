@@ -0,0 +1,129 @@
+"""
+Registro de envíos ya realizados para la Lambda de Notificaciones
+
+SQS entrega cada mensaje al menos una vez: un reintento (fallo parcial del
+batch, timeout, visibility timeout vencido) vuelve a traer mensajes cuyos
+envíos ya salieron. Cada envío exitoso se registra con la clave
+"<messageId>:<canal>" y, antes de enviar, se consultan las claves del
+batch completo:
+1. Set en memoria del contenedor (los reintentos suelen caer en el mismo)
+2. Tabla DynamoDB con TTL (NOTIFICATION_DEDUPE_TABLE, opcional), con un
+   solo BatchGetItem por batch
+
+Si la tabla no responde se envía igual: un duplicado es preferible a una
+notificación perdida.
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger()
+
+DEDUPE_CACHE_SIZE = int(os.environ.get('DEDUPE_CACHE_SIZE', '10000'))
+
+# Debe cubrir la ventana de reintentos de la cola (maxReceiveCount x visibility timeout)
+DEDUPE_TTL_HOURS = int(os.environ.get('DEDUPE_TTL_HOURS', '48'))
+
+BATCH_GET_SIZE = 100
+BATCH_WRITE_SIZE = 25
+BATCH_MAX_RETRIES = 5
+
+
+def dedupe_key(message_id, channel):
+    """Clave de un envío (None si el record no trae messageId)"""
+    return f'{message_id}:{channel}' if message_id else None
+
+
+class DedupeStore:
+    """
+    Claves de envíos realizados, en memoria y en una tabla con TTL
+
+    Args:
+        dynamodb: Recurso DynamoDB (para la tabla)
+        table_name: Tabla con clave dedupe_key y TTL en expiry (None: solo memoria)
+        cache_size: Claves recordadas en memoria
+    """
+
+    def __init__(self, dynamodb=None, table_name=None, cache_size=DEDUPE_CACHE_SIZE):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.cache_size = cache_size
+        self._recent = OrderedDict()
+        self.stats = {'memory': 0, 'persistent': 0}
+
+    def already_sent(self, keys):
+        """
+        Claves de `keys` que ya se enviaron
+
+        Returns:
+            Set de claves (las None se ignoran)
+        """
+        keys = [k for k in dict.fromkeys(keys) if k]
+        sent = {k for k in keys if k in self._recent}
+        self.stats['memory'] += len(sent)
+
+        pending = [k for k in keys if k not in sent]
+        if pending and self.table_name:
+            try:
+                stored = self._load(pending)
+            except Exception as e:
+                logger.warning(f"Error leyendo registro de envíos: {str(e)}")
+                stored = set()
+            self.stats['persistent'] += len(stored)
+            self._remember(stored)
+            sent |= stored
+
+        return sent
+
+    def mark_sent(self, keys):
+        """Registra envíos exitosos en memoria y en la tabla"""
+        keys = [k for k in dict.fromkeys(keys) if k]
+        if not keys:
+            return
+        self._remember(keys)
+        if self.table_name:
+            try:
+                self._store(keys)
+            except Exception as e:
+                logger.warning(f"Error guardando registro de envíos: {str(e)}")
+
+    def _remember(self, keys):
+        for key in keys:
+            self._recent[key] = True
+            self._recent.move_to_end(key)
+        while len(self._recent) > self.cache_size:
+            self._recent.popitem(last=False)
+
+    def _load(self, keys):
+        """BatchGetItem (reintenta UnprocessedKeys); ignora los items vencidos"""
+        now = time.time()
+        found = set()
+        for start in range(0, len(keys), BATCH_GET_SIZE):
+            request = {self.table_name: {
+                'Keys': [{'dedupe_key': k} for k in keys[start:start + BATCH_GET_SIZE]]
+            }}
+            for attempt in range(BATCH_MAX_RETRIES + 1):
+                result = self.dynamodb.batch_get_item(RequestItems=request)
+                # El TTL de DynamoDB borra con retraso
+                found.update(item['dedupe_key'] for item in result.get('Responses', {}).get(self.table_name, [])
+                             if int(item.get('expiry', 0)) > now)
+                request = result.get('UnprocessedKeys') or {}
+                if not request:
+                    break
+                time.sleep(min(1.0, 0.05 * 2 ** attempt))
+        return found
+
+    def _store(self, keys):
+        """BatchWriteItem con TTL (reintenta UnprocessedItems)"""
+        expiry = int(time.time()) + DEDUPE_TTL_HOURS * 3600
+        requests = [{'PutRequest': {'Item': {'dedupe_key': key, 'expiry': expiry}}} for key in keys]
+        for start in range(0, len(requests), BATCH_WRITE_SIZE):
+            pending = {self.table_name: requests[start:start + BATCH_WRITE_SIZE]}
+            for attempt in range(BATCH_MAX_RETRIES + 1):
+                result = self.dynamodb.batch_write_item(RequestItems=pending)
+                pending = result.get('UnprocessedItems') or {}
+                if not pending:
+                    break
+                time.sleep(min(1.0, 0.05 * 2 ** attempt))
@@ -0,0 +1,278 @@
+"""
+Despacho de notificaciones por canal para la Lambda de Notificaciones
+
+- Plantillas por tipo de notificación e idioma (es/en), compiladas una vez
+  por contenedor; cada una tiene asunto, cuerpo (email) y texto corto
+  (SMS, push)
+- Canales intercambiables: email (SES), SMS y push (SNS) o, con
+  NOTIFICATION_TRANSPORT=local, stand-ins que solo registran el envío
+- Los envíos de todo un batch corren en un pool de hilos acotado, con un
+  límite de envíos por segundo por canal (las cuotas de SES y SMS son por
+  cuenta): el batch tarda lo que su envío más lento, no la suma
+"""
+
+import json
+import logging
+import os
+import string
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger()
+
+NOTIFY_WORKERS = int(os.environ.get('NOTIFY_WORKERS', '8'))
+DEFAULT_LANGUAGE = os.environ.get('NOTIFICATION_LANGUAGE', 'es')
+
+# Envíos por segundo por canal en cada contenedor (0: sin límite)
+CHANNEL_RATE_LIMITS = {
+    'email': float(os.environ.get('EMAIL_RATE_PER_SECOND', '14')),
+    'sms': float(os.environ.get('SMS_RATE_PER_SECOND', '20')),
+    'push': float(os.environ.get('PUSH_RATE_PER_SECOND', '50')),
+}
+
+# Campo de message['contact'] con el destinatario de cada canal
+RECIPIENT_FIELDS = {'email': 'email', 'sms': 'phone', 'push': 'push_endpoint'}
+
+TEMPLATES = {
+    'ORDER_CREATED': {
+        'es': {
+            'subject': 'DINEX - Orden $order_id confirmada',
+            'body': ('Hola,\n\nRecibimos tu orden $order_id por un total de S/ $total.\n'
+                     'Te avisaremos cuando esté en camino.\n\n'
+                     'Este es un mensaje automático del Sistema de Tracking DINEX.'),
+            'short': 'DINEX: tu orden $order_id (S/ $total) fue confirmada.',
+        },
+        'en': {
+            'subject': 'DINEX - Order $order_id confirmed',
+            'body': ('Hello,\n\nWe received your order $order_id for a total of S/ $total.\n'
+                     "We will let you know when it is on its way.\n\n"
+                     'This is an automated message from the DINEX Tracking System.'),
+            'short': 'DINEX: your order $order_id (S/ $total) was confirmed.',
+        },
+    },
+    'TRACKING_UPDATE': {
+        'es': {
+            'subject': 'DINEX - Orden $order_id: $status',
+            'body': ('Actualización de tu orden $order_id\n\n'
+                     'Estado: $status\nUbicación: $location\n\n'
+                     'Este es un mensaje automático del Sistema de Tracking DINEX.'),
+            'short': 'DINEX: orden $order_id - $status ($location).',
+        },
+        'en': {
+            'subject': 'DINEX - Order $order_id: $status',
+            'body': ('Update on your order $order_id\n\n'
+                     'Status: $status\nLocation: $location\n\n'
+                     'This is an automated message from the DINEX Tracking System.'),
+            'short': 'DINEX: order $order_id - $status ($location).',
+        },
+    },
+}
+
+STATUS_LABELS = {
+    'es': {'PENDING': 'Pendiente', 'PROCESSING': 'En preparación', 'IN_TRANSIT': 'En tránsito',
+           'OUT_FOR_DELIVERY': 'En reparto', 'DELIVERED': 'Entregado', 'CANCELLED': 'Cancelado'},
+    'en': {'PENDING': 'Pending', 'PROCESSING': 'Processing', 'IN_TRANSIT': 'In transit',
+           'OUT_FOR_DELIVERY': 'Out for delivery', 'DELIVERED': 'Delivered', 'CANCELLED': 'Cancelled'},
+}
+
+NO_LOCATION = {'es': 'Sin ubicación', 'en': 'No location'}
+
+
+def compile_templates(templates):
+    """{(tipo, idioma): {parte: string.Template}}"""
+    return {
+        (notification_type, language): {part: string.Template(text) for part, text in parts.items()}
+        for notification_type, by_language in templates.items()
+        for language, parts in by_language.items()
+    }
+
+
+# Una vez por contenedor
+COMPILED_TEMPLATES = compile_templates(TEMPLATES)
+
+
+def render(notification_type, message, language=None):
+    """
+    Textos de una notificación en el idioma pedido (o DEFAULT_LANGUAGE)
+
+    Returns:
+        Diccionario con subject, body y short
+    """
+    if (notification_type, language) not in COMPILED_TEMPLATES:
+        language = DEFAULT_LANGUAGE
+    templates = COMPILED_TEMPLATES[(notification_type, language)]
+
+    status = message.get('status', '')
+    values = {
+        'order_id': message.get('order_id', ''),
+        'total': f"{message.get('total', 0):.2f}",
+        'status': STATUS_LABELS[language].get(status, status),
+        'location': message.get('location') or NO_LOCATION[language],
+    }
+    return {part: template.safe_substitute(values) for part, template in templates.items()}
+
+
+class RateLimiter:
+    """
+    Token bucket compartido por los hilos del pool
+
+    Args:
+        rate: Envíos por segundo (ráfagas de hasta `rate` envíos)
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Espera hasta que haya un envío disponible"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class LogChannel:
+    """Stand-in local de un canal: registra el envío en el log, sin AWS"""
+
+    def __init__(self, name):
+        self.name = name
+
+    def send(self, recipient, rendered):
+        logger.info(f"[{self.name}] {recipient}: {rendered['subject']}")
+        return f'local-{self.name}'
+
+
+class SESEmailChannel:
+    """Email con SES"""
+
+    def __init__(self, client, source):
+        self.client = client
+        self.source = source
+
+    def send(self, recipient, rendered):
+        result = self.client.send_email(
+            Source=self.source,
+            Destination={'ToAddresses': [recipient]},
+            Message={
+                'Subject': {'Data': rendered['subject'], 'Charset': 'UTF-8'},
+                'Body': {'Text': {'Data': rendered['body'], 'Charset': 'UTF-8'}}
+            }
+        )
+        return result['MessageId']
+
+
+class SNSSmsChannel:
+    """SMS transaccional con SNS"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def send(self, recipient, rendered):
+        result = self.client.publish(
+            PhoneNumber=recipient,
+            Message=rendered['short'],
+            MessageAttributes={
+                'AWS.SNS.SMS.SMSType': {'DataType': 'String', 'StringValue': 'Transactional'}
+            }
+        )
+        return result['MessageId']
+
+
+class SNSPushChannel:
+    """Push a un endpoint de aplicación móvil de SNS"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def send(self, recipient, rendered):
+        result = self.client.publish(
+            TargetArn=recipient,
+            MessageStructure='json',
+            Message=json.dumps({'default': rendered['short']})
+        )
+        return result['MessageId']
+
+
+def build_channels(transport, enabled, ses=None, sns=None, email_source=None):
+    """
+    Canales habilitados según el transporte
+
+    Args:
+        transport: 'aws' (SES/SNS) o 'local' (stand-ins que solo registran)
+        enabled: Nombres de canales a usar ('email', 'sms', 'push')
+    """
+    if transport == 'aws':
+        available = {
+            'email': lambda: SESEmailChannel(ses, email_source),
+            'sms': lambda: SNSSmsChannel(sns),
+            'push': lambda: SNSPushChannel(sns),
+        }
+    else:
+        available = {name: (lambda name=name: LogChannel(name)) for name in RECIPIENT_FIELDS}
+    return {name: available[name]() for name in enabled if name in available}
+
+
+class Dispatcher:
+    """
+    Envía notificaciones por todos los canales con destinatario, en paralelo
+
+    Args:
+        channels: {nombre: canal con send(recipient, rendered)}
+        workers: Hilos del pool (compartido por todo el batch)
+        rate_limits: {canal: envíos por segundo}
+    """
+
+    def __init__(self, channels, workers=NOTIFY_WORKERS, rate_limits=None):
+        self.channels = channels
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='notify')
+        rate_limits = CHANNEL_RATE_LIMITS if rate_limits is None else rate_limits
+        self.limiters = {name: RateLimiter(rate) for name, rate in rate_limits.items() if rate > 0}
+
+    def dispatch(self, notification_type, message, skip=()):
+        """
+        Encola un envío por canal con destinatario en message['contact']
+
+        Args:
+            skip: Canales que no se usan (ej: ya enviados en un intento anterior)
+
+        Returns:
+            Lista de (canal, future); el future devuelve el id del envío o
+            levanta la excepción del canal
+        """
+        contact = message.get('contact') or {}
+        recipients = [(name, contact.get(RECIPIENT_FIELDS[name])) for name in self.channels
+                      if name not in skip]
+        recipients = [(name, recipient) for name, recipient in recipients if recipient]
+        if not recipients:
+            logger.info(f"{notification_type} {message.get('order_id')}: sin datos de contacto")
+            return []
+
+        rendered = render(notification_type, message, message.get('language'))
+        return [(name, self.executor.submit(self._send, name, recipient, rendered))
+                for name, recipient in recipients]
+
+    def _send(self, name, recipient, rendered):
+        limiter = self.limiters.get(name)
+        if limiter is not None:
+            limiter.acquire()
+        return self.channels[name].send(recipient, rendered)
+
+
+def delivery_errors(deliveries):
+    """Espera los envíos y devuelve [(canal, excepción)] de los que fallaron"""
+    errors = []
+    for name, future in deliveries:
+        error = future.exception()
+        if error is not None:
+            errors.append((name, error))
+    return errors
@@ -1,6 +1,23 @@
 """
 Lambda Function: Notificaciones
 Procesa mensajes desde SQS y envía notificaciones a clientes
+
+Cada mensaje del batch se procesa por separado y la respuesta informa solo
+los que fallaron (batchItemFailures, ReportBatchItemFailures en el event
+source mapping): SQS reintenta esos y borra el resto, en vez de reenviar el
+batch completo.
+
+Los mensajes que nunca se van a poder procesar (JSON inválido, campos
+faltantes) se mueven de inmediato a DEAD_LETTER_QUEUE en vez de reintentarse
+hasta agotar maxReceiveCount.
+
+Los envíos (email, SMS, push) salen por dispatch.py: los de todo el batch
+corren en paralelo y el handler espera al final para saber qué mensajes
+fallaron.
+
+Cada envío exitoso queda registrado (delivery_log.py): si SQS vuelve a entregar
+un mensaje, sus canales ya enviados se saltan y solo se reintentan los que
+fallaron.
 """
 
 import json
@@ -8,10 +25,42 @@ import os
 import logging
 from datetime import datetime
 
+import delivery_log
+import dispatch
+from lazy_clients import lazy_client, lazy_resource
+
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
+# Clientes AWS (se crean en el primer uso)
+dynamodb = lazy_resource('dynamodb')
+sqs = lazy_client('sqs')
+ses = lazy_client('ses')
+sns = lazy_client('sns')
+
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'dev')
+DEAD_LETTER_QUEUE = os.environ.get('DEAD_LETTER_QUEUE')
+NOTIFICATION_DEDUPE_TABLE = os.environ.get('NOTIFICATION_DEDUPE_TABLE')
+
+# 'aws': SES y SNS; 'local': stand-ins que solo registran el envío
+NOTIFICATION_TRANSPORT = os.environ.get('NOTIFICATION_TRANSPORT', 'local')
+NOTIFICATION_CHANNELS = os.environ.get('NOTIFICATION_CHANNELS', 'email,sms,push').split(',')
+EMAIL_SOURCE = os.environ.get('EMAIL_SOURCE', 'notificaciones@dinex.pe')
+
+# Campos sin los cuales un tipo de notificación no se puede enviar
+REQUIRED_FIELDS = {
+    'ORDER_CREATED': ('order_id', 'customer_id'),
+    'TRACKING_UPDATE': ('order_id', 'status'),
+}
+
+
+class InvalidNotification(ValueError):
+    """Mensaje que no se podrá procesar nunca: reintentarlo no sirve"""
+
+
+dispatcher = dispatch.Dispatcher(dispatch.build_channels(
+    NOTIFICATION_TRANSPORT, NOTIFICATION_CHANNELS, ses=ses, sns=sns, email_source=EMAIL_SOURCE))
+sent_registry = delivery_log.DedupeStore(dynamodb=dynamodb, table_name=NOTIFICATION_DEDUPE_TABLE)
 
 
 def handler(event, context):
@@ -22,98 +71,194 @@ def handler(event, context):
     - Eventos de creación de órdenes
     - Actualizaciones de tracking
     - Alertas del sistema
+
+    Returns:
+        Respuesta con batchItemFailures: los messageId que SQS debe
+        reintentar (vacío si todo el batch se procesó)
     """
 
     logger.info(f"Evento recibido: {json.dumps(event)}")
 
-    try:
-        # Procesar mensajes de SQS
-        records = event.get('Records', [])
+    records = event.get('Records', [])
+    failures = []
+    quarantined = 0
+    pending = []
+    completed = []
+
+    # Envíos que ya salieron en una entrega anterior (una consulta por batch)
+    already_sent = sent_registry.already_sent(
+        delivery_log.dedupe_key(record.get('messageId'), channel)
+        for record in records for channel in dispatcher.channels
+    ) if records else set()
+
+    for record in records:
+        message_id = record.get('messageId', '')
+        fifo = record.get('eventSourceARN', '').endswith('.fifo')
+
+        # En colas FIFO, después de un fallo se devuelve el resto del batch
+        # para no entregar mensajes del mismo grupo fuera de orden
+        if failures and fifo:
+            failures.append(message_id)
+            continue
+
+        try:
+            deliveries = process_notification(record, already_sent)
+        except InvalidNotification as e:
+            logger.error(f"Mensaje inválido {message_id}: {str(e)}")
+            if quarantine(record, e):
+                quarantined += 1
+            else:
+                failures.append(message_id)
+        except Exception as e:
+            logger.error(f"Error procesando notificación {message_id}: {str(e)}", exc_info=True)
+            failures.append(message_id)
+        else:
+            # FIFO: el siguiente mensaje sale recién cuando este terminó
+            if fifo and not delivered(message_id, deliveries, completed):
+                failures.append(message_id)
+            elif not fifo:
+                pending.append((message_id, deliveries))
+
+    # Los envíos del resto del batch corren en paralelo; aquí se esperan
+    failures.extend(message_id for message_id, deliveries in pending
+                    if not delivered(message_id, deliveries, completed))
+    sent_registry.mark_sent(completed)
+
+    if failures:
+        logger.warning(f"{len(failures)} de {len(records)} mensajes vuelven a la cola")
+
+    return {
+        'statusCode': 200,
+        'body': json.dumps({
+            'message': f'{len(records) - len(failures) - quarantined} notificaciones procesadas',
+            'failed': len(failures),
+            'quarantined': quarantined
+        }),
+        'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failures]
+    }
 
-        for record in records:
-            process_notification(record)
 
-        return {
-            'statusCode': 200,
-            'body': json.dumps({
-                'message': f'{len(records)} notificaciones procesadas'
-            })
-        }
+def delivered(message_id, deliveries, completed):
+    """
+    Espera los envíos de un mensaje y agrega a `completed` las claves de los
+    que salieron
 
+    Returns:
+        False si algún envío falló
+    """
+    errors = dispatch.delivery_errors(deliveries)
+    for channel, error in errors:
+        logger.error(f"Error enviando {message_id} por {channel}: {str(error)}")
+
+    failed = {channel for channel, _ in errors}
+    completed.extend(delivery_log.dedupe_key(message_id, channel)
+                     for channel, _ in deliveries if channel not in failed)
+    return not errors
+
+
+def quarantine(record, error):
+    """
+    Mover un mensaje inválido a la DLQ, con el motivo como atributo
+
+    Returns:
+        True si quedó en la DLQ (se puede borrar de la cola); False si no
+        hay DLQ configurada o el envío falló, y el mensaje debe reintentarse
+        (la redrive policy lo moverá al agotar maxReceiveCount)
+    """
+    if not DEAD_LETTER_QUEUE:
+        return False
+
+    try:
+        sqs.send_message(
+            QueueUrl=DEAD_LETTER_QUEUE,
+            MessageBody=record.get('body') or '',
+            MessageAttributes={
+                'error': {'DataType': 'String', 'StringValue': str(error)[:256]},
+                'source_message_id': {'DataType': 'String', 'StringValue': record.get('messageId') or '-'}
+            }
+        )
+        return True
     except Exception as e:
-        logger.error(f"Error procesando notificaciones: {str(e)}", exc_info=True)
-        # En caso de error, el mensaje volverá a la cola
-        raise
+        logger.error(f"Error enviando mensaje a la DLQ: {str(e)}")
+        return False
 
 
-def process_notification(record):
-    """Procesar una notificación individual"""
+def parse_notification(record):
+    """
+    Parsear y validar el cuerpo de un mensaje
 
+    Raises:
+        InvalidNotification: Si el cuerpo no es un objeto JSON o le faltan
+            campos obligatorios de su tipo
+    """
     try:
-        # Parsear mensaje
         message_body = json.loads(record['body'])
-        notification_type = message_body.get('type', 'UNKNOWN')
+    except (KeyError, TypeError, json.JSONDecodeError) as e:
+        raise InvalidNotification(f'JSON inválido: {str(e)}')
 
-        logger.info(f"Procesando notificación tipo: {notification_type}")
+    if not isinstance(message_body, dict):
+        raise InvalidNotification('El mensaje no es un objeto JSON')
 
-        # Aquí iría la lógica para enviar notificaciones reales
-        # Por ejemplo: Email con SES, SMS con SNS, Push notifications, etc.
+    missing = [field for field in REQUIRED_FIELDS.get(message_body.get('type'), ())
+               if message_body.get(field) in (None, '')]
+    if missing:
+        raise InvalidNotification(f"Faltan campos: {', '.join(missing)}")
 
-        if notification_type == 'ORDER_CREATED':
-            send_order_confirmation(message_body)
-        elif notification_type == 'TRACKING_UPDATE':
-            send_tracking_update(message_body)
-        else:
-            logger.warning(f"Tipo de notificación desconocido: {notification_type}")
+    total = message_body.get('total', 0)
+    if isinstance(total, bool) or not isinstance(total, (int, float)):
+        raise InvalidNotification(f'total no es numérico: {total!r}')
 
-        logger.info(f"Notificación procesada exitosamente: {notification_type}")
+    return message_body
 
-    except json.JSONDecodeError as e:
-        logger.error(f"Error parseando mensaje: {str(e)}")
-        raise
-    except Exception as e:
-        logger.error(f"Error procesando notificación: {str(e)}")
-        raise
 
+def process_notification(record, already_sent=frozenset()):
+    """
+    Procesar una notificación individual
+
+    Args:
+        record: Record de SQS
+        already_sent: Claves de envíos ya realizados (ver delivery_log.py)
+
+    Returns:
+        Envíos encolados [(canal, future)] (ver dispatch.Dispatcher)
+    """
 
-def send_order_confirmation(message):
-    """Enviar confirmación de orden creada"""
+    message_body = parse_notification(record)
+    notification_type = message_body.get('type', 'UNKNOWN')
 
-    order_id = message.get('order_id')
-    customer_id = message.get('customer_id')
-    total = message.get('total', 0)
+    skip = {channel for channel in dispatcher.channels
+            if delivery_log.dedupe_key(record.get('messageId'), channel) in already_sent}
+    if skip:
+        logger.info(f"{record.get('messageId')}: ya enviado por {', '.join(sorted(skip))}")
 
-    # Simulación de envío de notificación
-    logger.info(f"📧 Enviando confirmación de orden a cliente {customer_id}")
-    logger.info(f"   Orden: {order_id}")
-    logger.info(f"   Total: ${total:.2f}")
+    logger.info(f"Procesando notificación tipo: {notification_type}")
 
-    # En producción, usar AWS SES para enviar email:
-    # ses = boto3.client('ses')
-    # ses.send_email(...)
+    # Aquí iría la lógica para enviar notificaciones reales
+    # Por ejemplo: Email con SES, SMS con SNS, Push notifications, etc.
 
-    # O SNS para SMS:
-    # sns = boto3.client('sns')
-    # sns.publish(PhoneNumber=customer_phone, Message=message)
+    if notification_type == 'ORDER_CREATED':
+        return send_order_confirmation(message_body, skip)
+    if notification_type == 'TRACKING_UPDATE':
+        return send_tracking_update(message_body, skip)
 
-    return True
+    logger.warning(f"Tipo de notificación desconocido: {notification_type}")
+    return []
 
 
-def send_tracking_update(message):
-    """Enviar actualización de tracking"""
+def send_order_confirmation(message, skip=()):
+    """Enviar confirmación de orden creada (salvo por los canales en `skip`)"""
 
-    order_id = message.get('order_id')
-    status = message.get('status')
-    location = message.get('location', 'Sin ubicación')
+    logger.info(f"📧 Enviando confirmación de orden {message.get('order_id')} "
+                f"a cliente {message.get('customer_id')}")
+    return dispatcher.dispatch('ORDER_CREATED', message, skip)
 
-    logger.info(f"📍 Enviando actualización de tracking")
-    logger.info(f"   Orden: {order_id}")
-    logger.info(f"   Estado: {status}")
-    logger.info(f"   Ubicación: {location}")
 
-    # Aquí iría la lógica real de notificación
+def send_tracking_update(message, skip=()):
+    """Enviar actualización de tracking (salvo por los canales en `skip`)"""
 
-    return True
+    logger.info(f"📍 Enviando actualización de tracking de {message.get('order_id')}: "
+                f"{message.get('status')}")
+    return dispatcher.dispatch('TRACKING_UPDATE', message, skip)
 
 
 # Para testing local
@@ -122,11 +267,13 @@ if __name__ == '__main__':
     test_event = {
         'Records': [
             {
+                'messageId': 'msg-local-1',
                 'body': json.dumps({
                     'type': 'ORDER_CREATED',
                     'order_id': 'ORD-TEST123',
                     'customer_id': 'CUST001',
-                    'total': 150.00
+                    'total': 150.00,
+                    'contact': {'email': 'cliente@example.com', 'phone': '+51999888777'}
                 })
             }
         ]
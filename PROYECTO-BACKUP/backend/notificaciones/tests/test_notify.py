@@ -0,0 +1,265 @@
+"""
+Tests unitarios para la función Lambda de Notificaciones
+"""
+
+import json
+import threading
+import time
+import pytest
+import sys
+import os
+
+# Configurar path para importar el módulo y los compartidos (backend/common)
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'common'))
+
+# Mock de variables de entorno
+os.environ['ENVIRONMENT'] = 'test'
+
+# Importar después de configurar env vars
+import delivery_log
+import dispatch
+import notify
+
+
+class FakeChannel:
+    """Canal que registra los envíos; falla para los destinatarios en `failing`"""
+
+    def __init__(self, delay=0.0, failing=()):
+        self.delay = delay
+        self.failing = set(failing)
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def send(self, recipient, rendered):
+        time.sleep(self.delay)
+        if recipient in self.failing:
+            raise ConnectionError('timeout')
+        with self.lock:
+            self.sent.append((recipient, rendered))
+        return f'msg-{recipient}'
+
+
+class FakeDynamoDB:
+    """batch_get_item / batch_write_item sobre un diccionario"""
+
+    def __init__(self):
+        self.items = {}
+        self.reads = 0
+
+    def batch_get_item(self, RequestItems):
+        self.reads += 1
+        (name, request), = RequestItems.items()
+        found = [self.items[k['dedupe_key']] for k in request['Keys'] if k['dedupe_key'] in self.items]
+        return {'Responses': {name: found}}
+
+    def batch_write_item(self, RequestItems):
+        for requests in RequestItems.values():
+            for request in requests:
+                item = request['PutRequest']['Item']
+                self.items[item['dedupe_key']] = item
+        return {}
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    """Cada test empieza sin envíos registrados"""
+    monkeypatch.setattr('notify.sent_registry', delivery_log.DedupeStore())
+
+
+def use_channels(monkeypatch, **channels):
+    monkeypatch.setattr('notify.dispatcher', dispatch.Dispatcher(channels, rate_limits={}))
+
+
+def sqs_record(message_id, body, source='arn:aws:sqs:us-east-1:000000000000:notifications'):
+    return {
+        'messageId': message_id,
+        'eventSourceARN': source,
+        'body': body if isinstance(body, str) else json.dumps(body)
+    }
+
+
+ORDER = {'type': 'ORDER_CREATED', 'order_id': 'ORD-1', 'customer_id': 'CUST001', 'total': 150.0,
+         'contact': {'email': 'ord-1@example.com'}}
+
+
+def order(n):
+    return dict(ORDER, order_id=f'ORD-{n}', contact={'email': f'ord-{n}@example.com'})
+
+
+class TestBatchFailures:
+    """Tests para el reporte parcial de fallos del batch de SQS"""
+
+    def test_only_failed_messages_are_reported(self, monkeypatch):
+        """Test: Un envío que falla no hace reintentar los mensajes que ya salieron"""
+
+        email = FakeChannel(failing={'ord-2@example.com'})
+        use_channels(monkeypatch, email=email)
+
+        event = {'Records': [sqs_record(f'msg-{n}', order(n)) for n in range(1, 4)]}
+        result = notify.handler(event, None)
+
+        assert result['batchItemFailures'] == [{'itemIdentifier': 'msg-2'}]
+        assert sorted(recipient for recipient, _ in email.sent) == ['ord-1@example.com', 'ord-3@example.com']
+        assert json.loads(result['body'])['failed'] == 1
+
+    def test_poison_messages_go_to_dead_letter_queue(self, monkeypatch):
+        """Test: Un mensaje inválido se mueve a la DLQ y no se reintenta"""
+
+        moved = []
+        use_channels(monkeypatch, email=FakeChannel())
+        monkeypatch.setattr('notify.DEAD_LETTER_QUEUE', 'https://sqs.test/notifications-dlq')
+        monkeypatch.setattr('notify.sqs', type('FakeSQS', (), {
+            'send_message': staticmethod(lambda **kwargs: moved.append(kwargs))})())
+
+        event = {'Records': [
+            sqs_record('msg-1', '{no es json'),
+            sqs_record('msg-2', {'type': 'TRACKING_UPDATE', 'order_id': 'ORD-1'}),
+            sqs_record('msg-3', ORDER),
+        ]}
+        result = notify.handler(event, None)
+
+        assert result['batchItemFailures'] == []
+        assert [m['MessageAttributes']['source_message_id']['StringValue'] for m in moved] == ['msg-1', 'msg-2']
+        assert 'status' in moved[1]['MessageAttributes']['error']['StringValue']
+        assert json.loads(result['body'])['quarantined'] == 2
+
+    def test_poison_messages_retry_without_dead_letter_queue(self, monkeypatch):
+        """Test: Sin DLQ configurada, el mensaje inválido queda a cargo de la redrive policy"""
+
+        monkeypatch.setattr('notify.DEAD_LETTER_QUEUE', None)
+        use_channels(monkeypatch, email=FakeChannel())
+
+        event = {'Records': [sqs_record('msg-1', dict(ORDER, total='150')), sqs_record('msg-2', ORDER)]}
+        result = notify.handler(event, None)
+
+        assert result['batchItemFailures'] == [{'itemIdentifier': 'msg-1'}]
+
+    def test_fifo_returns_rest_of_batch_after_failure(self, monkeypatch):
+        """Test: En colas FIFO los mensajes posteriores al fallo también vuelven, en orden"""
+
+        email = FakeChannel(failing={'ord-2@example.com'})
+        use_channels(monkeypatch, email=email)
+
+        fifo = 'arn:aws:sqs:us-east-1:000000000000:notifications.fifo'
+        event = {'Records': [sqs_record(f'msg-{n}', order(n), source=fifo) for n in range(1, 4)]}
+        result = notify.handler(event, None)
+
+        assert [recipient for recipient, _ in email.sent] == ['ord-1@example.com']
+        assert result['batchItemFailures'] == [{'itemIdentifier': 'msg-2'}, {'itemIdentifier': 'msg-3'}]
+
+
+class TestDispatch:
+    """Tests para plantillas, canales y envío concurrente"""
+
+    def test_templates_are_localized(self):
+        """Test: Las plantillas se eligen por idioma, con español por defecto"""
+
+        message = {'order_id': 'ORD-1', 'status': 'IN_TRANSIT', 'location': 'Surco'}
+
+        spanish = dispatch.render('TRACKING_UPDATE', message)
+        assert spanish['short'] == 'DINEX: orden ORD-1 - En tránsito (Surco).'
+
+        english = dispatch.render('TRACKING_UPDATE', dict(message, location=None), 'en')
+        assert english['subject'] == 'DINEX - Order ORD-1: In transit'
+        assert 'No location' in english['body']
+
+        assert dispatch.render('ORDER_CREATED', {'order_id': 'ORD-2', 'total': 80}, 'fr')['short'] == \
+            'DINEX: tu orden ORD-2 (S/ 80.00) fue confirmada.'
+
+    def test_batch_sends_run_concurrently(self, monkeypatch):
+        """Test: Un batch de 10 mensajes tarda lo que su envío más lento"""
+
+        email, sms = FakeChannel(delay=0.2), FakeChannel(delay=0.2)
+        monkeypatch.setattr('notify.dispatcher', dispatch.Dispatcher(
+            {'email': email, 'sms': sms}, workers=20, rate_limits={}))
+
+        records = [sqs_record(f'msg-{n}', dict(order(n), contact={'email': f'ord-{n}@example.com',
+                                                                   'phone': f'+5199900{n:04d}'}))
+                   for n in range(10)]
+        start = time.monotonic()
+        result = notify.handler({'Records': records}, None)
+
+        assert time.monotonic() - start < 1.0
+        assert result['batchItemFailures'] == []
+        assert len(email.sent) == 10 and len(sms.sent) == 10
+        assert sms.sent[0][1]['short'].startswith('DINEX: tu orden')
+
+    def test_only_channels_with_recipient_are_used(self):
+        """Test: Sin teléfono no se envía SMS; sin contacto no se envía nada"""
+
+        email, sms = FakeChannel(), FakeChannel()
+        dispatcher = dispatch.Dispatcher({'email': email, 'sms': sms}, rate_limits={})
+
+        assert dispatch.delivery_errors(dispatcher.dispatch('ORDER_CREATED', ORDER)) == []
+        assert dispatcher.dispatch('ORDER_CREATED', dict(ORDER, contact=None)) == []
+        assert len(email.sent) == 1 and sms.sent == []
+
+    def test_rate_limit_per_channel(self):
+        """Test: El límite por canal espacia los envíos que superan la ráfaga"""
+
+        limiter = dispatch.RateLimiter(20)
+        start = time.monotonic()
+        for _ in range(30):
+            limiter.acquire()
+
+        # 20 de ráfaga y 10 más a 20 por segundo
+        assert time.monotonic() - start == pytest.approx(0.5, abs=0.15)
+
+
+class TestDedupe:
+    """Tests para el registro de envíos ya realizados"""
+
+    def test_redelivery_only_retries_failed_channels(self, monkeypatch):
+        """Test: Al reintentar un mensaje no se reenvían los canales que ya salieron"""
+
+        email, sms = FakeChannel(), FakeChannel(failing={'+51999000001'})
+        use_channels(monkeypatch, email=email, sms=sms)
+
+        message = dict(ORDER, contact={'email': 'ord-1@example.com', 'phone': '+51999000001'})
+        event = {'Records': [sqs_record('msg-1', message)]}
+        assert notify.handler(event, None)['batchItemFailures'] == [{'itemIdentifier': 'msg-1'}]
+
+        sms.failing.clear()
+        assert notify.handler(event, None)['batchItemFailures'] == []
+        assert len(email.sent) == 1 and len(sms.sent) == 1
+
+        # Una tercera entrega no envía nada
+        notify.handler(event, None)
+        assert len(email.sent) == 1 and len(sms.sent) == 1
+
+    def test_registry_is_shared_through_table(self, monkeypatch):
+        """Test: Otro contenedor ve los envíos en la tabla, con una lectura por batch"""
+
+        dynamodb = FakeDynamoDB()
+        email = FakeChannel()
+        use_channels(monkeypatch, email=email)
+
+        event = {'Records': [sqs_record(f'msg-{n}', order(n)) for n in range(1, 4)]}
+        monkeypatch.setattr('notify.sent_registry', delivery_log.DedupeStore(dynamodb=dynamodb, table_name='dedupe'))
+        notify.handler(event, None)
+        assert set(dynamodb.items) == {'msg-1:email', 'msg-2:email', 'msg-3:email'}
+
+        other = delivery_log.DedupeStore(dynamodb=dynamodb, table_name='dedupe')
+        monkeypatch.setattr('notify.sent_registry', other)
+        reads = dynamodb.reads
+        notify.handler(event, None)
+
+        assert len(email.sent) == 3
+        assert dynamodb.reads == reads + 1
+        assert other.stats['persistent'] == 3
+
+    def test_expired_entries_are_ignored(self):
+        """Test: Un registro vencido (aún no borrado por el TTL) no evita el envío"""
+
+        dynamodb = FakeDynamoDB()
+        dynamodb.items['msg-1:email'] = {'dedupe_key': 'msg-1:email', 'expiry': int(time.time()) - 1}
+        store = delivery_log.DedupeStore(dynamodb=dynamodb, table_name='dedupe')
+
+        assert store.already_sent(['msg-1:email', None]) == set()
+
+
+# Para ejecutar tests:
+# pytest tests/test_notify.py -v
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
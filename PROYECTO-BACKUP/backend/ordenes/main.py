@@ -5,27 +5,34 @@ Maneja la creación y consulta de órdenes de clientes
 
 import json
 import os
-import boto3
+import re
 from datetime import datetime, timedelta
 from decimal import Decimal
 import uuid
 import logging
 
+from lazy_clients import LazyClient, lazy_client, lazy_resource
+
 # Configuración de logging
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
-# Clientes AWS
-dynamodb = boto3.resource('dynamodb')
-sqs = boto3.client('sqs')
+# Clientes AWS (se crean en el primer uso)
+dynamodb = lazy_resource('dynamodb')
+sqs = lazy_client('sqs')
 
 # Variables de entorno
 ORDERS_TABLE = os.environ.get('ORDERS_TABLE')
 NOTIFICATIONS_QUEUE = os.environ.get('NOTIFICATIONS_QUEUE')
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'dev')
 
+# Minutos de atención en la puerta cuando la orden no indica service_minutes
+DEFAULT_SERVICE_MINUTES = int(os.environ.get('DEFAULT_SERVICE_MINUTES', '5'))
+
+TIME_OF_DAY = re.compile(r'^([01]\d|2[0-3]):([0-5]\d)$')
+
 # Tabla DynamoDB
-orders_table = dynamodb.Table(ORDERS_TABLE)
+orders_table = LazyClient(lambda: dynamodb.Table(ORDERS_TABLE))
 
 
 class DecimalEncoder(json.JSONEncoder):
@@ -78,6 +85,10 @@ def create_order(event):
         if not body.get('products') or len(body['products']) == 0:
             return response(400, {'error': 'products es requerido y debe contener al menos un producto'})
 
+        delivery_window, service_minutes, error = parse_delivery_window(body)
+        if error:
+            return response(400, {'error': error})
+
         # Generar ID de orden
         order_id = f"ORD-{str(uuid.uuid4())[:8].upper()}"
         timestamp = datetime.utcnow().isoformat()
@@ -98,25 +109,34 @@ def create_order(event):
             'customer_id': body['customer_id'],
             'products': body['products'],
             'delivery_address': body.get('delivery_address', ''),
+            'service_minutes': service_minutes,
             'status': 'PENDING',
             'total': Decimal(str(total)),
             'ttl': ttl,
             'environment': ENVIRONMENT
         }
 
+        if delivery_window:
+            order['delivery_window'] = delivery_window
+
         # Guardar en DynamoDB
         orders_table.put_item(Item=order)
 
         logger.info(f"Orden creada exitosamente: {order_id}")
 
-        # Enviar notificación a SQS
+        # Enviar notificación a SQS (contact y language eligen canales e idioma)
+        notification = {
+            'type': 'ORDER_CREATED',
+            'order_id': order_id,
+            'customer_id': body['customer_id'],
+            'total': float(total)
+        }
+        for field in ('contact', 'language'):
+            if body.get(field):
+                notification[field] = body[field]
+
         try:
-            send_notification({
-                'type': 'ORDER_CREATED',
-                'order_id': order_id,
-                'customer_id': body['customer_id'],
-                'total': float(total)
-            })
+            send_notification(notification)
         except Exception as e:
             logger.warning(f"No se pudo enviar notificación: {str(e)}")
 
@@ -134,6 +154,36 @@ def create_order(event):
         return response(500, {'error': 'Error creando orden', 'detail': str(e)})
 
 
+def parse_delivery_window(body):
+    """
+    Validar la ventana de entrega y el tiempo de atención de una orden
+
+    delivery_window es opcional: {"start": "HH:MM", "end": "HH:MM"} en hora
+    local del día de reparto. service_minutes son los minutos que el
+    conductor pasa en la parada.
+
+    Returns:
+        Tupla (ventana o None, minutos de atención, mensaje de error o None)
+    """
+    service_minutes = body.get('service_minutes', DEFAULT_SERVICE_MINUTES)
+    if isinstance(service_minutes, bool) or not isinstance(service_minutes, int) \
+            or not 0 <= service_minutes <= 240:
+        return None, None, 'service_minutes debe ser un entero entre 0 y 240'
+
+    window = body.get('delivery_window')
+    if window is None:
+        return None, service_minutes, None
+
+    if not isinstance(window, dict) or not all(
+            TIME_OF_DAY.match(str(window.get(key, ''))) for key in ('start', 'end')):
+        return None, None, 'delivery_window requiere start y end en formato HH:MM'
+
+    if window['start'] >= window['end']:
+        return None, None, 'delivery_window.start debe ser anterior a delivery_window.end'
+
+    return {'start': window['start'], 'end': window['end']}, service_minutes, None
+
+
 def get_orders(event):
     """Obtener órdenes"""
 
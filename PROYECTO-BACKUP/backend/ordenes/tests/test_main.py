@@ -7,8 +7,9 @@ import pytest
 import sys
 import os
 
-# Configurar path para importar el módulo
+# Configurar path para importar el módulo y los compartidos (backend/common)
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'common'))
 
 # Mock de variables de entorno
 os.environ['ORDERS_TABLE'] = 'test-orders-table'
@@ -74,6 +75,28 @@ class TestOrdersLambda:
         body = json.loads(response['body'])
         assert 'error' in body
 
+    def test_create_order_with_delivery_window(self, monkeypatch):
+        """Test: La ventana de entrega y el tiempo de atención se guardan; ventanas inválidas dan 400"""
+
+        saved = {}
+        monkeypatch.setattr('main.orders_table.put_item', lambda **kwargs: saved.update(kwargs['Item']))
+        monkeypatch.setattr('main.sqs.send_message', lambda **kwargs: {'MessageId': '123'})
+
+        def create(**fields):
+            body = {'customer_id': 'CUST001', 'products': [{'sku': 'PROD123', 'quantity': 1}]}
+            body.update(fields)
+            return main.handler({'httpMethod': 'POST', 'body': json.dumps(body)}, None)
+
+        response = create(delivery_window={'start': '09:00', 'end': '12:30'}, service_minutes=10)
+
+        assert response['statusCode'] == 201
+        assert saved['delivery_window'] == {'start': '09:00', 'end': '12:30'}
+        assert saved['service_minutes'] == 10
+
+        assert create(delivery_window={'start': '14:00', 'end': '09:00'})['statusCode'] == 400
+        assert create(delivery_window={'start': '9am', 'end': '12:00'})['statusCode'] == 400
+        assert create(service_minutes=-5)['statusCode'] == 400
+
     def test_create_order_invalid_json(self):
         """Test: Error con JSON inválido"""
 
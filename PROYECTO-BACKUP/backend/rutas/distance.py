@@ -0,0 +1,126 @@
+"""
+Motor de distancias para la Lambda de Optimización de Rutas
+
+Distancias de gran círculo (haversine) en kilómetros, calculadas por lotes
+con NumPy. Se construye un DistanceEngine por request y lo reutilizan la
+construcción de la ruta, la búsqueda local y el reporte de distancia total:
+- Hasta MATRIX_MAX_STOPS paradas se precalcula la matriz completa y cada
+  consulta es un acceso a lista
+- Con más paradas la matriz ocuparía demasiada memoria: las listas de
+  vecinos salen de candidatos del índice de grilla evaluados en un solo
+  lote, y el resto de las distancias se calcula al vuelo
+"""
+
+import math
+import os
+
+import numpy as np
+
+import solver
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Con 1000 paradas la matriz como listas de Python ocupa ~32 MB
+MATRIX_MAX_STOPS = int(os.environ.get('DISTANCE_MATRIX_MAX_STOPS', '1000'))
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """
+    Distancia haversine en km entre arreglos de coordenadas en radianes
+    (admite broadcasting de NumPy)
+    """
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def path_length(coords):
+    """Largo en km del camino que recorre `coords` [(lat, lng), ...] en orden"""
+    if len(coords) < 2:
+        return 0.0
+    radians = np.radians(np.asarray(coords, dtype=float))
+    return float(haversine(radians[:-1, 0], radians[:-1, 1], radians[1:, 0], radians[1:, 1]).sum())
+
+
+class DistanceEngine:
+    """
+    Distancias entre las paradas de un request
+
+    Args:
+        coords: Lista de (lat, lng) en grados
+    """
+
+    def __init__(self, coords):
+        coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        self.size = len(coords)
+        self.lat = np.radians(coords[:, 0])
+        self.lng = np.radians(coords[:, 1])
+        self.matrix = None
+
+        if self.size <= MATRIX_MAX_STOPS:
+            self.matrix = haversine(self.lat[:, None], self.lng[:, None],
+                                    self.lat[None, :], self.lng[None, :])
+            rows = self.matrix.tolist()
+            self.dist = lambda i, j: rows[i][j]
+        else:
+            self._lat_list = self.lat.tolist()
+            self._lng_list = self.lng.tolist()
+            self._cos_list = np.cos(self.lat).tolist()
+            self.dist = self._haversine_pair
+
+    def _haversine_pair(self, i, j):
+        """Distancia entre dos paradas sin NumPy (más rápido para un solo par)"""
+        lat, lng, cos = self._lat_list, self._lng_list, self._cos_list
+        a = (math.sin((lat[j] - lat[i]) / 2) ** 2
+             + cos[i] * cos[j] * math.sin((lng[j] - lng[i]) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+    def planar_points(self):
+        """Proyección equirectangular en km, para el índice de grilla"""
+        if not self.size:
+            return []
+        cos_ref = math.cos(float(self.lat.mean()))
+        xs = (self.lng * cos_ref * EARTH_RADIUS_KM).tolist()
+        ys = (self.lat * EARTH_RADIUS_KM).tolist()
+        return list(zip(xs, ys))
+
+    def neighbor_lists(self, k=solver.NEIGHBORS_K):
+        """
+        Los k vecinos más cercanos de cada parada, ordenados por distancia
+
+        Returns:
+            Lista de listas de índices
+        """
+        k = min(k, self.size - 1)
+        if k <= 0:
+            return [[] for _ in range(self.size)]
+
+        if self.matrix is not None:
+            candidates = np.argpartition(self.matrix, k, axis=1)[:, :k + 1]
+            distances = np.take_along_axis(self.matrix, candidates, axis=1)
+        else:
+            # Candidatos por distancia plana (el doble de los necesarios) y
+            # orden final por haversine, todo en un solo lote
+            points = self.planar_points()
+            grid = solver.GridIndex(points)
+            wanted = min(2 * k, self.size - 1)
+            candidates = np.array([grid.k_nearest(x, y, wanted, exclude=i)
+                                   for i, (x, y) in enumerate(points)])
+            distances = haversine(self.lat[:, None], self.lng[:, None],
+                                  self.lat[candidates], self.lng[candidates])
+
+        order = np.argsort(distances, axis=1, kind='stable')
+        ranked = np.take_along_axis(candidates, order, axis=1).tolist()
+
+        # La propia parada puede aparecer entre los candidatos de la matriz
+        return [[j for j in row if j != i][:k] for i, row in enumerate(ranked)]
+
+    def route_length(self, tour):
+        """Largo en km del camino tour[0] -> ... -> tour[-1]"""
+        if len(tour) < 2:
+            return 0.0
+        stops = np.asarray(tour)
+        if self.matrix is not None:
+            return float(self.matrix[stops[:-1], stops[1:]].sum())
+        return float(haversine(self.lat[stops[:-1]], self.lng[stops[:-1]],
+                               self.lat[stops[1:]], self.lng[stops[1:]]).sum())
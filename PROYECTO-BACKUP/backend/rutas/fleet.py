@@ -0,0 +1,416 @@
+"""
+Planificación de flota para la Lambda de Optimización de Rutas
+
+Reparte las órdenes de un depósito entre varios vehículos con capacidad:
+1. Partición por barrido angular alrededor del depósito (sweep), llenando
+   cada vehículo hasta su capacidad
+2. Ruta de cada vehículo con solver.solve(), en procesos paralelos
+3. Mejora entre rutas: mover una parada a otra ruta (relocate) o
+   intercambiar dos paradas de rutas distintas (swap), respetando la
+   capacidad, y 2-opt/Or-opt de nuevo en las rutas que cambiaron
+
+Con ventanas de entrega cada ruta se resuelve respetándolas (ver
+timewindows.py) y se omite el paso 3, que no verifica horarios.
+
+Nodos globales: 0 es el depósito y la parada i (índice en `coords`) es el
+nodo i + 1. Cada ruta empieza en el depósito y termina en su última entrega.
+"""
+
+import heapq
+import logging
+import math
+import multiprocessing
+import os
+import time
+import traceback
+from collections import deque
+
+import distance
+import solver
+import timewindows
+
+logger = logging.getLogger()
+
+# Procesos para resolver las rutas de los vehículos (en Lambda, los vCPU
+# dependen de la memoria asignada)
+FLEET_WORKERS = int(os.environ.get('FLEET_WORKERS', '0')) or os.cpu_count() or 1
+
+# Con menos paradas, crear procesos cuesta más de lo que se gana
+FLEET_PARALLEL_MIN_STOPS = int(os.environ.get('FLEET_PARALLEL_MIN_STOPS', '300'))
+
+# Parte del tiempo disponible para mejorar las rutas de cada vehículo; el
+# resto queda para la mejora entre rutas
+FLEET_SOLVE_SHARE = 0.7
+
+
+def sweep_partition(depot, coords, demands, capacities):
+    """
+    Asigna paradas a vehículos por barrido angular alrededor del depósito
+
+    El barrido empieza después del mayor hueco angular, para no partir en
+    dos un grupo de paradas cercanas. Cada vehículo recibe paradas
+    consecutivas hasta llenar su capacidad; las que no caben en ningún
+    vehículo quedan sin asignar.
+
+    Args:
+        depot: (lat, lng) del depósito
+        coords: Lista de (lat, lng) de las paradas
+        demands: Carga de cada parada
+        capacities: Capacidad de cada vehículo
+
+    Returns:
+        Tupla (lista de índices de paradas por vehículo, índices sin asignar)
+    """
+    assignments = [[] for _ in capacities]
+    loads = [0.0] * len(capacities)
+    unassigned = []
+    if not coords or not capacities:
+        return assignments, list(range(len(coords)))
+
+    dlat, dlng = depot
+    cos_ref = math.cos(math.radians(dlat))
+    angles = [math.atan2(lat - dlat, (lng - dlng) * cos_ref) for lat, lng in coords]
+    order = sorted(range(len(coords)), key=lambda i: (angles[i], i))
+
+    if len(order) > 1:
+        gaps = [(angles[order[(p + 1) % len(order)]] - angles[order[p]]) % (2 * math.pi)
+                for p in range(len(order))]
+        start = (max(range(len(gaps)), key=gaps.__getitem__) + 1) % len(order)
+        order = order[start:] + order[:start]
+
+    v = 0
+    for i in order:
+        demand = demands[i]
+        while v < len(capacities) and loads[v] + demand > capacities[v]:
+            if loads[v] == 0 and demand > capacities[v]:
+                break  # No cabe ni en el vehículo vacío: se prueba con los demás
+            v += 1
+
+        target = v if v < len(capacities) and loads[v] + demand <= capacities[v] else None
+        if target is None:
+            # Primer vehículo con espacio (ya llenos o con capacidad menor)
+            target = next((w for w in range(len(capacities))
+                           if loads[w] + demand <= capacities[w]), None)
+        if target is None:
+            unassigned.append(i)
+            continue
+
+        assignments[target].append(i)
+        loads[target] += demand
+
+    return assignments, sorted(unassigned)
+
+
+def solve_vehicle(task):
+    """
+    Ruta de un vehículo
+
+    Args:
+        task: Tupla (coords, time_windows, deadline): coords[0] es el
+            depósito y el resto sus paradas; time_windows y deadline pueden
+            ser None
+
+    Returns:
+        Resultado de solver.solve() (tour empieza en 0, el depósito)
+    """
+    coords, time_windows, deadline = task
+    engine = distance.DistanceEngine(coords)
+    return solver.solve(engine.planar_points(), engine.dist, start=0,
+                        neighbors=engine.neighbor_lists(), time_windows=time_windows,
+                        deadline=deadline)
+
+
+def _worker(func, chunk, conn):
+    try:
+        conn.send([(i, func(task)) for i, task in chunk])
+    except BaseException:
+        conn.send(traceback.format_exc())
+    finally:
+        conn.close()
+
+
+def parallel_map(func, tasks, workers=FLEET_WORKERS, cost=len):
+    """
+    Aplica func a cada tarea repartiéndolas entre `workers` procesos
+
+    Lambda no tiene /dev/shm, así que multiprocessing.Pool y
+    ProcessPoolExecutor fallan al crear sus colas: se usan Process + Pipe,
+    que sí funcionan ahí. Las tareas se reparten de la más costosa (según
+    `cost`) a la menos, siempre al proceso con menos carga. Si no se pueden crear
+    procesos, se resuelve todo en este proceso.
+
+    Returns:
+        Resultados en el mismo orden que tasks
+    """
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        return [func(task) for task in tasks]
+
+    buckets = [(0, w, []) for w in range(workers)]
+    costs = [cost(task) for task in tasks]
+    for i in sorted(range(len(tasks)), key=lambda i: -costs[i]):
+        load, w, chunk = heapq.heappop(buckets)
+        chunk.append((i, tasks[i]))
+        heapq.heappush(buckets, (load + costs[i], w, chunk))
+
+    try:
+        context = multiprocessing.get_context('fork')
+        processes = []
+        for _, _, chunk in buckets:
+            if not chunk:
+                continue
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_worker, args=(func, chunk, sender), daemon=True)
+            process.start()
+            sender.close()
+            processes.append((process, receiver))
+    except OSError as e:
+        logger.warning(f"No se pudieron crear procesos, se resuelve en serie: {str(e)}")
+        return [func(task) for task in tasks]
+
+    results = [None] * len(tasks)
+    errors = []
+    for process, receiver in processes:
+        # Leer antes de join(): un resultado grande llena el pipe
+        try:
+            payload = receiver.recv()
+        except EOFError:
+            payload = f"El proceso terminó sin responder (exit code {process.exitcode})"
+        process.join()
+        if isinstance(payload, str):
+            errors.append(payload)
+            continue
+        for i, result in payload:
+            results[i] = result
+
+    if errors:
+        raise RuntimeError(f"Error resolviendo rutas en paralelo: {errors[0]}")
+    return results
+
+
+class InterRouteSearch:
+    """
+    Mejora un conjunto de rutas con movimientos entre rutas
+
+    - relocate: sacar una parada de su ruta e insertarla junto a un vecino
+      que está en otra ruta
+    - swap: intercambiar una parada con un vecino de otra ruta
+
+    Solo se aceptan movimientos que acortan la distancia total y respetan la
+    capacidad de ambos vehículos. Igual que LocalSearch, se revisan solo las
+    paradas cuyas aristas cambiaron.
+
+    Args:
+        routes: Rutas como listas de nodos que empiezan en 0 (se modifican)
+        dist: Función dist(i, j) sobre nodos globales
+        neighbors: neighbors[i] = vecinos de i ordenados por distancia
+        demands: Carga de cada nodo (0 para el depósito)
+        capacities: Capacidad de cada ruta
+    """
+
+    def __init__(self, routes, dist, neighbors, demands, capacities):
+        self.routes = routes
+        self.dist = dist
+        self.neighbors = neighbors
+        self.demands = demands
+        self.capacities = capacities
+        self.loads = [sum(demands[node] for node in route[1:]) for route in routes]
+        self.route_of = [-1] * len(neighbors)
+        self.pos = [-1] * len(neighbors)
+        for r in range(len(routes)):
+            self._index(r)
+        self.changed = set()
+        self.moves = 0
+
+    def _index(self, r):
+        for p, node in enumerate(self.routes[r]):
+            if p:
+                self.route_of[node] = r
+                self.pos[node] = p
+
+    def _cost(self, a, b):
+        return 0.0 if a is None or b is None else self.dist(a, b)
+
+    def _around(self, node):
+        """(anterior, siguiente) de una parada en su ruta; siguiente puede ser None"""
+        route, p = self.routes[self.route_of[node]], self.pos[node]
+        return route[p - 1], route[p + 1] if p + 1 < len(route) else None
+
+    def run(self, deadline=None):
+        """
+        Aplica movimientos hasta que ninguno mejore o se llegue a `deadline`
+        (time.monotonic())
+
+        Returns:
+            Número de movimientos aplicados
+        """
+        queue = deque(node for route in self.routes for node in route[1:])
+        queued = set(queue)
+
+        while queue:
+            if deadline is not None and time.monotonic() >= deadline:
+                logger.info("Mejora entre rutas cortada por tiempo")
+                break
+            s = queue.popleft()
+            queued.discard(s)
+
+            touched = self._relocate(s) or self._swap(s)
+            if touched:
+                self.moves += 1
+                for node in touched:
+                    if node and node not in queued:
+                        queue.append(node)
+                        queued.add(node)
+
+        return self.moves
+
+    def _relocate(self, s):
+        ra = self.route_of[s]
+        prev, nxt = self._around(s)
+        dist, demand = self.dist, self.demands[s]
+        removal_gain = dist(prev, s) + self._cost(s, nxt) - self._cost(prev, nxt)
+        if removal_gain <= solver.EPSILON:
+            return None
+
+        for c in self.neighbors[s]:
+            d_sc = dist(s, c)
+            if d_sc >= removal_gain:
+                break
+            rb = self.route_of[c]
+            # rb < 0: parada sin asignar (la flota no tenía capacidad)
+            if c == 0 or rb < 0 or rb == ra or self.loads[rb] + demand > self.capacities[rb]:
+                continue
+
+            pc, sc = self._around(c)
+            after = d_sc + self._cost(s, sc) - self._cost(c, sc)
+            before = dist(pc, s) + d_sc - dist(pc, c)
+            if min(after, before) >= removal_gain - solver.EPSILON:
+                continue
+
+            route_a, route_b = self.routes[ra], self.routes[rb]
+            del route_a[self.pos[s]]
+            q = self.pos[c]
+            route_b.insert(q + 1 if after <= before else q, s)
+            self.loads[ra] -= demand
+            self.loads[rb] += demand
+            self.pos[s] = -1
+            self._index(ra)
+            self._index(rb)
+            self.changed.update((ra, rb))
+            return prev, nxt, s, c, pc, sc
+
+        return None
+
+    def _swap(self, s):
+        ra = self.route_of[s]
+        ps, ns = self._around(s)
+        dist, demand_s = self.dist, self.demands[s]
+
+        for c in self.neighbors[s]:
+            rb = self.route_of[c]
+            if c == 0 or rb < 0 or rb == ra:
+                continue
+            demand_c = self.demands[c]
+            if (self.loads[ra] - demand_s + demand_c > self.capacities[ra]
+                    or self.loads[rb] - demand_c + demand_s > self.capacities[rb]):
+                continue
+
+            pc, nc = self._around(c)
+            delta = (dist(ps, c) + self._cost(c, ns) - dist(ps, s) - self._cost(s, ns)
+                     + dist(pc, s) + self._cost(s, nc) - dist(pc, c) - self._cost(c, nc))
+            if delta >= -solver.EPSILON:
+                continue
+
+            p, q = self.pos[s], self.pos[c]
+            self.routes[ra][p], self.routes[rb][q] = c, s
+            self.route_of[s], self.route_of[c] = rb, ra
+            self.pos[s], self.pos[c] = q, p
+            self.loads[ra] += demand_c - demand_s
+            self.loads[rb] += demand_s - demand_c
+            self.changed.update((ra, rb))
+            return ps, ns, s, c, pc, nc
+
+        return None
+
+
+def plan_fleet(depot, coords, demands, capacities, deadline=None, workers=None, time_windows=None):
+    """
+    Planifica las rutas de una flota desde un depósito
+
+    Args:
+        depot: (lat, lng) del depósito
+        coords: Lista de (lat, lng) de las paradas
+        demands: Carga de cada parada
+        capacities: Capacidad de cada vehículo
+        deadline: time.monotonic() hasta el que se siguen mejorando las
+            rutas (None: solo búsqueda local)
+        workers: Procesos para resolver las rutas (por defecto FLEET_WORKERS)
+        time_windows: timewindows.TimeWindows de las paradas (opcional)
+
+    Returns:
+        Diccionario con routes (índices de paradas en orden de visita, por
+        vehículo), distances (km por vehículo), loads, unassigned,
+        initial_length (suma de las rutas iniciales), length,
+        inter_route_moves e iterations; con ventanas, también
+        begin (inicio de la atención de cada parada, por vehículo) y late
+        (paradas atendidas tarde)
+    """
+    assignments, unassigned = sweep_partition(depot, coords, demands, capacities)
+
+    # 1. Una ruta por vehículo, en paralelo si hay suficientes paradas
+    total_stops = sum(len(stops) for stops in assignments)
+    if workers is None:
+        workers = FLEET_WORKERS if total_stops >= FLEET_PARALLEL_MIN_STOPS else 1
+    # Los procesos comparten el reloj monotónico del sistema
+    solve_deadline = None
+    if deadline is not None:
+        solve_deadline = time.monotonic() + max(0.0, deadline - time.monotonic()) * FLEET_SOLVE_SHARE
+
+    tasks = []
+    for stops in assignments:
+        vehicle_windows = None
+        if time_windows is not None:
+            # El depósito abre todo el día y no tiene tiempo de atención
+            vehicle_windows = time_windows.subset(stops)
+            vehicle_windows.windows.insert(0, (0, timewindows.DAY_MINUTES, 0))
+        tasks.append(([depot] + [coords[i] for i in stops], vehicle_windows, solve_deadline))
+    results = parallel_map(solve_vehicle, tasks, workers, cost=lambda task: len(task[0]))
+    routes = [[0] + [stops[i - 1] + 1 for i in result['tour'][1:]]
+              for stops, result in zip(assignments, results)]
+
+    # 2. Mejora entre rutas sobre un motor de distancias con todas las paradas
+    engine = distance.DistanceEngine([depot] + list(coords))
+    neighbors = engine.neighbor_lists()
+    initial_length = sum(result['initial_length'] for result in results)
+    solved_length = sum(engine.route_length(route) for route in routes)
+
+    search = InterRouteSearch(routes, engine.dist, neighbors, [0] + list(demands), capacities)
+    moves = 0
+    if time_windows is None:
+        moves = search.run(deadline)
+        for r in search.changed:
+            if len(routes[r]) > 2:
+                solver.LocalSearch(routes[r], engine.dist, neighbors).run()
+
+    distances = [engine.route_length(route) for route in routes]
+    logger.info(f"Flota de {len(capacities)} vehículos, {total_stops} paradas: "
+                f"{moves} movimientos entre rutas, {initial_length:.2f} km -> "
+                f"{solved_length:.2f} km -> {sum(distances):.2f} km")
+
+    plan = {
+        'routes': [[node - 1 for node in route[1:]] for route in routes],
+        'distances': distances,
+        'loads': search.loads,
+        'unassigned': unassigned,
+        'initial_length': initial_length,
+        'length': sum(distances),
+        'inter_route_moves': moves,
+        'iterations': sum(result['iterations'] for result in results)
+    }
+
+    if time_windows is not None:
+        plan['begin'] = [result['begin'][1:] for result in results]
+        plan['late'] = sorted(stops[i - 1] for stops, result in zip(assignments, results)
+                              for i in result['late'] if i)
+
+    return plan
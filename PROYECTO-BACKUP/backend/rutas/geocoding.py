@@ -0,0 +1,270 @@
+"""
+Geocodificación de direcciones de entrega para la Lambda de Optimización de Rutas
+
+Las coordenadas se buscan por dirección normalizada en tres niveles:
+1. LRU en memoria del contenedor
+2. Tabla DynamoDB de cache persistente (GEOCODE_CACHE_TABLE, opcional)
+3. Resolvers en cadena: el primero que devuelva coordenadas gana. Por
+   defecto, el gazetteer de distritos de Lima incluido aquí (sin red)
+
+Todo es determinístico: la misma dirección produce las mismas coordenadas
+en cualquier contenedor (no se usa hash() de Python, que cambia por proceso).
+"""
+
+import hashlib
+import logging
+import math
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from decimal import Decimal
+
+logger = logging.getLogger()
+
+GEOCODE_CACHE_SIZE = int(os.environ.get('GEOCODE_CACHE_SIZE', '5000'))
+GEOCODE_CACHE_TTL_DAYS = int(os.environ.get('GEOCODE_CACHE_TTL_DAYS', '90'))
+
+# BatchGetItem: máximo 100 keys por llamada; BatchWriteItem: 25 items
+BATCH_GET_SIZE = 100
+BATCH_WRITE_SIZE = 25
+BATCH_MAX_RETRIES = 5
+
+# Radio en el que se reparten, de forma determinística, las direcciones de
+# un mismo distrito (para que no caigan todas en el centroide)
+DISTRICT_SPREAD_KM = 1.2
+
+# Abreviaturas frecuentes en direcciones peruanas
+ABBREVIATIONS = {
+    'av': 'avenida', 'avda': 'avenida', 'jr': 'jiron', 'ca': 'calle', 'cl': 'calle',
+    'psje': 'pasaje', 'pje': 'pasaje', 'urb': 'urbanizacion', 'mz': 'manzana',
+    'lt': 'lote', 'dpto': 'departamento', 'nro': 'numero', 'n': 'numero', 'no': 'numero',
+    'sjl': 'san juan de lurigancho', 'sjm': 'san juan de miraflores',
+    'smp': 'san martin de porres', 'ves': 'villa el salvador',
+    'vmt': 'villa maria del triunfo',
+}
+
+# Centroides aproximados (lat, lng) de los distritos de Lima Metropolitana y Callao
+LIMA_DISTRICTS = {
+    'cercado de lima': (-12.0464, -77.0428),
+    'miraflores': (-12.1211, -77.0297),
+    'san isidro': (-12.0976, -77.0365),
+    'santiago de surco': (-12.1459, -76.9922),
+    'surco': (-12.1459, -76.9922),
+    'la molina': (-12.0866, -76.9356),
+    'barranco': (-12.1497, -77.0211),
+    'lince': (-12.0843, -77.0365),
+    'jesus maria': (-12.0767, -77.0487),
+    'san borja': (-12.1077, -77.0009),
+    'surquillo': (-12.1125, -77.0176),
+    'magdalena del mar': (-12.0907, -77.0716),
+    'magdalena': (-12.0907, -77.0716),
+    'pueblo libre': (-12.0747, -77.0627),
+    'san miguel': (-12.0777, -77.0911),
+    'brena': (-12.0597, -77.0513),
+    'la victoria': (-12.0653, -77.0314),
+    'rimac': (-12.0287, -77.0300),
+    'san luis': (-12.0750, -76.9950),
+    'san juan de lurigancho': (-11.9833, -77.0000),
+    'san juan de miraflores': (-12.1560, -76.9710),
+    'villa el salvador': (-12.2131, -76.9361),
+    'villa maria del triunfo': (-12.1600, -76.9400),
+    'chorrillos': (-12.1686, -77.0153),
+    'ate': (-12.0256, -76.9200),
+    'santa anita': (-12.0436, -76.9711),
+    'el agustino': (-12.0431, -76.9950),
+    'san martin de porres': (-12.0158, -77.0700),
+    'los olivos': (-11.9700, -77.0700),
+    'independencia': (-11.9900, -77.0550),
+    'comas': (-11.9450, -77.0600),
+    'carabayllo': (-11.8550, -77.0400),
+    'puente piedra': (-11.8667, -77.0767),
+    'lurin': (-12.2750, -76.8700),
+    'pachacamac': (-12.2300, -76.8600),
+    'cieneguilla': (-12.1000, -76.8100),
+    'chaclacayo': (-11.9800, -76.7700),
+    'chosica': (-11.9400, -76.7000),
+    'callao': (-12.0566, -77.1181),
+    'bellavista': (-12.0620, -77.1030),
+    'la perla': (-12.0700, -77.1100),
+    'ventanilla': (-11.8750, -77.1300),
+}
+
+# Si no se reconoce el distrito: centro de Lima (último recurso)
+LIMA_CENTER = LIMA_DISTRICTS['cercado de lima']
+
+# Los nombres más largos primero: "san juan de miraflores" antes que "miraflores"
+_DISTRICT_NAMES = sorted(LIMA_DISTRICTS, key=len, reverse=True)
+
+
+def normalize_address(address):
+    """
+    Clave canónica de una dirección: minúsculas, sin tildes ni puntuación,
+    abreviaturas expandidas y espacios colapsados
+
+    "Av. Javier Prado 123, San Isidro" y "AVENIDA JAVIER PRADO 123 san isidro"
+    producen la misma clave.
+    """
+    text = unicodedata.normalize('NFKD', str(address or '')).encode('ascii', 'ignore').decode('ascii')
+    tokens = re.findall(r'[a-z0-9]+', text.lower())
+    return ' '.join(ABBREVIATIONS.get(token, token) for token in tokens)
+
+
+def _stable_unit_pair(key):
+    """Dos números en [0, 1) derivados de la clave (iguales en todo proceso)"""
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+    return (int.from_bytes(digest[:8], 'big') / 2 ** 64,
+            int.from_bytes(digest[8:], 'big') / 2 ** 64)
+
+
+def _spread(center, key, radius_km):
+    """Punto determinístico dentro de un círculo de radius_km alrededor de center"""
+    u, v = _stable_unit_pair(key)
+    distance_km, angle = radius_km * math.sqrt(u), 2 * math.pi * v
+    lat, lng = center
+    return (lat + distance_km * math.cos(angle) / 111.32,
+            lng + distance_km * math.sin(angle) / (111.32 * math.cos(math.radians(lat))))
+
+
+def gazetteer_resolver(key):
+    """
+    Resolver sin red: ubica la dirección en su distrito de Lima/Callao
+
+    Returns:
+        (lat, lng, source), o None si la dirección no menciona un distrito
+    """
+    padded = f' {key} '
+    for name in _DISTRICT_NAMES:
+        if f' {name} ' in padded:
+            lat, lng = _spread(LIMA_DISTRICTS[name], key, DISTRICT_SPREAD_KM)
+            return lat, lng, f'gazetteer:{name}'
+    return None
+
+
+def lima_center_resolver(key):
+    """Último recurso: alrededor del centro de Lima, marcado como aproximado"""
+    lat, lng = _spread(LIMA_CENTER, key, DISTRICT_SPREAD_KM * 4)
+    return lat, lng, 'approximate'
+
+
+class Geocoder:
+    """
+    Geocodificador con LRU en memoria, cache persistente y resolvers
+
+    Args:
+        dynamodb: Recurso DynamoDB (para la cache persistente)
+        table_name: Tabla de cache con clave address_key (None: sin persistencia)
+        resolvers: Funciones resolver(clave_normalizada) -> (lat, lng, source) | None
+        cache_size: Entradas del LRU en memoria
+    """
+
+    def __init__(self, dynamodb=None, table_name=None, resolvers=None, cache_size=GEOCODE_CACHE_SIZE):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.resolvers = list(resolvers) if resolvers else [gazetteer_resolver, lima_center_resolver]
+        self.cache_size = cache_size
+        self._lru = OrderedDict()
+        self.stats = {'memory': 0, 'persistent': 0, 'resolved': 0}
+
+    def geocode(self, address):
+        """Coordenadas (lat, lng, source) de una dirección"""
+        return self.geocode_many([address])[normalize_address(address)]
+
+    def geocode_many(self, addresses):
+        """
+        Geocodifica varias direcciones con una sola consulta por lote a la
+        cache persistente
+
+        Returns:
+            Diccionario clave_normalizada -> (lat, lng, source)
+        """
+        keys = list(dict.fromkeys(normalize_address(a) for a in addresses))
+        found = {}
+
+        # 1. LRU en memoria
+        for key in keys:
+            if key in self._lru:
+                self._lru.move_to_end(key)
+                found[key] = self._lru[key]
+        self.stats['memory'] += len(found)
+
+        # 2. Cache persistente (DynamoDB rechaza una clave vacía, y con ella
+        # todo el lote: las direcciones vacías van directo a los resolvers)
+        pending = [k for k in keys if k not in found and k]
+        if pending and self.table_name:
+            try:
+                stored = self._load(pending)
+            except Exception as e:
+                logger.warning(f"Error leyendo cache de geocodificación: {str(e)}")
+                stored = {}
+            self.stats['persistent'] += len(stored)
+            found.update(stored)
+            self._remember(stored)
+
+        # 3. Resolvers
+        pending = [k for k in keys if k not in found]
+        resolved = {}
+        for key in pending:
+            for resolver in self.resolvers:
+                result = resolver(key)
+                if result:
+                    resolved[key] = result
+                    break
+        self.stats['resolved'] += len(resolved)
+        found.update(resolved)
+        self._remember(resolved)
+
+        if resolved and self.table_name:
+            try:
+                self._store(resolved)
+            except Exception as e:
+                logger.warning(f"Error guardando cache de geocodificación: {str(e)}")
+
+        return found
+
+    def _remember(self, entries):
+        for key, value in entries.items():
+            self._lru[key] = value
+            self._lru.move_to_end(key)
+        while len(self._lru) > self.cache_size:
+            self._lru.popitem(last=False)
+
+    def _load(self, keys):
+        """Lee de la tabla de cache con BatchGetItem (reintenta UnprocessedKeys)"""
+        found = {}
+        for start in range(0, len(keys), BATCH_GET_SIZE):
+            request = {self.table_name: {
+                'Keys': [{'address_key': k} for k in keys[start:start + BATCH_GET_SIZE]]
+            }}
+            for attempt in range(BATCH_MAX_RETRIES + 1):
+                result = self.dynamodb.batch_get_item(RequestItems=request)
+                for item in result.get('Responses', {}).get(self.table_name, []):
+                    found[item['address_key']] = (float(item['lat']), float(item['lng']), item.get('source', ''))
+                request = result.get('UnprocessedKeys') or {}
+                if not request:
+                    break
+                time.sleep(min(1.0, 0.05 * 2 ** attempt))
+        return found
+
+    def _store(self, entries):
+        """Guarda coordenadas resueltas con BatchWriteItem y TTL"""
+        expiry = int(time.time()) + GEOCODE_CACHE_TTL_DAYS * 86400
+        requests = [
+            {'PutRequest': {'Item': {
+                'address_key': key,
+                'lat': Decimal(str(round(lat, 6))),
+                'lng': Decimal(str(round(lng, 6))),
+                'source': source,
+                'expiry': expiry
+            }}}
+            for key, (lat, lng, source) in entries.items() if key
+        ]
+        for start in range(0, len(requests), BATCH_WRITE_SIZE):
+            pending = {self.table_name: requests[start:start + BATCH_WRITE_SIZE]}
+            for attempt in range(BATCH_MAX_RETRIES + 1):
+                result = self.dynamodb.batch_write_item(RequestItems=pending)
+                pending = result.get('UnprocessedItems') or {}
+                if not pending:
+                    break
+                time.sleep(min(1.0, 0.05 * 2 ** attempt))
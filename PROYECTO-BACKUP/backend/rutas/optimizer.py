@@ -1,26 +1,77 @@
 """
 Lambda Function: Optimización de Rutas
-Optimiza rutas de entrega usando algoritmos simples
+Optimiza rutas de entrega (vecino más cercano + búsqueda local, ver solver.py)
+
+La mejora sigue mientras quede tiempo: hasta time_budget_ms del request o
+hasta el tiempo restante de la Lambda menos OPTIMIZER_TIME_MARGIN_MS (lo
+que ocurra primero). Las rutas chicas terminan enseguida, al dejar de
+mejorar.
+
+- POST /routes: una ruta para un conductor
+- POST /route-plans: rutas para una flota con capacidades desde un
+  depósito (ver fleet.py), un registro de ruta por conductor
+- PUT /routes: agregar o quitar órdenes de una ruta guardada sin
+  resolverla de nuevo (inserción más barata + búsqueda local local)
 """
 
 import json
 import os
-import boto3
+import time
 from datetime import datetime
+from decimal import Decimal
 import uuid
 import logging
-import math
+from concurrent.futures import ThreadPoolExecutor
+
+import distance
+import fleet
+import geocoding
+from lazy_clients import LazyClient
+import routecache
+import solver
+import timewindows
 
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
-dynamodb = boto3.resource('dynamodb')
-
 ROUTES_TABLE = os.environ.get('ROUTES_TABLE')
 ORDERS_TABLE = os.environ.get('ORDERS_TABLE')
+GEOCODE_CACHE_TABLE = os.environ.get('GEOCODE_CACHE_TABLE')
+ROUTE_CACHE_TABLE = os.environ.get('ROUTE_CACHE_TABLE')
+
+# Consultas simultáneas al traer las órdenes de una ruta
+ORDERS_FETCH_CONCURRENCY = int(os.environ.get('ORDERS_FETCH_CONCURRENCY', '32'))
+
+# Margen que se deja libre antes del timeout de la Lambda para guardar las
+# rutas y responder
+OPTIMIZER_TIME_MARGIN_MS = int(os.environ.get('OPTIMIZER_TIME_MARGIN_MS', '5000'))
+
+# Rutas que ya no se pueden modificar
+CLOSED_ROUTE_STATUSES = {'COMPLETED', 'CANCELLED'}
+
+# Ventanas de entrega: hora de salida por defecto y velocidad promedio en
+# ciudad para estimar tiempos de viaje
+ROUTE_START_TIME = os.environ.get('ROUTE_START_TIME', '08:00')
+ROUTE_AVERAGE_SPEED_KMH = float(os.environ.get('ROUTE_AVERAGE_SPEED_KMH', '20'))
+
+
+def _create_dynamodb():
+    """Recurso DynamoDB con un pool de conexiones del tamaño del pool de hilos"""
+    import boto3
+    from botocore.config import Config
 
-routes_table = dynamodb.Table(ROUTES_TABLE)
-orders_table = dynamodb.Table(ORDERS_TABLE)
+    return boto3.resource('dynamodb', config=Config(max_pool_connections=ORDERS_FETCH_CONCURRENCY))
+
+
+# Cliente DynamoDB (se crea en el primer uso)
+dynamodb = LazyClient(_create_dynamodb)
+
+routes_table = LazyClient(lambda: dynamodb.Table(ROUTES_TABLE))
+orders_table = LazyClient(lambda: dynamodb.Table(ORDERS_TABLE))
+
+# Se reutiliza entre invocaciones: su LRU sobrevive mientras viva el contenedor
+geocoder = geocoding.Geocoder(dynamodb=dynamodb, table_name=GEOCODE_CACHE_TABLE)
+route_cache = routecache.RouteCache(dynamodb=dynamodb, table_name=ROUTE_CACHE_TABLE)
 
 
 def handler(event, context):
@@ -29,7 +80,18 @@ def handler(event, context):
     logger.info(f"Evento recibido: {json.dumps(event)}")
 
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = json.loads(event.get('body') or '{}')
+
+        try:
+            deadline = solve_deadline(body, context)
+        except (TypeError, ValueError):
+            return response(400, {'error': 'time_budget_ms debe ser un número positivo'})
+
+        if (event.get('resource') or event.get('path') or '').rstrip('/').endswith('/route-plans'):
+            return plan_routes(body, deadline)
+
+        if event.get('httpMethod') == 'PUT':
+            return reoptimize_route(body)
 
         order_ids = body.get('order_ids', [])
         driver_id = body.get('driver_id')
@@ -37,17 +99,22 @@ def handler(event, context):
         if not order_ids or not driver_id:
             return response(400, {'error': 'order_ids y driver_id son requeridos'})
 
+        start_time = parse_start_time(body)
+        if start_time is None:
+            return response(400, {'error': 'start_time debe tener formato HH:MM'})
+
         # Obtener órdenes
-        orders = get_orders(order_ids)
+        orders, missing, failed = get_orders(order_ids)
 
         if not orders:
-            return response(404, {'error': 'No se encontraron órdenes'})
-
-        # Optimizar ruta (algoritmo simple: nearest neighbor)
-        optimized_route = optimize_route(orders)
+            return response(404, {
+                'error': 'No se encontraron órdenes',
+                'missing_order_ids': missing,
+                'failed_order_ids': failed
+            })
 
-        # Calcular distancia total estimada
-        total_distance = calculate_total_distance(optimized_route)
+        # Optimizar ruta (la distancia total sale del mismo motor de distancias)
+        optimized_route, total_distance, stats = optimize_route(orders, start_time, deadline)
 
         # Crear ruta
         route_id = f"ROUTE-{str(uuid.uuid4())[:8].upper()}"
@@ -59,22 +126,40 @@ def handler(event, context):
             'created_at': timestamp,
             'order_ids': [order['order_id'] for order in optimized_route],
             'stops': len(optimized_route),
-            'estimated_distance_km': round(total_distance, 2),
-            'status': 'PLANNED'
+            'estimated_distance_km': to_decimal(total_distance),
+            'status': 'PLANNED',
+            'version': 1
         }
+        route.update(stop_fields(optimized_route, start_time))
+
+        arrivals = estimated_arrivals(optimized_route)
+        if arrivals:
+            route['estimated_arrivals'] = arrivals
 
         # Guardar ruta
         routes_table.put_item(Item=route)
 
         logger.info(f"Ruta optimizada creada: {route_id}")
 
-        return response(200, {
+        result = {
             'message': 'Ruta optimizada exitosamente',
             'route_id': route_id,
             'stops': len(optimized_route),
             'estimated_distance_km': round(total_distance, 2),
-            'order_sequence': [order['order_id'] for order in optimized_route]
-        })
+            'order_sequence': [order['order_id'] for order in optimized_route],
+            'optimization': stats
+        }
+
+        if arrivals:
+            result['estimated_arrivals'] = arrivals
+            result['late_order_ids'] = [o['order_id'] for o in optimized_route if o.get('_late')]
+
+        # Ruta parcial: informar qué órdenes quedaron fuera
+        if missing or failed:
+            result['missing_order_ids'] = missing
+            result['failed_order_ids'] = failed
+
+        return response(200, result)
 
     except json.JSONDecodeError:
         return response(400, {'error': 'JSON inválido'})
@@ -83,87 +168,589 @@ def handler(event, context):
         return response(500, {'error': 'Error optimizando ruta', 'detail': str(e)})
 
 
+def solve_deadline(body, context):
+    """
+    time.monotonic() hasta el que se puede seguir mejorando rutas, o None si
+    no hay límite (sin context ni time_budget_ms: solo búsqueda local)
+
+    Se calcula al empezar el request, así el margen cubre también la lectura
+    de órdenes y la escritura de rutas.
+    """
+    budgets = []
+    if body.get('time_budget_ms') is not None:
+        budget = float(body['time_budget_ms'])
+        if not budget > 0:
+            raise ValueError('time_budget_ms')
+        budgets.append(budget)
+    if context is not None:
+        budgets.append(context.get_remaining_time_in_millis() - OPTIMIZER_TIME_MARGIN_MS)
+
+    if not budgets:
+        return None
+    return time.monotonic() + max(0.0, min(budgets)) / 1000
+
+
+def optimization_stats(initial_length, final_length, iterations, started):
+    """Resumen de la mejora para la respuesta"""
+    improvement = initial_length - final_length
+    return {
+        'initial_distance_km': round(initial_length, 2),
+        'improvement_km': round(improvement, 2),
+        'improvement_pct': round(100 * improvement / initial_length, 2) if initial_length else 0.0,
+        'iterations': iterations,
+        'elapsed_ms': int((time.monotonic() - started) * 1000)
+    }
+
+
+def plan_routes(body, deadline):
+    """
+    Planificar las rutas de una flota: reparte las órdenes entre los
+    vehículos según su capacidad y guarda una ruta por conductor
+
+    Body:
+        order_ids: Órdenes a repartir
+        vehicles: [{"driver_id": ..., "capacity": ...}, ...]
+        depot: {"lat": ..., "lng": ...} o {"address": ...}
+        start_time: Hora de salida del depósito, HH:MM (opcional)
+        time_budget_ms: Tiempo máximo de optimización (opcional)
+    """
+    order_ids = body.get('order_ids', [])
+    vehicles = body.get('vehicles', [])
+    depot = body.get('depot') or {}
+
+    if not order_ids or not vehicles or not depot:
+        return response(400, {'error': 'order_ids, vehicles y depot son requeridos'})
+
+    try:
+        capacities = [float(vehicle['capacity']) for vehicle in vehicles]
+        driver_ids = [vehicle['driver_id'] for vehicle in vehicles]
+    except (KeyError, TypeError, ValueError):
+        return response(400, {'error': 'Cada vehículo requiere driver_id y capacity numérica'})
+
+    if min(capacities) <= 0 or len(set(driver_ids)) != len(driver_ids):
+        return response(400, {'error': 'Las capacidades deben ser positivas y los driver_id únicos'})
+
+    start_time = parse_start_time(body)
+    if start_time is None:
+        return response(400, {'error': 'start_time debe tener formato HH:MM'})
+
+    if depot.get('lat') is not None and depot.get('lng') is not None:
+        depot_coords = (float(depot['lat']), float(depot['lng']))
+    elif depot.get('address'):
+        depot_coords = geocoder.geocode(depot['address'])[:2]
+    else:
+        return response(400, {'error': 'depot requiere lat y lng, o address'})
+
+    orders, missing, failed = get_orders(order_ids)
+
+    if not orders:
+        return response(404, {
+            'error': 'No se encontraron órdenes',
+            'missing_order_ids': missing,
+            'failed_order_ids': failed
+        })
+
+    assign_coordinates(orders)
+
+    started = time.monotonic()
+    plan = fleet.plan_fleet(
+        depot_coords,
+        [(order['_lat'], order['_lng']) for order in orders],
+        [order_demand(order) for order in orders],
+        capacities,
+        deadline=deadline,
+        time_windows=build_time_windows(orders, start_time)
+    )
+
+    plan_id = f"PLAN-{str(uuid.uuid4())[:8].upper()}"
+    timestamp = datetime.utcnow().isoformat()
+    routes = []
+
+    for vehicle_index, stops in enumerate(plan['routes']):
+        if not stops:
+            continue
+
+        route = {
+            'route_id': f"ROUTE-{str(uuid.uuid4())[:8].upper()}",
+            'plan_id': plan_id,
+            'driver_id': driver_ids[vehicle_index],
+            'created_at': timestamp,
+            'order_ids': [orders[i]['order_id'] for i in stops],
+            'stops': len(stops),
+            'estimated_distance_km': to_decimal(plan['distances'][vehicle_index]),
+            'load': to_decimal(plan['loads'][vehicle_index]),
+            'capacity': to_decimal(capacities[vehicle_index]),
+            'depot': {'lat': to_decimal(depot_coords[0], 6), 'lng': to_decimal(depot_coords[1], 6)},
+            'status': 'PLANNED',
+            'version': 1
+        }
+        route.update(stop_fields([orders[i] for i in stops], start_time))
+        if 'begin' in plan:
+            route['estimated_arrivals'] = [timewindows.format_time(m) for m in plan['begin'][vehicle_index]]
+        routes_table.put_item(Item=route)
+
+        summary = {
+            'route_id': route['route_id'],
+            'driver_id': route['driver_id'],
+            'stops': route['stops'],
+            'load': round(plan['loads'][vehicle_index], 2),
+            'capacity': capacities[vehicle_index],
+            'estimated_distance_km': round(plan['distances'][vehicle_index], 2),
+            'order_sequence': route['order_ids']
+        }
+        if 'estimated_arrivals' in route:
+            summary['estimated_arrivals'] = route['estimated_arrivals']
+        routes.append(summary)
+
+    logger.info(f"Plan {plan_id}: {len(routes)} rutas, "
+                f"{len(plan['unassigned'])} órdenes sin vehículo")
+
+    result = {
+        'message': 'Rutas planificadas exitosamente',
+        'plan_id': plan_id,
+        'routes': routes,
+        'estimated_distance_km': round(plan['length'], 2),
+        'unassigned_order_ids': [orders[i]['order_id'] for i in plan['unassigned']],
+        'optimization': optimization_stats(plan['initial_length'], plan['length'],
+                                           plan['iterations'], started)
+    }
+
+    if 'late' in plan:
+        result['late_order_ids'] = [orders[i]['order_id'] for i in plan['late']]
+
+    if missing or failed:
+        result['missing_order_ids'] = missing
+        result['failed_order_ids'] = failed
+
+    return response(200, result)
+
+
+def reoptimize_route(body):
+    """
+    Modificar una ruta guardada: insertar órdenes nuevas donde menos
+    alargan la ruta, quitar las canceladas y reparar con búsqueda local
+    solo alrededor de los cambios
+
+    Solo se leen las órdenes nuevas: las coordenadas (y ventanas) de las
+    paradas existentes se guardan con la ruta. La escritura es condicional
+    a la versión leída, así dos cambios simultáneos no se pisan.
+
+    Body:
+        route_id: Ruta a modificar
+        add_order_ids: Órdenes a agregar (opcional)
+        remove_order_ids: Órdenes a quitar (opcional)
+    """
+    route_id = body.get('route_id')
+    add_ids = list(dict.fromkeys(body.get('add_order_ids') or []))
+    remove_ids = set(body.get('remove_order_ids') or [])
+
+    if not route_id or not (add_ids or remove_ids):
+        return response(400, {'error': 'route_id y add_order_ids o remove_order_ids son requeridos'})
+
+    route = routes_table.get_item(Key={'route_id': route_id}).get('Item')
+    if not route:
+        return response(404, {'error': 'Ruta no encontrada'})
+    if route.get('status') in CLOSED_ROUTE_STATUSES:
+        return response(409, {'error': f"La ruta está {route['status']} y no se puede modificar"})
+
+    current_ids = list(route.get('order_ids', []))
+    not_in_route = sorted(remove_ids - set(current_ids))
+    remove_ids &= set(current_ids)
+    add_ids = [order_id for order_id in add_ids if order_id not in current_ids]
+
+    # Paradas actuales: datos guardados con la ruta (rutas antiguas: se leen las órdenes)
+    current = stored_stops(route)
+    if current is None:
+        logger.info(f"Ruta {route_id} sin coordenadas guardadas: se leen sus órdenes")
+        current, _, _ = get_orders(current_ids)
+        assign_coordinates(current)
+        if len(current) != len(current_ids):
+            return response(409, {'error': 'No se pudieron leer todas las órdenes de la ruta'})
+
+    new_orders, missing, failed = get_orders(add_ids) if add_ids else ([], [], [])
+    assign_coordinates(new_orders)
+
+    if 'capacity' in route:
+        load = (float(route.get('load', 0))
+                - sum(order_demand(o) for o in current if o['order_id'] in remove_ids)
+                + sum(order_demand(o) for o in new_orders))
+        if load > float(route['capacity']):
+            return response(409, {'error': 'Las órdenes nuevas superan la capacidad del vehículo',
+                                  'load': round(load, 2), 'capacity': float(route['capacity'])})
+
+    # Nodos: depósito (rutas de flota), paradas actuales y órdenes nuevas
+    stops = current + new_orders
+    depot = route.get('depot')
+    coords = [(order['_lat'], order['_lng']) for order in stops]
+    offset = 0
+    if depot:
+        coords.insert(0, (float(depot['lat']), float(depot['lng'])))
+        offset = 1
+
+    start_time = timewindows.parse_time(route['start_time']) if route.get('start_time') else None
+    time_windows = build_time_windows(stops, start_time)
+    if time_windows is not None and depot:
+        time_windows.windows.insert(0, (0, timewindows.DAY_MINUTES, 0))
+
+    engine = distance.DistanceEngine(coords)
+    tour = list(range(offset + len(current)))
+    result = solver.reoptimize(
+        engine.dist, tour,
+        insert=range(offset + len(current), len(coords)),
+        remove=[offset + i for i, order in enumerate(current) if order['order_id'] in remove_ids],
+        neighbors=engine.neighbor_lists(),
+        time_windows=time_windows
+    )
+
+    route_orders = [stops[node - offset] for node in result['tour'] if node >= offset]
+    total_distance = engine.route_length(result['tour'])
+    changes = {
+        'order_ids': [order['order_id'] for order in route_orders],
+        'stops': len(route_orders),
+        'estimated_distance_km': to_decimal(total_distance),
+        'updated_at': datetime.utcnow().isoformat(),
+        'version': int(route.get('version', 0)) + 1
+    }
+    changes.update(stop_fields(route_orders, time_windows.start_time if time_windows else None))
+    if 'capacity' in route:
+        changes['load'] = to_decimal(sum(order_demand(order) for order in route_orders))
+    if time_windows is not None:
+        changes['estimated_arrivals'] = [timewindows.format_time(minutes) for node, minutes
+                                         in zip(result['tour'], result['begin']) if node >= offset]
+
+    if not save_route_changes(route, changes):
+        return response(409, {'error': 'La ruta cambió mientras se modificaba, reintente'})
+
+    logger.info(f"Ruta {route_id} modificada: +{len(new_orders)} -{len(remove_ids)} órdenes, "
+                f"{result['moves']} mejoras locales, {result['initial_length']:.2f} km -> "
+                f"{total_distance:.2f} km")
+
+    result_body = {
+        'message': 'Ruta modificada exitosamente',
+        'route_id': route_id,
+        'stops': changes['stops'],
+        'estimated_distance_km': round(total_distance, 2),
+        'previous_distance_km': round(result['initial_length'], 2),
+        'order_sequence': changes['order_ids'],
+        'added_order_ids': [order['order_id'] for order in new_orders],
+        'removed_order_ids': sorted(remove_ids)
+    }
+
+    if 'estimated_arrivals' in changes:
+        result_body['estimated_arrivals'] = changes['estimated_arrivals']
+        result_body['late_order_ids'] = [stops[node - offset]['order_id']
+                                         for node in result['late'] if node >= offset]
+    if not_in_route:
+        result_body['not_in_route_order_ids'] = not_in_route
+    if missing or failed:
+        result_body['missing_order_ids'] = missing
+        result_body['failed_order_ids'] = failed
+
+    return response(200, result_body)
+
+
+def stored_stops(route):
+    """
+    Paradas de una ruta a partir de los datos guardados con ella (mismo
+    formato que las órdenes con _lat/_lng), o None si la ruta no los tiene
+    """
+    coordinates = route.get('stop_coordinates')
+    if coordinates is None or len(coordinates) != len(route.get('order_ids', [])):
+        return None
+
+    windows = route.get('stop_windows')
+    stops = []
+    for p, order_id in enumerate(route['order_ids']):
+        stop = {'order_id': order_id, '_lat': float(coordinates[p][0]), '_lng': float(coordinates[p][1])}
+        if windows:
+            earliest, latest, service = (float(v) for v in windows[p])
+            stop['delivery_window'] = {'start': timewindows.format_time(earliest),
+                                       'end': timewindows.format_time(latest)}
+            stop['service_minutes'] = service
+        if route.get('stop_demands'):
+            stop['demand'] = float(route['stop_demands'][p])
+        stops.append(stop)
+    return stops
+
+
+def stop_fields(route_orders, start_time):
+    """
+    Datos de las paradas que se guardan con la ruta, para poder modificarla
+    después sin leer de nuevo sus órdenes
+    """
+    fields = {
+        'stop_coordinates': [[to_decimal(o['_lat'], 6), to_decimal(o['_lng'], 6)] for o in route_orders],
+        'stop_demands': [to_decimal(order_demand(o)) for o in route_orders]
+    }
+    if any(order.get('delivery_window') for order in route_orders):
+        fields['stop_windows'] = [[to_decimal(v) for v in order_window(o)] for o in route_orders]
+        fields['start_time'] = timewindows.format_time(
+            start_time if start_time is not None else timewindows.parse_time(ROUTE_START_TIME))
+    return fields
+
+
+def save_route_changes(route, changes):
+    """
+    Guardar los cambios de una ruta solo si nadie la modificó desde que se
+    leyó (misma versión; las rutas antiguas no tienen versión)
+
+    Returns:
+        False si la escritura condicional falló
+    """
+    from botocore.exceptions import ClientError
+
+    names = {f'#f{n}': field for n, field in enumerate(changes)}
+    values = {f':v{n}': value for n, value in enumerate(changes.values())}
+    update = 'SET ' + ', '.join(f'#f{n} = :v{n}' for n in range(len(changes)))
+
+    if 'version' in route:
+        condition = '#version = :expected'
+        values[':expected'] = route['version']
+    else:
+        condition = 'attribute_not_exists(#version)'
+    names['#version'] = 'version'
+
+    try:
+        routes_table.update_item(
+            Key={'route_id': route['route_id']},
+            UpdateExpression=update,
+            ConditionExpression=condition,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+            raise
+        return False
+    return True
+
+
+def order_demand(order):
+    """Carga de una orden: `demand` si la trae, si no, la cantidad de productos"""
+    if order.get('demand') is not None:
+        return float(order['demand'])
+    quantity = sum(float(product.get('quantity', 1)) for product in order.get('products') or [])
+    return quantity or 1.0
+
+
+def to_decimal(value, digits=2):
+    """DynamoDB no acepta float: se guarda como Decimal redondeado"""
+    return Decimal(str(round(float(value), digits)))
+
+
 def get_orders(order_ids):
-    """Obtener órdenes desde DynamoDB"""
-    orders = []
+    """
+    Obtener órdenes desde DynamoDB
+
+    La tabla tiene clave order_id + created_at y el request solo trae
+    order_id, así que no se puede usar BatchGetItem: las consultas se hacen
+    en paralelo en un pool de hilos acotado (ORDERS_FETCH_CONCURRENCY), de
+    modo que el tiempo no crece con cada parada agregada.
 
-    for order_id in order_ids:
+    Returns:
+        Tupla (órdenes en el orden de order_ids sin duplicados,
+               IDs no encontrados, IDs cuya consulta falló)
+    """
+    unique_ids = list(dict.fromkeys(order_ids))
+
+    # El método se resuelve en este hilo: el recurso se crea una sola vez y
+    # los hilos solo hacen llamadas (el cliente de boto3 es thread-safe)
+    query = orders_table.query
+
+    def fetch(order_id):
+        result = query(
+            KeyConditionExpression='order_id = :oid',
+            ExpressionAttributeValues={':oid': order_id},
+            Limit=1
+        )
+        items = result.get('Items')
+        return items[0] if items else None
+
+    orders, missing, failed = [], [], []
+    futures = [(order_id, get_executor().submit(fetch, order_id)) for order_id in unique_ids]
+
+    for order_id, future in futures:
         try:
-            result = orders_table.query(
-                KeyConditionExpression='order_id = :oid',
-                ExpressionAttributeValues={':oid': order_id},
-                Limit=1
-            )
-            if result.get('Items'):
-                orders.append(result['Items'][0])
+            order = future.result()
         except Exception as e:
             logger.warning(f"Error obteniendo orden {order_id}: {str(e)}")
+            failed.append(order_id)
+            continue
+
+        if order:
+            orders.append(order)
+        else:
+            missing.append(order_id)
+
+    if missing or failed:
+        logger.warning(f"Órdenes no encontradas: {missing}; con error: {failed}")
+
+    return orders, missing, failed
 
-    return orders
 
+_executor = None
 
-def optimize_route(orders):
+
+def get_executor():
+    """Pool de hilos para consultas a DynamoDB, reutilizado entre invocaciones"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=ORDERS_FETCH_CONCURRENCY)
+    return _executor
+
+
+def optimize_route(orders, start_time=None, deadline=None):
     """
-    Optimizar ruta usando algoritmo Nearest Neighbor (simplificado)
-    En producción, usar algoritmos más sofisticados como:
-    - Algoritmo genético
-    - Simulated Annealing
-    - Google Maps Optimization API
+    Optimizar ruta: vecino más cercano sobre índice espacial + 2-opt/Or-opt
+    (ver solver.py) y, si hay deadline, búsqueda local iterada hasta
+    entonces. La ruta empieza en la primera orden.
+
+    Si alguna orden tiene ventana de entrega, la ruta las respeta y cada
+    orden recibe _eta (inicio estimado de la atención, en minutos) y _late.
+
+    Si el mismo problema (órdenes, coordenadas, ventanas, parámetros) ya se
+    resolvió con al menos el mismo presupuesto de tiempo, se devuelve el plan
+    de route_cache sin resolver de nuevo.
+
+    Returns:
+        Tupla (órdenes en orden de visita, distancia total en km,
+               resumen de la optimización)
     """
 
+    started = time.monotonic()
     if not orders:
-        return []
+        return [], 0, optimization_stats(0, 0, 0, started)
+
+    assign_coordinates(orders)
+    time_windows = build_time_windows(orders, start_time)
+
+    key = route_cache_key(orders, time_windows)
+    budget = routecache.budget_level((deadline - started) * 1000 if deadline is not None else 0)
+    plan, level = route_cache.get(key)
+    by_id = {order['order_id']: order for order in orders}
+    if plan is not None and plan.get('budget_level', 0) >= budget and \
+            sorted(plan['order_ids']) == sorted(by_id):
+        route = [by_id[order_id] for order_id in plan['order_ids']]
+        if plan.get('eta') is not None:
+            late = set(plan['late_order_ids'])
+            for order, eta in zip(route, plan['eta']):
+                order['_eta'], order['_late'] = eta, order['order_id'] in late
+
+        logger.info(f"Ruta de {len(orders)} paradas desde cache ({level})")
+        stats = optimization_stats(plan['initial_distance_km'], plan['distance_km'],
+                                   plan['iterations'], started)
+        stats['cache'] = level
+        return route, plan['distance_km'], stats
+
+    # Un solo motor de distancias (haversine, km) para construcción, mejora
+    # y distancia total
+    engine = distance.DistanceEngine([(order['_lat'], order['_lng']) for order in orders])
+    result = solver.solve(engine.planar_points(), engine.dist, start=0,
+                          neighbors=engine.neighbor_lists(), time_windows=time_windows,
+                          deadline=deadline)
+
+    logger.info(f"Ruta de {len(orders)} paradas: {result['moves']} mejoras locales, "
+                f"{result['iterations']} iteraciones, {result['initial_length']:.2f} km -> "
+                f"{result['local_search_length']:.2f} km -> {result['length']:.2f} km")
+
+    if time_windows is not None:
+        late = set(result['late'])
+        for i, begin in zip(result['tour'], result['begin']):
+            orders[i]['_eta'], orders[i]['_late'] = begin, i in late
+        if late:
+            logger.warning(f"{len(late)} entregas fuera de su ventana")
+
+    route = [orders[i] for i in result['tour']]
+    total_distance = engine.route_length(result['tour'])
+    route_cache.put(key, {
+        'order_ids': [order['order_id'] for order in route],
+        'distance_km': total_distance,
+        'initial_distance_km': result['initial_length'],
+        'iterations': result['iterations'],
+        'budget_level': budget,
+        'eta': result.get('begin'),
+        'late_order_ids': [orders[i]['order_id'] for i in result.get('late', [])]
+    })
+
+    stats = optimization_stats(result['initial_length'], total_distance, result['iterations'], started)
+    stats['cache'] = 'miss'
+    return route, total_distance, stats
+
+
+def route_cache_key(orders, time_windows):
+    """Clave de route_cache: paradas, parada inicial y parámetros que afectan la ruta"""
+    stops = [(order['order_id'], order['_lat'], order['_lng']) for order in orders]
+    params = {'neighbors_k': solver.NEIGHBORS_K, 'or_opt_max_segment': solver.OR_OPT_MAX_SEGMENT}
+    if time_windows is not None:
+        stops = [stop + tuple(window) for stop, window in zip(stops, time_windows.windows)]
+        params['start_time'] = time_windows.start_time
+        params['minutes_per_km'] = time_windows.minutes_per_km
+    return routecache.cache_key(orders[0]['order_id'], stops, params)
+
+
+def parse_start_time(body):
+    """Hora de salida del request en minutos (ROUTE_START_TIME si no viene), o None si es inválida"""
+    value = body.get('start_time') or ROUTE_START_TIME
+    try:
+        minutes = timewindows.parse_time(value)
+    except (TypeError, ValueError):
+        return None
+    return minutes if 0 <= minutes < timewindows.DAY_MINUTES else None
 
-    # Para este ejemplo, simplemente ordenamos por proximidad geográfica simulada
-    # En producción, usar coordenadas reales y calcular distancias reales
 
-    # Asignar coordenadas simuladas basadas en la dirección (hash simple)
-    for order in orders:
-        address = order.get('delivery_address', '')
-        # Simulación: usar hash de la dirección para generar coordenadas
-        hash_val = hash(address)
-        order['_lat'] = (hash_val % 180) - 90  # Latitud simulada
-        order['_lng'] = (hash_val % 360) - 180  # Longitud simulada
+def build_time_windows(orders, start_time):
+    """
+    Ventanas (earliest, latest, service) en minutos de cada orden, o None si
+    ninguna orden tiene delivery_window (la ruta se optimiza solo por distancia)
+    """
+    if not any(order.get('delivery_window') for order in orders):
+        return None
 
-    # Algoritmo Nearest Neighbor simple
-    optimized = []
-    remaining = orders.copy()
-    current = remaining.pop(0)  # Empezar con la primera orden
-    optimized.append(current)
+    if start_time is None:
+        start_time = timewindows.parse_time(ROUTE_START_TIME)
 
-    while remaining:
-        # Encontrar la orden más cercana
-        nearest = min(remaining, key=lambda o: euclidean_distance(
-            current['_lat'], current['_lng'],
-            o['_lat'], o['_lng']
-        ))
-        optimized.append(nearest)
-        remaining.remove(nearest)
-        current = nearest
+    windows = [order_window(order) for order in orders]
+    return timewindows.TimeWindows(windows, 60.0 / ROUTE_AVERAGE_SPEED_KMH, start_time)
 
-    return optimized
 
+def order_window(order):
+    """(earliest, latest, service) de una orden, en minutos"""
+    window = order.get('delivery_window') or {}
+    earliest = timewindows.parse_time(window['start']) if window.get('start') else 0
+    latest = timewindows.parse_time(window['end']) if window.get('end') else timewindows.DAY_MINUTES
+    return earliest, latest, float(order.get('service_minutes', 0))
 
-def euclidean_distance(lat1, lng1, lat2, lng2):
-    """Calcular distancia euclidiana simple (para demostración)"""
-    return math.sqrt((lat2 - lat1)**2 + (lng2 - lng1)**2)
 
+def estimated_arrivals(route):
+    """Horas estimadas (HH:MM) de atención en orden de visita, si la ruta usó ventanas"""
+    if not route or '_eta' not in route[0]:
+        return []
+    return [timewindows.format_time(order['_eta']) for order in route]
 
-def calculate_total_distance(route):
-    """Calcular distancia total de la ruta"""
-    if len(route) < 2:
-        return 0
-
-    total = 0
-    for i in range(len(route) - 1):
-        dist = euclidean_distance(
-            route[i]['_lat'], route[i]['_lng'],
-            route[i+1]['_lat'], route[i+1]['_lng']
-        )
-        total += dist
 
-    # Convertir a km (factor arbitrario para simulación)
-    return total * 10
+def assign_coordinates(orders):
+    """
+    Asignar _lat/_lng a cada orden: las coordenadas de la orden si las trae,
+    si no, las de su dirección de entrega (geocoding.py)
+    """
+    to_geocode = [o for o in orders if o.get('latitude') is None or o.get('longitude') is None]
+    locations = geocoder.geocode_many([o.get('delivery_address', '') for o in to_geocode])
+
+    for order in orders:
+        if order.get('latitude') is not None and order.get('longitude') is not None:
+            order['_lat'], order['_lng'] = float(order['latitude']), float(order['longitude'])
+        else:
+            key = geocoding.normalize_address(order.get('delivery_address', ''))
+            order['_lat'], order['_lng'], order['_geo_source'] = locations[key]
+
+    approximate = sum(1 for o in orders if o.get('_geo_source') == 'approximate')
+    if approximate:
+        logger.warning(f"{approximate} direcciones sin distrito reconocido (ubicación aproximada)")
+
+
+def calculate_total_distance(route):
+    """Calcular distancia total de la ruta en km (haversine)"""
+    return distance.path_length([(order['_lat'], order['_lng']) for order in route])
 
 
 def response(status_code, body):
@@ -0,0 +1,137 @@
+"""
+Cache de rutas optimizadas para la Lambda de Optimización de Rutas
+
+Las herramientas de despacho reenvían el mismo conjunto de órdenes (vista
+previa, reintentos, recargas). La ruta resuelta se guarda bajo un hash
+canónico de las paradas (IDs ordenados, coordenadas, ventanas), la parada
+inicial y los parámetros del solver, en dos niveles:
+1. LRU en memoria del contenedor
+2. Tabla DynamoDB con TTL (ROUTE_CACHE_TABLE, opcional)
+
+El tiempo de optimización no forma parte de la clave: el plan guarda el
+nivel de presupuesto con el que se resolvió (budget_level, en potencias de
+2 para que la variación del tiempo restante de Lambda no cuente) y solo se
+reutiliza para requests con el mismo nivel o uno menor. Uno con más tiempo
+resuelve de nuevo y reemplaza el plan.
+"""
+
+import hashlib
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger()
+
+ROUTE_CACHE_SIZE = int(os.environ.get('ROUTE_CACHE_SIZE', '256'))
+ROUTE_CACHE_TTL_HOURS = int(os.environ.get('ROUTE_CACHE_TTL_HOURS', '24'))
+
+# Cambiar al modificar el solver de forma que cambien sus resultados
+CACHE_FORMAT_VERSION = 1
+
+
+def cache_key(start_id, stops, params):
+    """
+    Clave canónica de un problema de ruteo
+
+    Args:
+        start_id: order_id de la parada inicial (la ruta empieza ahí)
+        stops: Tuplas (order_id, lat, lng, *extra) de todas las paradas, en
+            cualquier orden
+        params: Diccionario con los parámetros del solver que afectan el
+            resultado
+
+    Returns:
+        Hash hexadecimal (igual en todo proceso y contenedor)
+    """
+    canonical = {
+        'version': CACHE_FORMAT_VERSION,
+        'start': start_id,
+        'stops': sorted(
+            [str(order_id), round(float(lat), 6), round(float(lng), 6), *extra]
+            for order_id, lat, lng, *extra in stops
+        ),
+        'params': params
+    }
+    payload = json.dumps(canonical, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=20).hexdigest()
+
+
+def budget_level(budget_ms):
+    """
+    Nivel de un presupuesto de optimización: 0 sin presupuesto (solo
+    búsqueda local), si no ceil(log2(ms)), como mínimo 1
+    """
+    if not budget_ms or budget_ms <= 0:
+        return 0
+    return max(1, math.ceil(math.log2(budget_ms)))
+
+
+class RouteCache:
+    """
+    Cache de planes de ruta con LRU en memoria y tabla persistente
+
+    Los planes son diccionarios serializables a JSON; en la tabla se guardan
+    como texto (clave cache_key, TTL en expiry).
+
+    Args:
+        dynamodb: Recurso DynamoDB (para la cache persistente)
+        table_name: Tabla de cache (None: solo memoria)
+        cache_size: Planes en el LRU en memoria
+    """
+
+    def __init__(self, dynamodb=None, table_name=None, cache_size=ROUTE_CACHE_SIZE):
+        self.dynamodb = dynamodb
+        self.table_name = table_name
+        self.cache_size = cache_size
+        self._lru = OrderedDict()
+        self.stats = {'memory': 0, 'persistent': 0, 'miss': 0}
+
+    def get(self, key):
+        """
+        Returns:
+            Tupla (plan, nivel) con nivel 'memory' o 'persistent', o
+            (None, None) si no está
+        """
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            self.stats['memory'] += 1
+            return self._lru[key], 'memory'
+
+        if self.table_name:
+            try:
+                item = self.dynamodb.Table(self.table_name).get_item(Key={'cache_key': key}).get('Item')
+            except Exception as e:
+                logger.warning(f"Error leyendo cache de rutas: {str(e)}")
+                item = None
+            # El TTL de DynamoDB borra con retraso: se ignoran los vencidos
+            if item and int(item.get('expiry', 0)) > time.time():
+                plan = json.loads(item['plan'])
+                self._remember(key, plan)
+                self.stats['persistent'] += 1
+                return plan, 'persistent'
+
+        self.stats['miss'] += 1
+        return None, None
+
+    def put(self, key, plan):
+        """Guarda un plan en memoria y, si hay tabla, en la cache persistente"""
+        self._remember(key, plan)
+        if not self.table_name:
+            return
+        try:
+            self.dynamodb.Table(self.table_name).put_item(Item={
+                'cache_key': key,
+                'plan': json.dumps(plan, separators=(',', ':')),
+                'expiry': int(time.time()) + ROUTE_CACHE_TTL_HOURS * 3600
+            })
+        except Exception as e:
+            logger.warning(f"Error guardando cache de rutas: {str(e)}")
+
+    def _remember(self, key, plan):
+        self._lru[key] = plan
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.cache_size:
+            self._lru.popitem(last=False)
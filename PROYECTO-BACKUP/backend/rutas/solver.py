@@ -0,0 +1,613 @@
+"""
+Solver de rutas para la Lambda de Optimización de Rutas
+
+1. Construcción: vecino más cercano sobre un índice espacial de grilla
+   (cada búsqueda revisa solo las celdas cercanas, no todas las paradas)
+2. Mejora: búsqueda local 2-opt + Or-opt restringida a listas de vecinos
+   cercanos, con "don't look bits" (solo se revisan las paradas cuyas
+   aristas cambiaron)
+3. Opcional, hasta un deadline: búsqueda local iterada (perturbar un tramo
+   con un double bridge acotado, volver a optimizar solo alrededor del
+   cambio y quedarse con la mejor ruta). Se corta antes si deja de mejorar
+
+reoptimize() modifica una ruta existente (paradas agregadas o canceladas)
+con inserción más barata y búsqueda local solo alrededor de los cambios.
+
+Las rutas son caminos abiertos: empiezan en una parada fija (`start`) y
+terminan en la última entrega, igual que calculate_total_distance().
+
+Con ventanas de entrega (timewindows.py) la ruta inicial respeta las franjas
+y la búsqueda local solo aplica movimientos que no hacen llegar tarde.
+"""
+
+import heapq
+import math
+import random
+import time
+from collections import deque
+
+# Vecinos candidatos por parada en la búsqueda local
+NEIGHBORS_K = 10
+
+# Largo máximo de los segmentos que mueve Or-opt
+OR_OPT_MAX_SEGMENT = 3
+
+# Mejora mínima para aceptar un movimiento (evita ciclos por redondeo)
+EPSILON = 1e-9
+
+# Búsqueda local iterada: largo máximo de cada tramo del double bridge y
+# perturbaciones seguidas sin mejora antes de cortar (al menos
+# ANYTIME_MIN_STALL; con rutas grandes, ANYTIME_STALL_PER_STOP por parada)
+PERTURBATION_MAX_SEGMENT = 30
+ANYTIME_MIN_STALL = 200
+ANYTIME_STALL_PER_STOP = 5
+
+
+class GridIndex:
+    """
+    Índice espacial de grilla uniforme sobre coordenadas planas
+
+    Args:
+        points: Lista de (x, y)
+        per_cell: Paradas promedio por celda
+    """
+
+    def __init__(self, points, per_cell=2):
+        self.points = points
+        xs = [p[0] for p in points]
+        ys = [p[1] for p in points]
+        self.min_x, self.min_y = min(xs), min(ys)
+        width, height = max(xs) - self.min_x, max(ys) - self.min_y
+
+        # Con puntos casi alineados el área tiende a 0: el lado de la celda
+        # nunca es menor que el lado largo repartido entre las celdas
+        cells = max(1, len(points) // per_cell)
+        self.cell = max(math.sqrt(width * height / cells), max(width, height) / cells) or 1.0
+        self.cols = int(width / self.cell) + 1
+        self.rows = int(height / self.cell) + 1
+
+        self.cells = {}
+        for i, (x, y) in enumerate(points):
+            self.cells.setdefault(self._cell_of(x, y), []).append(i)
+
+    def _cell_of(self, x, y):
+        return int((x - self.min_x) / self.cell), int((y - self.min_y) / self.cell)
+
+    def _ring(self, cx, cy, r):
+        """Celdas a distancia de Chebyshev exactamente r, recortadas a la grilla"""
+        if r == 0:
+            yield cx, cy
+            return
+        x0, x1 = max(cx - r, 0), min(cx + r, self.cols - 1)
+        for y in (cy - r, cy + r):
+            if 0 <= y < self.rows:
+                for x in range(x0, x1 + 1):
+                    yield x, y
+        y0, y1 = max(cy - r + 1, 0), min(cy + r - 1, self.rows - 1)
+        for x in (cx - r, cx + r):
+            if 0 <= x < self.cols:
+                for y in range(y0, y1 + 1):
+                    yield x, y
+
+    def remove(self, i):
+        self.cells[self._cell_of(*self.points[i])].remove(i)
+
+    def nearest(self, x, y):
+        """Parada más cercana a (x, y) entre las que siguen en el índice"""
+        return next(iter(self.k_nearest(x, y, 1)), None)
+
+    def k_nearest(self, x, y, k, exclude=None):
+        """
+        Las k paradas más cercanas a (x, y), de la más cercana a la más lejana
+
+        Recorre anillos de celdas alrededor del punto y se detiene cuando
+        ningún anillo siguiente puede contener una parada más cercana que la
+        k-ésima encontrada.
+        """
+        cx, cy = self._cell_of(x, y)
+        heap = []  # max-heap de (-distancia², i)
+        points = self.points
+        # El punto puede estar fuera de la grilla: los anillos deben alcanzarla
+        outside = max(0, -cx, cx - self.cols + 1, -cy, cy - self.rows + 1)
+        max_r = max(self.cols, self.rows) + outside
+
+        for r in range(max_r + 1):
+            for key in self._ring(cx, cy, r):
+                for i in self.cells.get(key, ()):
+                    if i == exclude:
+                        continue
+                    px, py = points[i]
+                    d = (px - x) ** 2 + (py - y) ** 2
+                    if len(heap) < k:
+                        heapq.heappush(heap, (-d, i))
+                    elif d < -heap[0][0]:
+                        heapq.heapreplace(heap, (-d, i))
+            # Todo punto fuera de los anillos 0..r está a más de r * cell
+            if len(heap) == k and -heap[0][0] <= (r * self.cell) ** 2:
+                break
+
+        return [i for _, i in sorted(heap, reverse=True)]
+
+
+def neighbor_lists(points, dist, k=NEIGHBORS_K):
+    """
+    Lista de los k vecinos más cercanos de cada parada, ordenada por `dist`
+
+    Los candidatos salen del índice de grilla (distancia plana) y se
+    reordenan con la métrica real de la ruta.
+    """
+    if len(points) < 2:
+        return [[] for _ in points]
+
+    grid = GridIndex(points)
+    k = min(k, len(points) - 1)
+    return [
+        sorted(grid.k_nearest(x, y, k, exclude=i), key=lambda j, i=i: dist(i, j))
+        for i, (x, y) in enumerate(points)
+    ]
+
+
+def nearest_neighbor_tour(points, start=0):
+    """Ruta inicial: desde `start`, siempre a la parada pendiente más cercana"""
+    grid = GridIndex(points)
+    tour = [start]
+    grid.remove(start)
+
+    for _ in range(len(points) - 1):
+        x, y = points[tour[-1]]
+        nxt = grid.nearest(x, y)
+        grid.remove(nxt)
+        tour.append(nxt)
+
+    return tour
+
+
+def route_length(tour, dist):
+    """Largo del camino abierto tour[0] -> ... -> tour[-1]"""
+    return sum(dist(tour[p], tour[p + 1]) for p in range(len(tour) - 1))
+
+
+class LocalSearch:
+    """
+    Mejora una ruta con 2-opt y Or-opt sobre listas de vecinos
+
+    Trabaja sobre un arreglo de paradas (tour) y su arreglo inverso de
+    posiciones (pos). La posición 0 (inicio de la ruta) nunca se mueve; el
+    final es libre, así que una arista "hacia None" cuesta 0.
+
+    Los vecinos que no están en la ruta se ignoran, así que se pueden usar
+    listas de vecinos globales para mejorar una ruta de un subconjunto de
+    paradas (por ejemplo, la de un vehículo de la flota).
+
+    Args:
+        tour: Ruta inicial (se modifica en el lugar)
+        dist: Función dist(i, j)
+        neighbors: neighbors[i] = vecinos de i ordenados por distancia
+        schedule: timewindows.Schedule de la misma ruta (opcional); cada
+            movimiento se verifica con él antes de aplicarse
+    """
+
+    def __init__(self, tour, dist, neighbors, schedule=None):
+        self.tour = tour
+        self.dist = dist
+        self.neighbors = neighbors
+        self.schedule = schedule
+        self.pos = [-1] * max(len(neighbors), max(tour) + 1)
+        for p, node in enumerate(tour):
+            self.pos[node] = p
+        self.moves = 0
+        self.gain = 0.0
+
+    def _cost(self, a, b):
+        return 0.0 if a is None or b is None else self.dist(a, b)
+
+    def _succ(self, p):
+        return self.tour[p + 1] if p + 1 < len(self.tour) else None
+
+    def _reverse(self, i, j):
+        """Invierte tour[i..j] (inclusive) y actualiza las posiciones"""
+        tour, pos = self.tour, self.pos
+        tour[i:j + 1] = tour[i:j + 1][::-1]
+        for p in range(i, j + 1):
+            pos[tour[p]] = p
+
+    def run(self, nodes=None):
+        """
+        Aplica movimientos que acortan la ruta hasta llegar a un óptimo local
+
+        Args:
+            nodes: Paradas a revisar primero (por defecto, todas)
+
+        Returns:
+            Número de movimientos aplicados
+        """
+        queue = deque(self.tour if nodes is None else (n for n in nodes if n is not None))
+        queued = set(queue)
+
+        while queue:
+            a = queue.popleft()
+            queued.discard(a)
+
+            touched = self._two_opt(a) or self._or_opt(a)
+            if touched:
+                self.moves += 1
+                if self.schedule is not None:
+                    self.schedule.refresh()
+                for node in touched:
+                    if node is not None and node not in queued:
+                        queue.append(node)
+                        queued.add(node)
+
+        return self.moves
+
+    def _two_opt(self, a):
+        """
+        Busca un 2-opt que agregue la arista (a, c) con c vecino de a
+
+        Returns:
+            Paradas cuyas aristas cambiaron, o None si no hubo mejora
+        """
+        tour, pos, dist = self.tour, self.pos, self.dist
+        i = pos[a]
+
+        # Sucesores: quitar (a, b) y (c, sc), agregar (a, c) y (b, sc)
+        if i + 1 < len(tour):
+            b = tour[i + 1]
+            d_ab = dist(a, b)
+            for c in self.neighbors[a]:
+                d_ac = dist(a, c)
+                if d_ac >= d_ab:
+                    break
+                j = pos[c]
+                if j < 0:
+                    continue
+                sc = self._succ(j)
+                if c == b or sc == a:
+                    continue
+                gain = d_ab + self._cost(c, sc) - d_ac - self._cost(b, sc)
+                if gain > EPSILON:
+                    lo, hi = (i + 1, j) if j > i else (j + 1, i)
+                    if self.schedule is not None and not self.schedule.allows_reversal(lo, hi):
+                        continue
+                    self._reverse(lo, hi)
+                    self.gain += gain
+                    return a, b, c, sc
+
+        # Predecesores: quitar (p, a) y (pc, c), agregar (a, c) y (p, pc)
+        if i > 0:
+            p = tour[i - 1]
+            d_pa = dist(p, a)
+            for c in self.neighbors[a]:
+                d_ac = dist(a, c)
+                if d_ac >= d_pa:
+                    break
+                j = pos[c]
+                if j <= 0 or c == p:
+                    continue
+                pc = tour[j - 1]
+                if pc == a:
+                    continue
+                gain = d_pa + dist(pc, c) - d_ac - dist(p, pc)
+                if gain > EPSILON:
+                    lo, hi = (i, j - 1) if j > i else (j, i - 1)
+                    if self.schedule is not None and not self.schedule.allows_reversal(lo, hi):
+                        continue
+                    self._reverse(lo, hi)
+                    self.gain += gain
+                    return a, p, c, pc
+
+        return None
+
+    def _or_opt(self, a):
+        """
+        Busca mover el segmento que empieza en a (1 a OR_OPT_MAX_SEGMENT
+        paradas) junto a un vecino de alguno de sus extremos, en cualquier
+        orientación
+
+        Returns:
+            Paradas cuyas aristas cambiaron, o None si no hubo mejora
+        """
+        tour, pos, dist = self.tour, self.pos, self.dist
+        n = len(tour)
+        i = pos[a]
+        if i == 0:
+            return None
+
+        for length in range(1, OR_OPT_MAX_SEGMENT + 1):
+            last = i + length - 1
+            if last >= n:
+                break
+            s0, s1 = tour[i], tour[last]
+            p, nx = tour[i - 1], self._succ(last)
+            removal_gain = dist(p, s0) + self._cost(s1, nx) - self._cost(p, nx)
+            if removal_gain <= EPSILON:
+                continue
+
+            for end, other in ((s0, s1), (s1, s0)):
+                for c in self.neighbors[end]:
+                    d_ec = dist(end, c)
+                    if d_ec >= removal_gain:
+                        break
+                    j = pos[c]
+                    if j < 0 or i <= j <= last:
+                        continue
+
+                    # c, end ... other, sc
+                    if c != p:
+                        sc = self._succ(j)
+                        delta = d_ec + self._cost(other, sc) - self._cost(c, sc)
+                        if delta < removal_gain - EPSILON and self._segment_fits(
+                                i, length, j, j + 1 if sc is not None else None, first=end):
+                            self._move_segment(i, length, c, after=True, first=end)
+                            self.gain += removal_gain - delta
+                            return p, nx, c, sc, s0, s1
+
+                    # pc, other ... end, c
+                    if j > 0 and c != nx:
+                        pc = tour[j - 1]
+                        delta = d_ec + dist(pc, other) - dist(pc, c)
+                        if delta < removal_gain - EPSILON and self._segment_fits(
+                                i, length, j - 1, j, first=other):
+                            self._move_segment(i, length, c, after=False, first=other)
+                            self.gain += removal_gain - delta
+                            return p, nx, c, pc, s0, s1
+
+        return None
+
+    def _segment_fits(self, i, length, u_pos, v_pos, first):
+        """¿Respeta las ventanas insertar tour[i:i+length] entre u_pos y v_pos?"""
+        if self.schedule is None:
+            return True
+        segment = self.tour[i:i + length]
+        if segment[0] != first:
+            segment.reverse()
+        return self.schedule.allows_path(u_pos, segment, v_pos)
+
+    def _move_segment(self, i, length, c, after, first):
+        """
+        Saca tour[i:i+length] y lo reinserta junto a c
+
+        Args:
+            after: Insertar después de c (si no, antes)
+            first: Parada del segmento que queda primera tras la inserción
+        """
+        tour, pos = self.tour, self.pos
+        segment = tour[i:i + length]
+        if segment[0] != first:
+            segment.reverse()
+
+        del tour[i:i + length]
+        j = pos[c] - (length if pos[c] > i else 0)
+        insert_at = j + 1 if after else j
+        tour[insert_at:insert_at] = segment
+
+        for p in range(min(i, insert_at), min(max(i + length, insert_at + length), len(tour))):
+            pos[tour[p]] = p
+
+    def perturb(self, rng):
+        """
+        Double bridge acotado: A B C D -> A C B D con B y C de hasta
+        PERTURBATION_MAX_SEGMENT paradas (D puede ser vacío)
+
+        Returns:
+            Paradas cuyas aristas cambiaron
+        """
+        tour, pos, n = self.tour, self.pos, len(self.tour)
+        i = rng.randrange(1, n - 1)
+        j = min(n - 1, i + rng.randint(1, PERTURBATION_MAX_SEGMENT))
+        k = min(n, j + rng.randint(1, PERTURBATION_MAX_SEGMENT))
+
+        a, b0, b1, c0, c1 = tour[i - 1], tour[i], tour[j - 1], tour[j], tour[k - 1]
+        d0 = tour[k] if k < n else None
+        self.gain -= (self.dist(a, c0) + self.dist(c1, b0) + self._cost(b1, d0)
+                      - self.dist(a, b0) - self.dist(b1, c0) - self._cost(c1, d0))
+
+        tour[i:k] = tour[j:k] + tour[i:j]
+        for p in range(i, k):
+            pos[tour[p]] = p
+        return a, b0, b1, c0, c1, d0
+
+    def restore(self, tour, gain):
+        """Vuelve a una ruta guardada (con su ganancia acumulada)"""
+        self.tour[:] = tour
+        for p, node in enumerate(self.tour):
+            self.pos[node] = p
+        self.gain = gain
+        if self.schedule is not None:
+            self.schedule.refresh()
+
+    def improve_until(self, deadline, max_stall, seed=0):
+        """
+        Búsqueda local iterada hasta `deadline` (time.monotonic()) o hasta
+        max_stall perturbaciones seguidas sin mejora
+
+        Cada iteración perturba la mejor ruta y reoptimiza solo las paradas
+        afectadas; si no mejora, se vuelve a la mejor. Con ventanas, una
+        perturbación que haga llegar tarde se descarta sin reoptimizar.
+        La semilla fija hace que el resultado sea reproducible.
+
+        Returns:
+            Número de iteraciones
+        """
+        if len(self.tour) < 4:
+            return 0
+
+        rng = random.Random(seed)
+        best_tour, best_gain = list(self.tour), self.gain
+        iterations = stall = 0
+
+        while stall < max_stall and time.monotonic() < deadline:
+            iterations += 1
+            stall += 1
+            touched = self.perturb(rng)
+            if self.schedule is not None:
+                self.schedule.refresh()
+                if not self.schedule.within_limits():
+                    self.restore(best_tour, best_gain)
+                    continue
+
+            self.run(touched)
+            if self.gain > best_gain + EPSILON:
+                best_tour, best_gain, stall = list(self.tour), self.gain, 0
+            else:
+                self.restore(best_tour, best_gain)
+
+        return iterations
+
+
+def solve(points, dist, start=0, neighbors=None, time_windows=None, deadline=None):
+    """
+    Calcula una ruta corta que visita todos los puntos empezando en `start`
+
+    Args:
+        points: Coordenadas planas (x, y) de cada parada, para el índice
+        dist: Función dist(i, j) con la métrica de la ruta
+        start: Índice de la parada inicial
+        neighbors: Listas de vecinos precalculadas (opcional)
+        time_windows: timewindows.TimeWindows de las paradas (opcional)
+        deadline: time.monotonic() hasta el que se sigue mejorando la ruta
+            con búsqueda local iterada (None: solo búsqueda local)
+
+    Returns:
+        Diccionario con tour (índices en orden de visita), initial_length,
+        local_search_length, length, moves e iterations; con ventanas,
+        también begin (inicio de la atención por posición, en minutos) y
+        late (paradas atendidas tarde)
+    """
+    if time_windows is not None:
+        tour = time_windows.initial_tour(points, start)
+    elif len(points) < 3:
+        tour = [start] + [i for i in range(len(points)) if i != start]
+    else:
+        tour = nearest_neighbor_tour(points, start)
+    initial_length = route_length(tour, dist)
+
+    moves = iterations = 0
+    local_search_length = initial_length
+    if len(points) >= 3:
+        if neighbors is None:
+            neighbors = neighbor_lists(points, dist)
+        schedule = time_windows.schedule(tour, dist) if time_windows is not None else None
+        search = LocalSearch(tour, dist, neighbors, schedule)
+        search.run()
+        local_search_length = initial_length - search.gain
+        if deadline is not None:
+            max_stall = max(ANYTIME_MIN_STALL, ANYTIME_STALL_PER_STOP * len(points))
+            iterations = search.improve_until(deadline, max_stall)
+        moves = search.moves
+
+    result = {
+        'tour': tour,
+        'initial_length': initial_length,
+        'local_search_length': local_search_length,
+        'length': route_length(tour, dist),
+        'moves': moves,
+        'iterations': iterations
+    }
+
+    if time_windows is not None:
+        schedule = time_windows.schedule(tour, dist)
+        result['begin'] = schedule.begin
+        result['late'] = schedule.late_stops()
+
+    return result
+
+
+def cheapest_insertion(tour, nodes, dist, time_windows=None):
+    """
+    Inserta cada nodo de `nodes`, en orden, donde menos alarga la ruta
+    (nunca antes de tour[0])
+
+    Con ventanas solo se consideran posiciones que no hacen llegar tarde
+    (verificación en tiempo constante con la holgura de cada posición); si
+    un nodo no tiene ninguna, se inserta donde menos alarga la ruta.
+
+    Returns:
+        Nodos insertados sin posición factible
+    """
+    def cost(a, b):
+        return 0.0 if b is None else dist(a, b)
+
+    schedule = time_windows.schedule(tour, dist) if time_windows is not None else None
+    infeasible = []
+    for node in nodes:
+        best = best_any = None
+        for p in range(1, len(tour) + 1):
+            prev, nxt = tour[p - 1], tour[p] if p < len(tour) else None
+            delta = dist(prev, node) + cost(node, nxt) - cost(prev, nxt)
+            if best_any is None or delta < best_any[0]:
+                best_any = (delta, p)
+            if best is not None and delta >= best[0]:
+                continue
+            if schedule is None or schedule.allows_path(p - 1, [node], p if nxt is not None else None):
+                best = (delta, p)
+
+        tour.insert((best or best_any)[1], node)
+        if best is None:
+            infeasible.append(node)
+            if schedule is not None:
+                # El atraso inevitable pasa a ser el límite de las siguientes inserciones
+                schedule = time_windows.schedule(tour, dist)
+        elif schedule is not None:
+            schedule.refresh()
+
+    return infeasible
+
+
+def reoptimize(dist, tour, insert=(), remove=(), neighbors=None, time_windows=None):
+    """
+    Agrega y quita paradas de una ruta ya optimizada sin resolverla de nuevo
+
+    Las paradas canceladas se sacan, las nuevas se insertan con
+    cheapest_insertion() y la búsqueda local revisa solo las paradas
+    alrededor de los cambios. Si se quita tour[0], la ruta empieza en la
+    siguiente parada.
+
+    Args:
+        dist: Función dist(i, j)
+        tour: Ruta actual (no se modifica)
+        insert: Nodos nuevos
+        remove: Nodos a quitar
+        neighbors: Listas de vecinos de todos los nodos (incluidos los nuevos)
+        time_windows: timewindows.TimeWindows de todos los nodos (opcional)
+
+    Returns:
+        Diccionario con tour, initial_length (ruta original), length, moves
+        e infeasible (nodos nuevos sin posición factible); con ventanas,
+        también begin y late como solve()
+    """
+    remove = set(remove)
+    touched = []
+    for p, node in enumerate(tour):
+        if node in remove:
+            touched.extend(tour[max(p - 1, 0):p + 2])
+
+    new_tour = [node for node in tour if node not in remove]
+    insert = [node for node in insert if node not in remove]
+    if not new_tour and insert:
+        new_tour, insert = [insert[0]], insert[1:]
+
+    result = {'initial_length': route_length(tour, dist), 'moves': 0, 'infeasible': []}
+
+    if new_tour:
+        result['infeasible'] = cheapest_insertion(new_tour, insert, dist, time_windows)
+
+        for node in insert:
+            p = new_tour.index(node)
+            touched.extend(new_tour[max(p - 1, 0):p + 2])
+
+        if len(new_tour) >= 3 and neighbors is not None:
+            # Horario nuevo: el límite relajado incluye los atrasos que ya no se pudieron evitar
+            schedule = time_windows.schedule(new_tour, dist) if time_windows is not None else None
+            search = LocalSearch(new_tour, dist, neighbors, schedule)
+            result['moves'] = search.run([node for node in touched if node not in remove])
+
+    result['tour'] = new_tour
+    result['length'] = route_length(new_tour, dist)
+
+    if time_windows is not None:
+        schedule = time_windows.schedule(new_tour, dist) if new_tour else None
+        result['begin'] = schedule.begin if schedule else []
+        result['late'] = schedule.late_stops() if schedule else []
+
+    return result
@@ -0,0 +1,61 @@
+"""
+Tests unitarios para el motor de distancias
+"""
+
+import random
+import pytest
+import sys
+import os
+
+# Configurar path para importar el módulo
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import distance
+
+
+def lima_coords(n, seed):
+    rng = random.Random(seed)
+    return [(-12.05 + rng.gauss(0, 0.05), -77.03 + rng.gauss(0, 0.05)) for _ in range(n)]
+
+
+class TestDistanceEngine:
+    """Tests para distancias haversine y listas de vecinos"""
+
+    def test_known_distance(self):
+        """Test: Plaza de Armas de Lima -> Callao (~8.3 km)"""
+
+        km = distance.path_length([(-12.0464, -77.0428), (-12.0566, -77.1181)])
+
+        assert km == pytest.approx(8.27, abs=0.05)
+
+    def test_matrix_and_on_the_fly_agree(self, monkeypatch):
+        """Test: Con y sin matriz precalculada se obtienen las mismas distancias y vecinos"""
+
+        coords = lima_coords(200, seed=1)
+        with_matrix = distance.DistanceEngine(coords)
+
+        monkeypatch.setattr(distance, 'MATRIX_MAX_STOPS', 0)
+        without_matrix = distance.DistanceEngine(coords)
+
+        assert with_matrix.matrix is not None and without_matrix.matrix is None
+        for i, j in [(0, 1), (5, 150), (199, 42)]:
+            assert with_matrix.dist(i, j) == pytest.approx(without_matrix.dist(i, j))
+        assert with_matrix.neighbor_lists(5) == without_matrix.neighbor_lists(5)
+
+        tour = list(range(200))
+        assert with_matrix.route_length(tour) == pytest.approx(without_matrix.route_length(tour))
+        assert with_matrix.route_length(tour) == pytest.approx(distance.path_length(coords))
+
+    def test_neighbor_lists_exclude_self(self):
+        """Test: Una parada no es vecina de sí misma, aunque haya coordenadas repetidas"""
+
+        coords = [(-12.1, -77.0)] * 5 + lima_coords(10, seed=2)
+        neighbors = distance.DistanceEngine(coords).neighbor_lists(4)
+
+        assert all(i not in row and len(row) == 4 for i, row in enumerate(neighbors))
+
+
+# Para ejecutar tests:
+# pytest tests/test_distance.py -v
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,121 @@
+"""
+Tests unitarios para la planificación de flota
+"""
+
+import random
+import pytest
+import sys
+import os
+
+# Configurar path para importar el módulo
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import distance
+import fleet
+
+DEPOT = (-12.08, -77.03)
+
+
+def lima_stops(n, seed):
+    rng = random.Random(seed)
+    coords = [(-12.08 + rng.uniform(-0.12, 0.12), -77.03 + rng.uniform(-0.10, 0.10)) for _ in range(n)]
+    demands = [rng.randint(1, 5) for _ in range(n)]
+    return coords, demands
+
+
+def fail_on_seven(task):
+    if 7 in task:
+        raise ValueError('tarea inválida')
+    return sum(task)
+
+
+class TestFleet:
+    """Tests para partición, resolución en paralelo y mejora entre rutas"""
+
+    def test_sweep_respects_capacity(self):
+        """Test: Ningún vehículo supera su capacidad; lo que no cabe queda sin asignar"""
+
+        coords, demands = lima_stops(60, seed=1)
+        capacities = [40, 40, 30]
+
+        assignments, unassigned = fleet.sweep_partition(DEPOT, coords, demands, capacities)
+
+        for stops, capacity in zip(assignments, capacities):
+            assert sum(demands[i] for i in stops) <= capacity
+        assigned = [i for stops in assignments for i in stops]
+        assert sorted(assigned + unassigned) == list(range(60))
+        assert sum(demands) > sum(capacities) and unassigned
+
+    def test_plan_covers_every_stop_once(self):
+        """Test: Cada parada en exactamente una ruta, cargas dentro de capacidad"""
+
+        coords, demands = lima_stops(150, seed=2)
+        capacities = [120, 120, 120, 120]
+
+        plan = fleet.plan_fleet(DEPOT, coords, demands, capacities, workers=1)
+
+        visited = [i for route in plan['routes'] for i in route]
+        assert sorted(visited) == list(range(150)) and not plan['unassigned']
+        for route, load, capacity in zip(plan['routes'], plan['loads'], capacities):
+            assert load == sum(demands[i] for i in route) <= capacity
+        assert plan['length'] <= plan['initial_length'] + 1e-6
+
+        for route, km in zip(plan['routes'], plan['distances']):
+            assert km == pytest.approx(distance.path_length([DEPOT] + [coords[i] for i in route]))
+
+    def test_plan_with_short_fleet_keeps_unassigned_out(self):
+        """Test: Con demanda mayor que la capacidad de la flota, las paradas sin asignar no entran en las rutas"""
+
+        coords, demands = lima_stops(40, seed=4)
+        capacities = [20, 20]
+        assert sum(demands) > sum(capacities)
+
+        plan = fleet.plan_fleet(DEPOT, coords, demands, capacities, workers=1)
+
+        visited = [i for route in plan['routes'] for i in route]
+        assert plan['unassigned'] and not set(visited) & set(plan['unassigned'])
+        assert sorted(visited + plan['unassigned']) == list(range(40))
+        for route, load, capacity in zip(plan['routes'], plan['loads'], capacities):
+            assert load == sum(demands[i] for i in route) <= capacity
+
+    def test_parallel_matches_sequential(self):
+        """Test: Resolver en procesos da el mismo plan que en serie"""
+
+        coords, demands = lima_stops(200, seed=3)
+        capacities = [160, 160, 160, 160]
+
+        sequential = fleet.plan_fleet(DEPOT, coords, demands, capacities, workers=1)
+        parallel = fleet.plan_fleet(DEPOT, coords, demands, capacities, workers=3)
+
+        assert parallel['routes'] == sequential['routes']
+
+    def test_parallel_map_reports_worker_errors(self):
+        """Test: Un error en un proceso se propaga con su traceback"""
+
+        assert fleet.parallel_map(fail_on_seven, [[1], [2, 3], [4, 5, 6]], workers=2) == [1, 5, 15]
+
+        with pytest.raises(RuntimeError, match='tarea inválida'):
+            fleet.parallel_map(fail_on_seven, [[1], [7], [3]], workers=2)
+
+    def test_inter_route_moves_reduce_distance(self):
+        """Test: Dos paradas en la ruta equivocada se pasan a la ruta cercana"""
+
+        # Nodos: 0 depósito, 1-2 al norte, 3-4 al sur; rutas cruzadas
+        coords = [(-12.0, -77.0), (-11.9, -77.0), (-11.91, -77.0), (-12.1, -77.0), (-12.11, -77.0)]
+        engine = distance.DistanceEngine(coords)
+        routes = [[0, 1, 3], [0, 4, 2]]
+        before = sum(engine.route_length(r) for r in routes)
+
+        search = fleet.InterRouteSearch(routes, engine.dist, engine.neighbor_lists(),
+                                        [0, 1, 1, 1, 1], [2, 2])
+        search.run()
+
+        assert sorted(sorted(r[1:]) for r in routes) == [[1, 2], [3, 4]]
+        assert sum(engine.route_length(r) for r in routes) < before
+        assert search.loads == [2, 2]
+
+
+# Para ejecutar tests:
+# pytest tests/test_fleet.py -v
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,128 @@
+"""
+Tests unitarios para la geocodificación de direcciones
+"""
+
+import subprocess
+import pytest
+import sys
+import os
+
+# Configurar path para importar el módulo
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import geocoding
+
+
+class FakeDynamoDB:
+    """batch_get_item / batch_write_item sobre un diccionario"""
+
+    def __init__(self):
+        self.items = {}
+        self.calls = 0
+
+    def batch_get_item(self, RequestItems):
+        self.calls += 1
+        (name, request), = RequestItems.items()
+        found = [self.items[k['address_key']] for k in request['Keys'] if k['address_key'] in self.items]
+        return {'Responses': {name: found}}
+
+    def batch_write_item(self, RequestItems):
+        self.calls += 1
+        for requests in RequestItems.values():
+            for request in requests:
+                item = request['PutRequest']['Item']
+                self.items[item['address_key']] = item
+        return {}
+
+
+class TestGeocoding:
+    """Tests para normalización, resolvers y niveles de cache"""
+
+    def test_normalize_address(self):
+        """Test: Variantes de la misma dirección comparten clave"""
+
+        assert geocoding.normalize_address('Av. Javier Prado 123, San Isidro') == \
+            geocoding.normalize_address('  AVENIDA  javier prado 123 - san isidro ')
+        assert geocoding.normalize_address('Jr. Huánuco 456, Breña') == 'jiron huanuco 456 brena'
+
+    def test_gazetteer_prefers_longest_district(self):
+        """Test: "San Juan de Miraflores" no se confunde con "Miraflores\""""
+
+        _, _, source = geocoding.gazetteer_resolver(
+            geocoding.normalize_address('Av. Los Héroes 100, San Juan de Miraflores'))
+        assert source == 'gazetteer:san juan de miraflores'
+
+        lat, lng, source = geocoding.gazetteer_resolver(
+            geocoding.normalize_address('Calle Schell 200, Miraflores'))
+        assert source == 'gazetteer:miraflores'
+        assert lat == pytest.approx(-12.1211, abs=0.02) and lng == pytest.approx(-77.0297, abs=0.02)
+
+        assert geocoding.gazetteer_resolver('calle sin distrito 1') is None
+
+    def test_coordinates_are_stable_across_processes(self):
+        """Test: La misma dirección da las mismas coordenadas con otra semilla de hash()"""
+
+        address = 'Av. Arequipa 2450, Lince'
+        code = (f"import sys; sys.path.insert(0, {os.path.dirname(geocoding.__file__)!r}); "
+                f"import geocoding; print(geocoding.Geocoder().geocode({address!r}))")
+        outputs = {
+            subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                           env=dict(os.environ, PYTHONHASHSEED=seed), check=True).stdout
+            for seed in ('1', '2', '3')
+        }
+
+        assert len(outputs) == 1
+        assert outputs.pop().strip() == str(geocoding.Geocoder().geocode(address))
+
+    def test_cache_levels(self):
+        """Test: Primero LRU, luego tabla persistente, luego resolver (y se guarda)"""
+
+        dynamodb = FakeDynamoDB()
+        resolved = []
+
+        def resolver(key):
+            resolved.append(key)
+            return -12.1, -77.0, 'test'
+
+        first = geocoding.Geocoder(dynamodb=dynamodb, table_name='geo', resolvers=[resolver])
+        first.geocode_many(['Calle A 1', 'calle a 1', 'Calle B 2'])
+        assert resolved == ['calle a 1', 'calle b 2']
+        assert set(dynamodb.items) == {'calle a 1', 'calle b 2'}
+
+        # Mismo contenedor: LRU, sin llamadas a DynamoDB ni al resolver
+        calls = dynamodb.calls
+        first.geocode('CALLE A 1')
+        assert dynamodb.calls == calls and len(resolved) == 2
+
+        # Otro contenedor: tabla persistente, sin resolver
+        second = geocoding.Geocoder(dynamodb=dynamodb, table_name='geo', resolvers=[resolver])
+        assert second.geocode('Calle B 2') == (-12.1, -77.0, 'test')
+        assert len(resolved) == 2
+        assert second.stats['persistent'] == 1
+
+
+    def test_empty_address_skips_persistent_cache(self):
+        """Test: Una dirección vacía no llega a la tabla (DynamoDB rechazaría el lote)"""
+
+        class StrictDynamoDB(FakeDynamoDB):
+            def batch_get_item(self, RequestItems):
+                (name, request), = RequestItems.items()
+                assert all(k['address_key'] for k in request['Keys'])
+                return super().batch_get_item(RequestItems)
+
+            def batch_write_item(self, RequestItems):
+                assert all(r['PutRequest']['Item']['address_key'] for rs in RequestItems.values() for r in rs)
+                return super().batch_write_item(RequestItems)
+
+        dynamodb = StrictDynamoDB()
+        geocoder = geocoding.Geocoder(dynamodb=dynamodb, table_name='geo')
+        found = geocoder.geocode_many(['', 'Av. Larco 123, Miraflores'])
+
+        assert '' in found
+        assert set(dynamodb.items) == {geocoding.normalize_address('Av. Larco 123, Miraflores')}
+        assert geocoder.stats['persistent'] == 0
+
+# Para ejecutar tests:
+# pytest tests/test_geocoding.py -v
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
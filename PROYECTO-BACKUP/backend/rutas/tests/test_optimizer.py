@@ -0,0 +1,362 @@
+"""
+Tests unitarios para la función Lambda de Optimización de Rutas
+"""
+
+import json
+import time
+import pytest
+import sys
+import os
+
+# Configurar path para importar el módulo y los compartidos (backend/common)
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'common'))
+
+# Mock de variables de entorno
+os.environ['ROUTES_TABLE'] = 'test-routes-table'
+os.environ['ORDERS_TABLE'] = 'test-orders-table'
+os.environ['ENVIRONMENT'] = 'test'
+
+# Importar después de configurar env vars
+import optimizer
+
+
+class TestOptimizeRoute:
+    """Tests para el endpoint de optimización de rutas"""
+
+    def test_optimize_route_success(self, monkeypatch):
+        """Test: La ruta incluye todas las órdenes y se guarda"""
+
+        orders = {
+            f'ORD-{n}': {'order_id': f'ORD-{n}', 'delivery_address': f'Av. Arequipa {n * 100}, Lima'}
+            for n in range(30)
+        }
+        saved = {}
+
+        def mock_query(**kwargs):
+            order_id = kwargs['ExpressionAttributeValues'][':oid']
+            return {'Items': [dict(orders[order_id])]}
+
+        def mock_put_item(**kwargs):
+            saved.update(kwargs['Item'])
+            return {}
+
+        monkeypatch.setattr('optimizer.orders_table.query', mock_query)
+        monkeypatch.setattr('optimizer.routes_table.put_item', mock_put_item)
+
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({'order_ids': list(orders), 'driver_id': 'DRV-1'})
+        }
+
+        response = optimizer.handler(event, None)
+
+        assert response['statusCode'] == 200
+        body = json.loads(response['body'])
+        assert body['stops'] == 30
+        assert body['order_sequence'][0] == 'ORD-0'
+        assert sorted(body['order_sequence']) == sorted(orders)
+        assert saved['order_ids'] == body['order_sequence']
+
+    def test_optimize_route_with_delivery_windows(self, monkeypatch):
+        """Test: Con ventanas de entrega la ruta las respeta e informa horas estimadas"""
+
+        orders = {
+            'ORD-0': {'order_id': 'ORD-0', 'latitude': -12.10, 'longitude': -77.03},
+            'ORD-1': {'order_id': 'ORD-1', 'latitude': -12.101, 'longitude': -77.03,
+                      'delivery_window': {'start': '15:00', 'end': '17:00'}, 'service_minutes': 10},
+            'ORD-2': {'order_id': 'ORD-2', 'latitude': -12.13, 'longitude': -77.03,
+                      'delivery_window': {'start': '08:00', 'end': '10:00'}, 'service_minutes': 10},
+        }
+        saved = {}
+
+        def mock_query(**kwargs):
+            return {'Items': [dict(orders[kwargs['ExpressionAttributeValues'][':oid']])]}
+
+        monkeypatch.setattr('optimizer.orders_table.query', mock_query)
+        monkeypatch.setattr('optimizer.routes_table.put_item', lambda **kwargs: saved.update(kwargs['Item']))
+
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({'order_ids': list(orders), 'driver_id': 'DRV-1', 'start_time': '08:30'})
+        }
+
+        response = optimizer.handler(event, None)
+
+        assert response['statusCode'] == 200
+        body = json.loads(response['body'])
+        assert body['order_sequence'] == ['ORD-0', 'ORD-2', 'ORD-1']
+        assert body['estimated_arrivals'][0] == '08:30' and body['estimated_arrivals'][2] == '15:00'
+        assert body['late_order_ids'] == []
+        assert saved['estimated_arrivals'] == body['estimated_arrivals']
+
+        event['body'] = json.dumps({'order_ids': ['ORD-0'], 'driver_id': 'DRV-1', 'start_time': '8h'})
+        assert optimizer.handler(event, None)['statusCode'] == 400
+
+    def test_optimize_route_uses_time_budget(self, monkeypatch):
+        """Test: El deadline sale del contexto de la Lambda (menos el margen) o de time_budget_ms"""
+
+        class Context:
+            def get_remaining_time_in_millis(self):
+                return 60_000
+
+        body = {'order_ids': ['ORD-1']}
+        start = time.monotonic()
+        assert optimizer.solve_deadline(body, None) is None
+        assert optimizer.solve_deadline(body, Context()) == pytest.approx(
+            start + (60_000 - optimizer.OPTIMIZER_TIME_MARGIN_MS) / 1000, abs=0.5)
+        assert optimizer.solve_deadline(dict(body, time_budget_ms=300), Context()) == pytest.approx(
+            start + 0.3, abs=0.5)
+
+        orders = {
+            f'ORD-{n}': {'order_id': f'ORD-{n}', 'latitude': -12.08 + (n * 7919 % 97) / 1000,
+                         'longitude': -77.03 + (n * 104729 % 89) / 1000}
+            for n in range(60)
+        }
+        monkeypatch.setattr('optimizer.orders_table.query', lambda **kwargs: {
+            'Items': [dict(orders[kwargs['ExpressionAttributeValues'][':oid']])]})
+        monkeypatch.setattr('optimizer.routes_table.put_item', lambda **kwargs: {})
+
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({'order_ids': list(orders), 'driver_id': 'DRV-1', 'time_budget_ms': 2000})
+        }
+        response = optimizer.handler(event, Context())
+
+        assert response['statusCode'] == 200
+        stats = json.loads(response['body'])['optimization']
+        assert stats['iterations'] > 0 and stats['improvement_km'] > 0
+        assert stats['elapsed_ms'] < 2000
+
+        event['body'] = json.dumps({'order_ids': ['ORD-1'], 'driver_id': 'DRV-1', 'time_budget_ms': -1})
+        assert optimizer.handler(event, Context())['statusCode'] == 400
+
+    def test_optimize_route_reuses_cached_plan(self, monkeypatch):
+        """Test: El mismo conjunto de órdenes (en otro orden) no se resuelve de nuevo"""
+
+        orders = {
+            f'ORD-{n}': {'order_id': f'ORD-{n}', 'latitude': -12.08 + (n * 7919 % 97) / 1000,
+                         'longitude': -77.03 + (n * 104729 % 89) / 1000}
+            for n in range(20)
+        }
+        monkeypatch.setattr('optimizer.orders_table.query', lambda **kwargs: {
+            'Items': [dict(orders[kwargs['ExpressionAttributeValues'][':oid']])]})
+        monkeypatch.setattr('optimizer.routes_table.put_item', lambda **kwargs: {})
+        monkeypatch.setattr('optimizer.route_cache', optimizer.routecache.RouteCache())
+
+        order_ids = list(orders)
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({'order_ids': order_ids, 'driver_id': 'DRV-1'})
+        }
+        first = json.loads(optimizer.handler(event, None)['body'])
+        assert first['optimization']['cache'] == 'miss'
+
+        def fail_solve(*args, **kwargs):
+            raise AssertionError('solve no debería llamarse')
+
+        monkeypatch.setattr('optimizer.solver.solve', fail_solve)
+        event['body'] = json.dumps({'order_ids': order_ids[:1] + order_ids[:0:-1], 'driver_id': 'DRV-2'})
+        second = json.loads(optimizer.handler(event, None)['body'])
+
+        assert second['optimization']['cache'] == 'memory'
+        assert second['order_sequence'] == first['order_sequence']
+        assert second['estimated_distance_km'] == first['estimated_distance_km']
+
+        # Otra parada inicial es otro problema: se intenta resolver
+        event['body'] = json.dumps({'order_ids': order_ids[1:] + order_ids[:1], 'driver_id': 'DRV-3'})
+        assert optimizer.handler(event, None)['statusCode'] == 500
+
+    def test_cached_plan_not_reused_with_larger_budget(self, monkeypatch):
+        """Test: Un plan resuelto con poco tiempo no se reutiliza si el request permite más"""
+
+        orders = [{'order_id': f'ORD-{n}', 'latitude': -12.08 + (n * 7919 % 97) / 1000,
+                   'longitude': -77.03 + (n * 104729 % 89) / 1000} for n in range(15)]
+        monkeypatch.setattr('optimizer.route_cache', optimizer.routecache.RouteCache())
+
+        solves = []
+        solve = optimizer.solver.solve
+        monkeypatch.setattr('optimizer.solver.solve', lambda *args, **kwargs: solves.append(1) or solve(*args, **kwargs))
+
+        def run(budget_ms):
+            deadline = time.monotonic() + budget_ms / 1000
+            return optimizer.optimize_route([dict(order) for order in orders], deadline=deadline)[2]['cache']
+
+        assert run(1) == 'miss'
+        assert run(1) == 'memory'
+        assert run(60) == 'miss'
+        # El plan con más presupuesto sirve para requests con menos
+        assert run(1) == 'memory' and run(60) == 'memory'
+        assert len(solves) == 2
+
+    def test_reoptimize_route_reads_only_new_orders(self, monkeypatch):
+        """Test: PUT /routes inserta y quita órdenes leyendo solo las nuevas, con escritura condicional"""
+
+        from botocore.exceptions import ClientError
+
+        stored = {
+            'route_id': 'ROUTE-1', 'driver_id': 'DRV-1', 'status': 'PLANNED', 'version': 3,
+            'order_ids': [f'ORD-{n}' for n in range(5)],
+            'stop_coordinates': [[-12.10 + n / 100, -77.03] for n in range(5)],
+            'stop_demands': [1] * 5
+        }
+        new_order = {'order_id': 'ORD-NEW', 'latitude': -12.075, 'longitude': -77.03}
+        queried, updates = [], []
+
+        def mock_query(**kwargs):
+            queried.append(kwargs['ExpressionAttributeValues'][':oid'])
+            return {'Items': [dict(new_order)]}
+
+        def mock_update_item(**kwargs):
+            updates.append(kwargs)
+            if len(updates) > 1:
+                raise ClientError({'Error': {'Code': 'ConditionalCheckFailedException'}}, 'UpdateItem')
+            return {}
+
+        monkeypatch.setattr('optimizer.routes_table.get_item', lambda **kwargs: {'Item': dict(stored)})
+        monkeypatch.setattr('optimizer.orders_table.query', mock_query)
+        monkeypatch.setattr('optimizer.routes_table.update_item', mock_update_item)
+
+        event = {
+            'httpMethod': 'PUT',
+            'body': json.dumps({'route_id': 'ROUTE-1', 'add_order_ids': ['ORD-NEW', 'ORD-1'],
+                                'remove_order_ids': ['ORD-3', 'ORD-99']})
+        }
+
+        response = optimizer.handler(event, None)
+
+        assert response['statusCode'] == 200
+        body = json.loads(response['body'])
+        assert queried == ['ORD-NEW']
+        assert body['order_sequence'] == ['ORD-0', 'ORD-1', 'ORD-2', 'ORD-NEW', 'ORD-4']
+        assert body['not_in_route_order_ids'] == ['ORD-99']
+
+        update = updates[0]
+        values = {update['ExpressionAttributeNames'][name.replace(':v', '#f')]: value
+                  for name, value in update['ExpressionAttributeValues'].items() if name.startswith(':v')}
+        assert update['ExpressionAttributeValues'][':expected'] == 3
+        assert values['order_ids'] == body['order_sequence'] and values['version'] == 4
+        assert len(values['stop_coordinates']) == 5
+
+        # Otra escritura ganó la carrera: 409
+        assert optimizer.handler(event, None)['statusCode'] == 409
+
+    def test_reoptimize_route_removing_every_stop(self, monkeypatch):
+        """Test: Quitar todas las paradas de una ruta con ventanas deja una ruta vacía"""
+
+        stored = {
+            'route_id': 'ROUTE-2', 'driver_id': 'DRV-1', 'status': 'PLANNED', 'version': 1,
+            'start_time': '08:00', 'order_ids': ['ORD-0', 'ORD-1'],
+            'stop_coordinates': [[-12.10, -77.03], [-12.11, -77.03]],
+            'stop_windows': [[540, 600, 5], [540, 660, 5]]
+        }
+        updates = []
+
+        monkeypatch.setattr('optimizer.routes_table.get_item', lambda **kwargs: {'Item': dict(stored)})
+        monkeypatch.setattr('optimizer.routes_table.update_item', lambda **kwargs: updates.append(kwargs) or {})
+
+        event = {
+            'httpMethod': 'PUT',
+            'body': json.dumps({'route_id': 'ROUTE-2', 'remove_order_ids': ['ORD-0', 'ORD-1']})
+        }
+
+        response = optimizer.handler(event, None)
+
+        assert response['statusCode'] == 200
+        body = json.loads(response['body'])
+        assert body['stops'] == 0 and body['order_sequence'] == []
+        assert body['estimated_arrivals'] == [] and body['late_order_ids'] == []
+        assert len(updates) == 1
+
+    def test_get_orders_dedupes_and_reports_failures(self, monkeypatch):
+        """Test: Órdenes sin duplicados, en el orden pedido, con faltantes y errores aparte"""
+
+        def mock_query(**kwargs):
+            order_id = kwargs['ExpressionAttributeValues'][':oid']
+            if order_id == 'ORD-ERR':
+                raise RuntimeError('ProvisionedThroughputExceededException')
+            if order_id == 'ORD-NONE':
+                return {'Items': []}
+            return {'Items': [{'order_id': order_id}]}
+
+        monkeypatch.setattr('optimizer.orders_table.query', mock_query)
+
+        orders, missing, failed = optimizer.get_orders(
+            ['ORD-3', 'ORD-1', 'ORD-ERR', 'ORD-3', 'ORD-NONE', 'ORD-2', 'ORD-1']
+        )
+
+        assert [o['order_id'] for o in orders] == ['ORD-3', 'ORD-1', 'ORD-2']
+        assert missing == ['ORD-NONE']
+        assert failed == ['ORD-ERR']
+
+    def test_get_orders_runs_queries_concurrently(self, monkeypatch):
+        """Test: 64 consultas de 20 ms no se hacen una tras otra"""
+
+        def mock_query(**kwargs):
+            time.sleep(0.02)
+            return {'Items': [{'order_id': kwargs['ExpressionAttributeValues'][':oid']}]}
+
+        monkeypatch.setattr('optimizer.orders_table.query', mock_query)
+
+        start = time.perf_counter()
+        orders, _, _ = optimizer.get_orders([f'ORD-{n}' for n in range(64)])
+        elapsed = time.perf_counter() - start
+
+        assert len(orders) == 64
+        assert elapsed < 64 * 0.02 / 2
+
+    def test_plan_routes_saves_one_route_per_driver(self, monkeypatch):
+        """Test: /route-plans reparte las órdenes por capacidad y guarda una ruta por conductor"""
+
+        districts = ['Miraflores', 'San Isidro', 'Surco', 'La Molina', 'Comas', 'Los Olivos']
+        orders = {
+            f'ORD-{n}': {'order_id': f'ORD-{n}', 'delivery_address': f'Calle {n}, {districts[n % 6]}',
+                         'products': [{'sku': 'P1', 'quantity': 2}]}
+            for n in range(24)
+        }
+        saved = []
+
+        def mock_query(**kwargs):
+            order_id = kwargs['ExpressionAttributeValues'][':oid']
+            return {'Items': [dict(orders[order_id])]}
+
+        monkeypatch.setattr('optimizer.orders_table.query', mock_query)
+        monkeypatch.setattr('optimizer.routes_table.put_item', lambda **kwargs: saved.append(kwargs['Item']))
+
+        event = {
+            'httpMethod': 'POST',
+            'resource': '/route-plans',
+            'body': json.dumps({
+                'order_ids': list(orders),
+                'depot': {'lat': -12.08, 'lng': -77.03},
+                'vehicles': [{'driver_id': f'DRV-{n}', 'capacity': 20} for n in range(3)]
+            })
+        }
+
+        response = optimizer.handler(event, None)
+
+        assert response['statusCode'] == 200
+        body = json.loads(response['body'])
+        assert [r['driver_id'] for r in saved] == [r['driver_id'] for r in body['routes']]
+        assert len({r['driver_id'] for r in saved}) == len(saved) >= 3
+        assert sorted(o for r in saved for o in r['order_ids']) == sorted(orders)
+        assert all(r['load'] <= 20 and r['plan_id'] == body['plan_id'] for r in saved)
+        assert body['unassigned_order_ids'] == []
+
+    def test_optimize_route_missing_fields(self):
+        """Test: Error cuando faltan order_ids o driver_id"""
+
+        event = {
+            'httpMethod': 'POST',
+            'body': json.dumps({'order_ids': ['ORD-1']})
+        }
+
+        response = optimizer.handler(event, None)
+
+        assert response['statusCode'] == 400
+
+
+# Para ejecutar tests:
+# pytest tests/test_optimizer.py -v
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,101 @@
+"""
+Tests unitarios para la cache de rutas optimizadas
+"""
+
+import time
+import pytest
+import sys
+import os
+
+# Configurar path para importar el módulo
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import routecache
+
+
+class FakeTable:
+    """get_item / put_item sobre un diccionario"""
+
+    def __init__(self, items):
+        self.items = items
+
+    def get_item(self, Key):
+        item = self.items.get(Key['cache_key'])
+        return {'Item': item} if item else {}
+
+    def put_item(self, Item):
+        self.items[Item['cache_key']] = Item
+        return {}
+
+
+class FakeDynamoDB:
+
+    def __init__(self):
+        self.items = {}
+
+    def Table(self, name):
+        return FakeTable(self.items)
+
+
+STOPS = [('ORD-1', -12.1, -77.03), ('ORD-2', -12.05, -77.0), ('ORD-3', -12.2, -76.98)]
+PARAMS = {'neighbors_k': 10}
+
+
+class TestRouteCache:
+    """Tests para la clave canónica y los niveles de cache"""
+
+    def test_key_ignores_stop_order(self):
+        """Test: El mismo conjunto de paradas en otro orden da la misma clave"""
+
+        key = routecache.cache_key('ORD-1', STOPS, PARAMS)
+        assert routecache.cache_key('ORD-1', list(reversed(STOPS)), PARAMS) == key
+        # Diferencias por debajo de la precisión de las coordenadas no importan
+        assert routecache.cache_key('ORD-1', [('ORD-1', -12.1000000001, -77.03)] + STOPS[1:], PARAMS) == key
+
+    def test_key_changes_with_problem(self):
+        """Test: Coordenadas, parada inicial, ventanas o parámetros cambian la clave"""
+
+        key = routecache.cache_key('ORD-1', STOPS, PARAMS)
+        moved = [('ORD-1', -12.11, -77.03)] + STOPS[1:]
+        windowed = [STOPS[0] + (540, 720, 5)] + STOPS[1:]
+
+        assert routecache.cache_key('ORD-1', moved, PARAMS) != key
+        assert routecache.cache_key('ORD-2', STOPS, PARAMS) != key
+        assert routecache.cache_key('ORD-1', windowed, PARAMS) != key
+        assert routecache.cache_key('ORD-1', STOPS, {'neighbors_k': 8}) != key
+
+    def test_cache_levels(self):
+        """Test: Primero LRU, luego tabla persistente; el LRU respeta su tamaño"""
+
+        dynamodb = FakeDynamoDB()
+        plan = {'order_ids': ['ORD-1', 'ORD-3', 'ORD-2'], 'distance_km': 12.5}
+
+        first = routecache.RouteCache(dynamodb=dynamodb, table_name='routes', cache_size=1)
+        assert first.get('a') == (None, None)
+        first.put('a', plan)
+        assert first.get('a') == (plan, 'memory')
+
+        # 'a' sale del LRU pero sigue en la tabla
+        first.put('b', plan)
+        assert first.get('a') == (plan, 'persistent')
+
+        second = routecache.RouteCache(dynamodb=dynamodb, table_name='routes')
+        assert second.get('b') == (plan, 'persistent')
+        assert second.get('b') == (plan, 'memory')
+        assert second.stats == {'memory': 1, 'persistent': 1, 'miss': 0}
+
+    def test_expired_items_are_ignored(self):
+        """Test: Un item vencido (aún no borrado por el TTL) cuenta como miss"""
+
+        dynamodb = FakeDynamoDB()
+        routecache.RouteCache(dynamodb=dynamodb, table_name='routes').put('a', {'order_ids': []})
+        dynamodb.items['a']['expiry'] = int(time.time()) - 1
+
+        cache = routecache.RouteCache(dynamodb=dynamodb, table_name='routes')
+        assert cache.get('a') == (None, None)
+
+
+# Para ejecutar tests:
+# pytest tests/test_routecache.py -v
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,160 @@
+"""
+Tests unitarios para el solver de rutas
+"""
+
+import itertools
+import math
+import random
+import time
+import pytest
+import sys
+import os
+
+# Configurar path para importar el módulo
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import solver
+
+
+def random_points(n, seed):
+    rng = random.Random(seed)
+    return [(rng.random(), rng.random()) for _ in range(n)]
+
+
+def planar(points):
+    return lambda i, j: math.dist(points[i], points[j])
+
+
+def naive_nearest_neighbor(points, start=0):
+    """Vecino más cercano O(n²), como el optimizador original"""
+    dist = planar(points)
+    tour, remaining = [start], set(range(len(points))) - {start}
+    while remaining:
+        nearest = min(remaining, key=lambda j: (dist(tour[-1], j), j))
+        tour.append(nearest)
+        remaining.remove(nearest)
+    return tour
+
+
+class TestSolver:
+    """Tests para construcción y búsqueda local"""
+
+    def test_grid_nearest_matches_linear_scan(self):
+        """Test: El índice de grilla devuelve los mismos vecinos que una búsqueda lineal"""
+
+        points = random_points(300, seed=1)
+        grid = solver.GridIndex(points)
+
+        for i in range(0, 300, 7):
+            expected = sorted((j for j in range(300) if j != i),
+                              key=lambda j: math.dist(points[i], points[j]))[:5]
+            assert grid.k_nearest(*points[i], 5, exclude=i) == expected
+
+    def test_tour_is_permutation_with_fixed_start(self):
+        """Test: La ruta visita cada parada una vez y empieza en start"""
+
+        points = random_points(500, seed=2)
+        result = solver.solve(points, planar(points), start=42)
+
+        assert result['tour'][0] == 42
+        assert sorted(result['tour']) == list(range(500))
+        assert result['length'] == pytest.approx(solver.route_length(result['tour'], planar(points)))
+
+    def test_local_search_shortens_nearest_neighbor(self):
+        """Test: 2-opt/Or-opt mejoran la ruta del vecino más cercano"""
+
+        points = random_points(1000, seed=3)
+        dist = planar(points)
+        result = solver.solve(points, dist)
+
+        baseline = solver.route_length(naive_nearest_neighbor(points), dist)
+        assert result['length'] < 0.95 * baseline
+        assert result['moves'] > 0
+
+    def test_small_instances_near_optimal(self):
+        """Test: En rutas chicas el resultado queda cerca del óptimo exacto"""
+
+        for seed in range(10):
+            points = random_points(7, seed=seed)
+            dist = planar(points)
+            optimum = min(solver.route_length([0] + list(p), dist)
+                          for p in itertools.permutations(range(1, 7)))
+            assert solver.solve(points, dist)['length'] <= optimum * 1.05
+
+    def test_degenerate_inputs(self):
+        """Test: Una parada, dos paradas y puntos repetidos o alineados"""
+
+        assert solver.solve([(0, 0)], planar([(0, 0)]))['tour'] == [0]
+        assert solver.solve([(0, 0), (1, 1)], planar([(0, 0), (1, 1)]))['tour'] == [0, 1]
+
+        repeated = [(1.0, 1.0)] * 20 + [(float(i), 0.0) for i in range(20)]
+        result = solver.solve(repeated, planar(repeated))
+        assert sorted(result['tour']) == list(range(40))
+
+    def test_anytime_improves_until_deadline(self):
+        """Test: Con deadline la ruta mejora y las distancias reportadas cuadran"""
+
+        points = random_points(300, seed=9)
+        dist = planar(points)
+
+        plain = solver.solve(points, dist)
+        first = solver.solve(points, dist, deadline=time.monotonic() + 0.5)
+
+        assert sorted(first['tour']) == list(range(300)) and first['tour'][0] == 0
+        assert first['iterations'] > 0
+        assert first['length'] < plain['length']
+        assert first['local_search_length'] == pytest.approx(plain['length'])
+
+        # La ganancia acumulada sigue a la ruta real tras perturbar y restaurar
+        search = solver.LocalSearch(list(first['tour']), dist, solver.neighbor_lists(points, dist))
+        search.improve_until(time.monotonic() + 0.2, max_stall=50)
+        assert first['length'] - search.gain == pytest.approx(solver.route_length(search.tour, dist))
+
+    def test_anytime_small_route_returns_early(self):
+        """Test: Una ruta chica deja de iterar al no mejorar, mucho antes del deadline"""
+
+        points = random_points(20, seed=10)
+
+        start = time.monotonic()
+        result = solver.solve(points, planar(points), deadline=start + 30)
+
+        assert time.monotonic() - start < 1
+        assert 0 < result['iterations'] < 10_000
+
+    def test_reoptimize_inserts_and_removes(self):
+        """Test: Agregar y quitar paradas da una ruta válida, cercana a resolver desde cero"""
+
+        points = random_points(220, seed=11)
+        dist = planar(points)
+        neighbors = solver.neighbor_lists(points, dist)
+
+        # Ruta original con las primeras 200 paradas; llegan 20 nuevas y se cancelan 15
+        original = solver.solve(points[:200], planar(points[:200]))['tour']
+        removed = original[50:65]
+        result = solver.reoptimize(dist, original, insert=range(200, 220), remove=removed,
+                                   neighbors=neighbors)
+
+        expected = set(range(220)) - set(removed)
+        assert sorted(result['tour']) == sorted(expected) and result['tour'][0] == 0
+        assert result['length'] == pytest.approx(solver.route_length(result['tour'], dist))
+
+        kept = sorted(expected)
+        from_scratch = solver.solve([points[i] for i in kept], planar([points[i] for i in kept]))
+        assert result['length'] < from_scratch['length'] * 1.10
+
+    def test_reoptimize_removing_start(self):
+        """Test: Si se quita la primera parada, la ruta empieza en la siguiente"""
+
+        points = random_points(10, seed=12)
+        dist = planar(points)
+
+        result = solver.reoptimize(dist, [0, 1, 2, 3], insert=[4], remove=[0],
+                                   neighbors=solver.neighbor_lists(points, dist))
+
+        assert result['tour'][0] == 1 and sorted(result['tour']) == [1, 2, 3, 4]
+
+
+# Para ejecutar tests:
+# pytest tests/test_solver.py -v
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,101 @@
+"""
+Tests unitarios para las ventanas de entrega
+"""
+
+import random
+import pytest
+import sys
+import os
+
+# Configurar path para importar el módulo
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import distance
+import solver
+import timewindows
+
+
+def simulate(tour, dist, time_windows):
+    """Horario recorriendo la ruta completa (referencia para comparar)"""
+    windows = time_windows.windows
+    begin = [max(time_windows.start_time, windows[tour[0]][0])]
+    for prev, node in zip(tour, tour[1:]):
+        arrival = begin[-1] + windows[prev][2] + dist(prev, node) * time_windows.minutes_per_km
+        begin.append(max(arrival, windows[node][0]))
+    return begin
+
+
+def late_count(tour, dist, time_windows):
+    begin = simulate(tour, dist, time_windows)
+    return sum(b > time_windows.windows[node][1] + 1e-6 for node, b in zip(tour, begin))
+
+
+def random_instance(n, seed):
+    rng = random.Random(seed)
+    coords = [(-12.08 + rng.uniform(-0.05, 0.05), -77.03 + rng.uniform(-0.05, 0.05)) for _ in range(n)]
+    slots = [(480, 660), (600, 780), (720, 900), (480, 1080)]
+    windows = [(0, timewindows.DAY_MINUTES, 0)] + [(*rng.choice(slots), 2) for _ in range(n - 1)]
+    return distance.DistanceEngine(coords), timewindows.TimeWindows(windows, 1.0, 480)
+
+
+class TestTimeWindows:
+    """Tests para horarios, holguras y búsqueda local con ventanas"""
+
+    def test_allows_path_matches_full_simulation(self):
+        """Test: Lo que acepta la verificación constante también es factible al simular toda la ruta"""
+
+        engine, time_windows = random_instance(80, seed=1)
+        rng = random.Random(2)
+        accepted = 0
+
+        for _ in range(400):
+            tour = time_windows.initial_tour(engine.planar_points(), 0)
+            schedule = time_windows.schedule(tour, engine.dist)
+            assert schedule.begin == pytest.approx(simulate(tour, engine.dist, time_windows))
+
+            lo = rng.randrange(1, len(tour) - 1)
+            hi = rng.randrange(lo, min(lo + 10, len(tour)))
+            before = late_count(tour, engine.dist, time_windows)
+            if schedule.allows_reversal(lo, hi):
+                accepted += 1
+                tour[lo:hi + 1] = tour[lo:hi + 1][::-1]
+                assert late_count(tour, engine.dist, time_windows) <= before
+
+        assert accepted > 0
+
+    def test_solve_respects_windows(self):
+        """Test: La ruta optimizada no llega tarde y sigue siendo más corta que la inicial"""
+
+        engine, time_windows = random_instance(150, seed=3)
+        points = engine.planar_points()
+        initial = time_windows.initial_tour(points, 0)
+        assert late_count(initial, engine.dist, time_windows) == 0
+
+        result = solver.solve(points, engine.dist, start=0, neighbors=engine.neighbor_lists(),
+                              time_windows=time_windows)
+
+        assert sorted(result['tour']) == list(range(150))
+        assert result['late'] == [] and late_count(result['tour'], engine.dist, time_windows) == 0
+        assert result['length'] < result['initial_length']
+        assert result['begin'] == pytest.approx(simulate(result['tour'], engine.dist, time_windows))
+
+    def test_windows_override_distance(self):
+        """Test: Una parada cercana con ventana de la tarde se deja para después"""
+
+        # 0 inicio, 1 muy cerca pero abre a las 14:00, 2 y 3 más lejos y abren ya
+        coords = [(-12.0, -77.0), (-12.001, -77.0), (-12.05, -77.0), (-12.06, -77.0)]
+        engine = distance.DistanceEngine(coords)
+        time_windows = timewindows.TimeWindows(
+            [(0, 1440, 0), (840, 900, 5), (480, 600, 5), (480, 600, 5)], 2.0, 480)
+
+        result = solver.solve(engine.planar_points(), engine.dist, start=0, time_windows=time_windows)
+
+        assert result['tour'] == [0, 2, 3, 1]
+        assert result['late'] == []
+        assert timewindows.format_time(result['begin'][-1]) == '14:00'
+
+
+# Para ejecutar tests:
+# pytest tests/test_timewindows.py -v
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
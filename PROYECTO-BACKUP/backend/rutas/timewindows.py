@@ -0,0 +1,186 @@
+"""
+Ventanas de entrega para la Lambda de Optimización de Rutas
+
+Cada parada tiene una ventana [earliest, latest] (minutos desde las 00:00)
+para empezar la atención y un tiempo de atención. Si el conductor llega
+antes, espera; llegar después de `latest` no es factible.
+
+La búsqueda local consulta Schedule antes de aplicar cada movimiento. Con la
+holgura hacia adelante (forward time slack) precalculada de cada posición,
+la factibilidad de todo lo que sigue a la parte modificada se verifica en
+tiempo constante: solo se simulan las paradas que cambian de lugar (hasta
+OR_OPT_MAX_SEGMENT en Or-opt, hasta MAX_REVERSAL en 2-opt). Recalcular
+horarios y holguras (O(n)) solo ocurre al aplicar un movimiento.
+"""
+
+import os
+
+import solver
+
+DAY_MINUTES = 24 * 60
+
+# 2-opt invierte un tramo: con ventanas hay que simular todo el tramo, así
+# que se limita su largo para que la verificación no crezca con la ruta
+MAX_REVERSAL = int(os.environ.get('TIME_WINDOW_MAX_REVERSAL', '50'))
+
+
+def parse_time(value):
+    """'HH:MM' -> minutos desde las 00:00"""
+    hours, minutes = str(value).split(':')
+    return int(hours) * 60 + int(minutes)
+
+
+def format_time(minutes):
+    """Minutos desde las 00:00 -> 'HH:MM' (se pasa de 24:00 si la ruta termina tarde)"""
+    minutes = int(round(minutes))
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class TimeWindows:
+    """
+    Ventanas, tiempos de atención y velocidad de una ruta
+
+    Args:
+        windows: Lista de (earliest, latest, service) por parada, en minutos
+        minutes_per_km: Minutos de viaje por km
+        start_time: Hora de salida desde la parada inicial, en minutos
+    """
+
+    def __init__(self, windows, minutes_per_km, start_time=0.0):
+        self.windows = windows
+        self.minutes_per_km = minutes_per_km
+        self.start_time = start_time
+
+    def subset(self, indices):
+        """Las mismas reglas para un subconjunto de paradas (en ese orden)"""
+        return TimeWindows([self.windows[i] for i in indices], self.minutes_per_km, self.start_time)
+
+    def initial_tour(self, points, start=0):
+        """
+        Ruta inicial: franjas en orden de cierre (y de apertura) y, dentro de
+        cada franja, vecino más cercano desde la última parada visitada
+
+        Las órdenes suelen venir en pocas franjas fijas (09:00-12:00, ...),
+        así que esto deja una ruta factible o casi, y la búsqueda local
+        acorta la distancia sin romper las ventanas.
+        """
+        groups = {}
+        for i, (earliest, latest, _) in enumerate(self.windows):
+            if i != start:
+                groups.setdefault((latest, earliest), []).append(i)
+
+        tour = [start]
+        for key in sorted(groups):
+            members = groups[key]
+            grid = solver.GridIndex([points[i] for i in members])
+            x, y = points[tour[-1]]
+            for _ in members:
+                local = grid.nearest(x, y)
+                grid.remove(local)
+                tour.append(members[local])
+                x, y = points[members[local]]
+
+        return tour
+
+    def schedule(self, tour, dist):
+        return Schedule(tour, dist, self)
+
+
+class Schedule:
+    """
+    Horario de una ruta y verificación de movimientos en tiempo constante
+
+    Por posición p: begin[p] es el inicio de la atención y slack[p] cuánto
+    puede atrasarse sin que ninguna parada desde p llegue tarde:
+        slack[último] = latest - begin
+        slack[p] = min(latest[p] - begin[p], espera[p + 1] + slack[p + 1])
+
+    Si la ruta inicial ya llega tarde a alguna parada, su límite se relaja a
+    esa hora: ningún movimiento empeora un atraso existente.
+
+    Args:
+        tour: Ruta (la misma lista que modifica LocalSearch)
+        dist: Función dist(i, j) en km
+        time_windows: TimeWindows
+    """
+
+    def __init__(self, tour, dist, time_windows):
+        self.tour = tour
+        self.dist = dist
+        self.windows = time_windows.windows
+        self.minutes_per_km = time_windows.minutes_per_km
+        self.start_time = time_windows.start_time
+        self._simulate()
+        self.latest = [latest for _, latest, _ in self.windows]
+        for p, node in enumerate(tour):
+            self.latest[node] = max(self.latest[node], self.begin[p])
+        self._compute_slack()
+
+    def refresh(self):
+        """Recalcula horarios y holguras después de aplicar un movimiento"""
+        self._simulate()
+        self._compute_slack()
+
+    def _simulate(self):
+        tour, windows = self.tour, self.windows
+        self.begin = begin = [0.0] * len(tour)
+        self.wait = wait = [0.0] * len(tour)
+
+        begin[0] = max(self.start_time, windows[tour[0]][0])
+        for p in range(1, len(tour)):
+            prev, node = tour[p - 1], tour[p]
+            arrival = begin[p - 1] + windows[prev][2] + self.dist(prev, node) * self.minutes_per_km
+            begin[p] = max(arrival, windows[node][0])
+            wait[p] = begin[p] - arrival
+
+    def _compute_slack(self):
+        tour, begin, wait, latest = self.tour, self.begin, self.wait, self.latest
+        self.slack = slack = [0.0] * len(tour)
+        following = float('inf')
+        for p in range(len(tour) - 1, -1, -1):
+            slack[p] = min(latest[tour[p]] - begin[p], following)
+            following = wait[p] + slack[p]
+
+    def allows_path(self, u_pos, nodes, v_pos):
+        """
+        ¿Es factible ir desde la parada en u_pos, visitar `nodes` en orden y
+        seguir con la parada en v_pos (None: fin de la ruta)?
+
+        Usa la salida de u según el horario actual: si el movimiento la
+        adelanta, el resultado sigue siendo correcto (llegar antes nunca
+        rompe una ventana, solo agrega espera).
+        """
+        windows, latest = self.windows, self.latest
+        prev = self.tour[u_pos]
+        time = self.begin[u_pos] + windows[prev][2]
+
+        for node in nodes:
+            earliest, _, service = windows[node]
+            begin = max(time + self.dist(prev, node) * self.minutes_per_km, earliest)
+            if begin > latest[node] + solver.EPSILON:
+                return False
+            time, prev = begin + service, node
+
+        if v_pos is None:
+            return True
+
+        v = self.tour[v_pos]
+        begin = max(time + self.dist(prev, v) * self.minutes_per_km, windows[v][0])
+        return begin - self.begin[v_pos] <= self.slack[v_pos] + solver.EPSILON
+
+    def allows_reversal(self, lo, hi):
+        """¿Se puede invertir tour[lo..hi] (inclusive)?"""
+        if hi - lo + 1 > MAX_REVERSAL:
+            return False
+        after = hi + 1 if hi + 1 < len(self.tour) else None
+        return self.allows_path(lo - 1, self.tour[hi:lo - 1:-1], after)
+
+    def within_limits(self):
+        """¿Ninguna parada empieza después de su límite (relajado)?"""
+        latest = self.latest
+        return all(begin <= latest[node] + solver.EPSILON for node, begin in zip(self.tour, self.begin))
+
+    def late_stops(self):
+        """Paradas cuya atención empieza después de su ventana"""
+        return [node for p, node in enumerate(self.tour)
+                if self.begin[p] > self.windows[node][1] + solver.EPSILON]
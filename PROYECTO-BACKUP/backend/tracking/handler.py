@@ -4,22 +4,41 @@ Actualiza y consulta el estado de tracking de órdenes
 """
 
 import json
+import base64
 import os
-import boto3
 from datetime import datetime
 import uuid
 import logging
+from collections import OrderedDict
+
+from lazy_clients import LazyClient, lazy_client, lazy_resource
 
 logger = logging.getLogger()
 logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
 
-dynamodb = boto3.resource('dynamodb')
+# Cliente DynamoDB (se crea en el primer uso)
+dynamodb = lazy_resource('dynamodb')
+
+# Cliente de bajo nivel para TransactWriteItems (el recurso no la expone)
+dynamodb_client = lazy_client('dynamodb')
 
 TRACKING_TABLE = os.environ.get('TRACKING_TABLE')
 ORDERS_TABLE = os.environ.get('ORDERS_TABLE')
 
-tracking_table = dynamodb.Table(TRACKING_TABLE)
-orders_table = dynamodb.Table(ORDERS_TABLE)
+tracking_table = LazyClient(lambda: dynamodb.Table(TRACKING_TABLE))
+orders_table = LazyClient(lambda: dynamodb.Table(ORDERS_TABLE))
+
+# Paginación del historial de tracking
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 100
+
+# Atributos devueltos por evento (order_id ya viene en la respuesta)
+EVENT_ATTRIBUTES = ['tracking_id', 'timestamp', 'status', 'location']
+
+# created_at (sort key) de las órdenes ya actualizadas en este contenedor:
+# no cambia nunca, así que una orden solo se consulta la primera vez
+ORDER_KEY_CACHE_SIZE = int(os.environ.get('ORDER_KEY_CACHE_SIZE', '5000'))
+order_keys = OrderedDict()
 
 
 def handler(event, context):
@@ -43,7 +62,15 @@ def handler(event, context):
 
 
 def get_tracking(event):
-    """Consultar tracking de una orden"""
+    """
+    Consultar tracking de una orden (paginado)
+
+    Query params:
+        order_id: Orden a consultar (requerido)
+        limit: Eventos por página (por defecto 50, máximo 100)
+        from / to: Rango de timestamps ISO 8601 (inclusive)
+        cursor: next_cursor devuelto por la página anterior
+    """
 
     params = event.get('queryStringParameters') or {}
     order_id = params.get('order_id')
@@ -51,21 +78,59 @@ def get_tracking(event):
     if not order_id:
         return response(400, {'error': 'order_id es requerido'})
 
+    try:
+        limit = int(params.get('limit') or DEFAULT_PAGE_SIZE)
+    except ValueError:
+        return response(400, {'error': 'limit debe ser un número entero'})
+
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return response(400, {'error': f'limit debe estar entre 1 y {MAX_PAGE_SIZE}'})
+
+    # timestamp, status y location son palabras reservadas de DynamoDB
+    attribute_names = {f'#{name}': name for name in EVENT_ATTRIBUTES + ['order_id']}
+    attribute_values = {':oid': order_id}
+    key_condition = '#order_id = :oid'
+
+    time_from, time_to = params.get('from'), params.get('to')
+    if time_from and time_to:
+        key_condition += ' AND #timestamp BETWEEN :from AND :to'
+        attribute_values.update({':from': time_from, ':to': time_to})
+    elif time_from:
+        key_condition += ' AND #timestamp >= :from'
+        attribute_values[':from'] = time_from
+    elif time_to:
+        key_condition += ' AND #timestamp <= :to'
+        attribute_values[':to'] = time_to
+
+    query_kwargs = {
+        'IndexName': 'order_index',
+        'KeyConditionExpression': key_condition,
+        'ExpressionAttributeNames': attribute_names,
+        'ExpressionAttributeValues': attribute_values,
+        'ProjectionExpression': ', '.join(f'#{name}' for name in EVENT_ATTRIBUTES),
+        'ScanIndexForward': False,  # Más reciente primero
+        'Limit': limit
+    }
+
+    if params.get('cursor'):
+        try:
+            query_kwargs['ExclusiveStartKey'] = decode_cursor(params['cursor'], order_id)
+        except ValueError as e:
+            logger.warning(f"Cursor inválido: {str(e)}")
+            return response(400, {'error': 'cursor inválido'})
+
     try:
         # Consultar tracking events
-        result = tracking_table.query(
-            IndexName='order_index',
-            KeyConditionExpression='order_id = :oid',
-            ExpressionAttributeValues={':oid': order_id},
-            ScanIndexForward=False  # Más reciente primero
-        )
+        result = tracking_table.query(**query_kwargs)
 
         events = result.get('Items', [])
+        last_key = result.get('LastEvaluatedKey')
 
         return response(200, {
             'order_id': order_id,
             'events': events,
-            'count': len(events)
+            'count': len(events),
+            'next_cursor': encode_cursor(last_key) if last_key else None
         })
 
     except Exception as e:
@@ -73,6 +138,35 @@ def get_tracking(event):
         return response(500, {'error': 'Error obteniendo tracking'})
 
 
+def encode_cursor(last_evaluated_key):
+    """Codificar LastEvaluatedKey del GSI como cursor opaco (base64 url-safe)"""
+    payload = json.dumps(
+        {k: last_evaluated_key[k] for k in ('tracking_id', 'timestamp', 'order_id')},
+        separators=(',', ':')
+    )
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, order_id):
+    """
+    Decodificar un cursor de encode_cursor()
+
+    Raises:
+        ValueError: Si el cursor está malformado o es de otra orden
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        key = {k: str(payload[k]) for k in ('tracking_id', 'timestamp', 'order_id')}
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f'Cursor malformado: {e}')
+
+    if key['order_id'] != order_id:
+        raise ValueError('El cursor pertenece a otra orden')
+
+    return key
+
+
 def update_tracking(event):
     """Actualizar tracking de una orden"""
 
@@ -98,18 +192,14 @@ def update_tracking(event):
             'location': location
         }
 
-        tracking_table.put_item(Item=tracking_event)
+        created_at = body.get('created_at') or order_created_at(order_id)
+        if not created_at:
+            return response(404, {'error': 'Orden no encontrada'})
 
-        # Actualizar estado de la orden
-        try:
-            orders_table.update_item(
-                Key={'order_id': order_id, 'created_at': body.get('created_at', '')},
-                UpdateExpression='SET #status = :status',
-                ExpressionAttributeNames={'#status': 'status'},
-                ExpressionAttributeValues={':status': status}
-            )
-        except Exception as e:
-            logger.warning(f"No se pudo actualizar orden: {str(e)}")
+        if not write_tracking_event(tracking_event, created_at):
+            order_keys.pop(order_id, None)
+            return response(404, {'error': 'Orden no encontrada'})
+        remember_order_key(order_id, created_at)
 
         logger.info(f"Tracking actualizado: {tracking_id}")
 
@@ -126,6 +216,89 @@ def update_tracking(event):
         return response(500, {'error': 'Error actualizando tracking'})
 
 
+def write_tracking_event(tracking_event, created_at):
+    """
+    Guardar el evento y el nuevo estado de la orden en una sola transacción
+
+    O se escriben los dos o ninguno: la orden existe (condición sobre su
+    clave) y el evento es nuevo. ClientRequestToken hace idempotentes los
+    reintentos del SDK de la misma transacción.
+
+    Returns:
+        False si la orden no existe
+    """
+    from botocore.exceptions import ClientError
+
+    try:
+        dynamodb_client.transact_write_items(
+            TransactItems=[
+                {
+                    'Put': {
+                        'TableName': TRACKING_TABLE,
+                        'Item': to_attribute_values(tracking_event),
+                        'ConditionExpression': 'attribute_not_exists(tracking_id)'
+                    }
+                },
+                {
+                    'Update': {
+                        'TableName': ORDERS_TABLE,
+                        'Key': to_attribute_values({'order_id': tracking_event['order_id'],
+                                                    'created_at': created_at}),
+                        'UpdateExpression': 'SET #status = :status',
+                        'ConditionExpression': 'attribute_exists(order_id)',
+                        'ExpressionAttributeNames': {'#status': 'status'},
+                        'ExpressionAttributeValues': to_attribute_values({':status': tracking_event['status']})
+                    }
+                }
+            ],
+            ClientRequestToken=tracking_event['tracking_id']
+        )
+    except ClientError as e:
+        reasons = e.response.get('CancellationReasons') or []
+        if e.response['Error']['Code'] != 'TransactionCanceledException' or \
+                len(reasons) < 2 or reasons[1].get('Code') != 'ConditionalCheckFailed':
+            raise
+        return False
+    return True
+
+
+def order_created_at(order_id):
+    """
+    created_at de una orden (sort key de la tabla de órdenes)
+
+    Returns:
+        None si la orden no existe
+    """
+    if order_id in order_keys:
+        order_keys.move_to_end(order_id)
+        return order_keys[order_id]
+
+    result = orders_table.query(
+        KeyConditionExpression='#order_id = :oid',
+        ExpressionAttributeNames={'#order_id': 'order_id', '#created_at': 'created_at'},
+        ExpressionAttributeValues={':oid': order_id},
+        ProjectionExpression='#created_at',
+        Limit=1
+    )
+    items = result.get('Items', [])
+    return items[0]['created_at'] if items else None
+
+
+def remember_order_key(order_id, created_at):
+    order_keys[order_id] = created_at
+    order_keys.move_to_end(order_id)
+    while len(order_keys) > ORDER_KEY_CACHE_SIZE:
+        order_keys.popitem(last=False)
+
+
+def to_attribute_values(item):
+    """Item en el formato tipado del cliente de bajo nivel ({'S': ...})"""
+    from boto3.dynamodb.types import TypeSerializer
+
+    serializer = TypeSerializer()
+    return {k: serializer.serialize(v) for k, v in item.items()}
+
+
 def response(status_code, body):
     """Generar respuesta HTTP"""
     return {
@@ -0,0 +1,183 @@
+"""
+Tests unitarios para la función Lambda de Tracking
+"""
+
+import json
+import pytest
+import sys
+import os
+
+# Configurar path para importar el módulo y los compartidos (backend/common)
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'common'))
+
+# Mock de variables de entorno
+os.environ['TRACKING_TABLE'] = 'test-tracking-table'
+os.environ['ORDERS_TABLE'] = 'test-orders-table'
+os.environ['ENVIRONMENT'] = 'test'
+
+# Importar después de configurar env vars
+import handler
+
+
+class TestTrackingHistory:
+    """Tests para la consulta paginada de tracking"""
+
+    def test_get_tracking_returns_cursor(self, monkeypatch):
+        """Test: La página incluye next_cursor cuando hay más eventos"""
+
+        captured = {}
+
+        def mock_query(**kwargs):
+            captured.update(kwargs)
+            return {
+                'Items': [{'tracking_id': 'TRK-1', 'timestamp': '2024-01-02T10:00:00',
+                           'status': 'IN_TRANSIT', 'location': 'Lima'}],
+                'LastEvaluatedKey': {'tracking_id': 'TRK-1', 'timestamp': '2024-01-02T10:00:00',
+                                     'order_id': 'ORD-1'}
+            }
+
+        monkeypatch.setattr('handler.tracking_table.query', mock_query)
+
+        event = {
+            'httpMethod': 'GET',
+            'queryStringParameters': {'order_id': 'ORD-1', 'limit': '1'}
+        }
+
+        response = handler.handler(event, None)
+
+        assert response['statusCode'] == 200
+        body = json.loads(response['body'])
+        assert body['count'] == 1
+        assert body['next_cursor']
+        assert captured['Limit'] == 1
+        assert 'ProjectionExpression' in captured
+
+    def test_cursor_round_trip(self, monkeypatch):
+        """Test: El cursor se convierte de vuelta en ExclusiveStartKey"""
+
+        captured = {}
+
+        def mock_query(**kwargs):
+            captured.update(kwargs)
+            return {'Items': []}
+
+        monkeypatch.setattr('handler.tracking_table.query', mock_query)
+
+        key = {'tracking_id': 'TRK-1', 'timestamp': '2024-01-02T10:00:00', 'order_id': 'ORD-1'}
+        event = {
+            'httpMethod': 'GET',
+            'queryStringParameters': {
+                'order_id': 'ORD-1',
+                'cursor': handler.encode_cursor(key),
+                'from': '2024-01-01',
+                'to': '2024-01-31'
+            }
+        }
+
+        response = handler.handler(event, None)
+
+        assert response['statusCode'] == 200
+        assert json.loads(response['body'])['next_cursor'] is None
+        assert captured['ExclusiveStartKey'] == key
+        assert 'BETWEEN' in captured['KeyConditionExpression']
+
+    def test_cursor_from_other_order(self):
+        """Test: Un cursor de otra orden se rechaza"""
+
+        key = {'tracking_id': 'TRK-1', 'timestamp': '2024-01-02T10:00:00', 'order_id': 'ORD-1'}
+        event = {
+            'httpMethod': 'GET',
+            'queryStringParameters': {'order_id': 'ORD-2', 'cursor': handler.encode_cursor(key)}
+        }
+
+        response = handler.handler(event, None)
+
+        assert response['statusCode'] == 400
+
+    def test_limit_out_of_range(self):
+        """Test: limit mayor al máximo permitido"""
+
+        event = {
+            'httpMethod': 'GET',
+            'queryStringParameters': {'order_id': 'ORD-1', 'limit': '1000'}
+        }
+
+        response = handler.handler(event, None)
+
+        assert response['statusCode'] == 400
+
+
+
+class TestUpdateTracking:
+    """Tests para PUT /tracking (evento y estado de la orden en una transacción)"""
+
+    @pytest.fixture(autouse=True)
+    def fresh_order_keys(self, monkeypatch):
+        monkeypatch.setattr('handler.order_keys', handler.OrderedDict())
+
+    def put_event(self, status='IN_TRANSIT'):
+        return {
+            'httpMethod': 'PUT',
+            'body': json.dumps({'order_id': 'ORD-1', 'status': status, 'location': 'Surco'})
+        }
+
+    def test_single_transaction_with_cached_sort_key(self, monkeypatch):
+        """Test: Cada actualización es una transacción; created_at se consulta una sola vez"""
+
+        queries, transactions = [], []
+
+        def mock_query(**kwargs):
+            queries.append(kwargs)
+            return {'Items': [{'created_at': '2024-01-01T10:00:00'}]}
+
+        monkeypatch.setattr('handler.orders_table.query', mock_query)
+        monkeypatch.setattr('handler.dynamodb_client.transact_write_items',
+                            lambda **kwargs: transactions.append(kwargs) or {})
+
+        assert handler.handler(self.put_event(), None)['statusCode'] == 200
+        assert handler.handler(self.put_event('DELIVERED'), None)['statusCode'] == 200
+
+        assert len(queries) == 1
+        assert len(transactions) == 2
+        put, update = transactions[1]['TransactItems']
+        assert put['Put']['Item']['status'] == {'S': 'DELIVERED'}
+        assert update['Update']['Key'] == {'order_id': {'S': 'ORD-1'},
+                                           'created_at': {'S': '2024-01-01T10:00:00'}}
+        assert update['Update']['ConditionExpression'] == 'attribute_exists(order_id)'
+        assert transactions[1]['ClientRequestToken'] == put['Put']['Item']['tracking_id']['S']
+
+    def test_unknown_order(self, monkeypatch):
+        """Test: Orden inexistente devuelve 404 sin escribir nada"""
+
+        transactions = []
+
+        monkeypatch.setattr('handler.orders_table.query', lambda **kwargs: {'Items': []})
+        monkeypatch.setattr('handler.dynamodb_client.transact_write_items',
+                            lambda **kwargs: transactions.append(kwargs) or {})
+
+        assert handler.handler(self.put_event(), None)['statusCode'] == 404
+        assert transactions == []
+
+    def test_cancelled_transaction_evicts_cached_key(self, monkeypatch):
+        """Test: Si la condición sobre la orden falla se devuelve 404 y se olvida su created_at"""
+
+        from botocore.exceptions import ClientError
+
+        def mock_transact(**kwargs):
+            raise ClientError({
+                'Error': {'Code': 'TransactionCanceledException'},
+                'CancellationReasons': [{'Code': 'None'}, {'Code': 'ConditionalCheckFailed'}]
+            }, 'TransactWriteItems')
+
+        handler.remember_order_key('ORD-1', '2024-01-01T10:00:00')
+        monkeypatch.setattr('handler.dynamodb_client.transact_write_items', mock_transact)
+
+        assert handler.handler(self.put_event(), None)['statusCode'] == 404
+        assert 'ORD-1' not in handler.order_keys
+
+
+# Para ejecutar tests:
+# pytest tests/test_handler.py -v
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -180,6 +180,79 @@ module "routes_table" {
   tags = local.common_tags
 }
 
+# Cache de geocodificación (dirección normalizada -> coordenadas)
+module "geocode_cache_table" {
+  source = "../../modules/dynamodb"
+
+  table_name   = "${local.project}-${local.environment}-geocode-cache"
+  billing_mode = var.dynamodb_billing_mode
+  hash_key     = "address_key"
+
+  attributes = [
+    {
+      name = "address_key"
+      type = "S"
+    }
+  ]
+
+  # Las coordenadas se vuelven a resolver cada GEOCODE_CACHE_TTL_DAYS
+  ttl_enabled        = true
+  ttl_attribute_name = "expiry"
+
+  create_alarms = var.create_cloudwatch_alarms
+
+  tags = local.common_tags
+}
+
+# Cache de rutas optimizadas (hash del problema -> ruta resuelta)
+module "route_cache_table" {
+  source = "../../modules/dynamodb"
+
+  table_name   = "${local.project}-${local.environment}-route-cache"
+  billing_mode = var.dynamodb_billing_mode
+  hash_key     = "cache_key"
+
+  attributes = [
+    {
+      name = "cache_key"
+      type = "S"
+    }
+  ]
+
+  # Los planes vencen a las ROUTE_CACHE_TTL_HOURS
+  ttl_enabled        = true
+  ttl_attribute_name = "expiry"
+
+  create_alarms = var.create_cloudwatch_alarms
+
+  tags = local.common_tags
+}
+
+# Registro de notificaciones enviadas ("<messageId>:<canal>"): los
+# reintentos de SQS no repiten envíos que ya salieron
+module "notification_dedupe_table" {
+  source = "../../modules/dynamodb"
+
+  table_name   = "${local.project}-${local.environment}-notification-dedupe"
+  billing_mode = var.dynamodb_billing_mode
+  hash_key     = "dedupe_key"
+
+  attributes = [
+    {
+      name = "dedupe_key"
+      type = "S"
+    }
+  ]
+
+  # Los registros vencen a las DEDUPE_TTL_HOURS
+  ttl_enabled        = true
+  ttl_attribute_name = "expiry"
+
+  create_alarms = var.create_cloudwatch_alarms
+
+  tags = local.common_tags
+}
+
 # ========================================
 # SQS QUEUES
 # ========================================
@@ -291,17 +364,24 @@ module "lambda_optimize_routes" {
 
   runtime     = "python3.11"
   handler     = "optimizer.handler"
-  memory_size = 512 # Más memoria para cálculos
+  memory_size = 3008 # Más de 1769 MB: 2 vCPU para resolver las rutas de la flota en paralelo
   timeout     = 60
 
   environment_variables = {
-    ROUTES_TABLE = module.routes_table.table_name
-    ORDERS_TABLE = module.orders_table.table_name
-    ENVIRONMENT  = local.environment
+    ROUTES_TABLE        = module.routes_table.table_name
+    ORDERS_TABLE        = module.orders_table.table_name
+    GEOCODE_CACHE_TABLE = module.geocode_cache_table.table_name
+    ROUTE_CACHE_TABLE   = module.route_cache_table.table_name
+    ENVIRONMENT         = local.environment
   }
 
   create_custom_policy = true
-  dynamodb_table_arns  = [module.routes_table.table_arn, module.orders_table.table_arn]
+  dynamodb_table_arns = [
+    module.routes_table.table_arn,
+    module.orders_table.table_arn,
+    module.geocode_cache_table.table_arn,
+    module.route_cache_table.table_arn
+  ]
   sqs_queue_arns       = []
   sns_topic_arns       = []
 
@@ -327,7 +407,9 @@ module "lambda_send_notifications" {
   timeout     = var.lambda_timeout
 
   environment_variables = {
-    ENVIRONMENT = local.environment
+    ENVIRONMENT               = local.environment
+    DEAD_LETTER_QUEUE         = module.notifications_queue.dlq_url # mensajes inválidos, sin esperar a maxReceiveCount
+    NOTIFICATION_DEDUPE_TABLE = module.notification_dedupe_table.table_name
   }
 
   # Event source mapping desde SQS
@@ -335,8 +417,8 @@ module "lambda_send_notifications" {
   sqs_batch_size       = 10
 
   create_custom_policy = true
-  dynamodb_table_arns  = []
-  sqs_queue_arns       = [module.notifications_queue.queue_arn]
+  dynamodb_table_arns  = [module.notification_dedupe_table.table_arn]
+  sqs_queue_arns       = [module.notifications_queue.queue_arn, module.notifications_queue.dlq_arn]
   sns_topic_arns       = []
 
   enable_tracing     = var.enable_xray_tracing
@@ -386,6 +468,18 @@ module "api_gateway" {
       http_method          = "POST"
       lambda_function_name = module.lambda_optimize_routes.function_name
       lambda_invoke_arn    = module.lambda_optimize_routes.function_invoke_arn
+    },
+    {
+      path                 = "routes"
+      http_method          = "PUT"
+      lambda_function_name = module.lambda_optimize_routes.function_name
+      lambda_invoke_arn    = module.lambda_optimize_routes.function_invoke_arn
+    },
+    {
+      path                 = "route-plans"
+      http_method          = "POST"
+      lambda_function_name = module.lambda_optimize_routes.function_name
+      lambda_invoke_arn    = module.lambda_optimize_routes.function_invoke_arn
     }
   ]
 
@@ -0,0 +1,166 @@
+"""
+Benchmark de cold start de los handlers Lambda
+Sistema de Tracking DINEX Perú
+
+Mide, en un proceso Python nuevo por muestra (como un contenedor Lambda
+recién creado):
+- import_ms: tiempo de importar el módulo del handler
+- first_invoke_ms: tiempo de la primera invocación
+- boto3: si boto3 quedó importado al terminar la invocación
+
+Solo se usan eventos que no llaman a AWS (health superficial, batches
+vacíos, errores de validación), así que no hace falta red ni credenciales y
+los resultados son reproducibles en cualquier máquina.
+
+Uso:
+    python benchmarks/cold_start.py
+    python benchmarks/cold_start.py --runs 30 --output benchmarks/results/cold_start.json
+    python benchmarks/cold_start.py --case tracking-health
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMON_DIR = os.path.join(ROOT, 'lambda', 'common')
+BACKEND_DIR = os.path.join(ROOT, 'PROYECTO-BACKUP', 'backend')
+BACKEND_COMMON_DIR = os.path.join(BACKEND_DIR, 'common')
+
+# Variables de entorno mínimas para importar los handlers sin AWS real
+ENV = {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'TABLE_NAME': 'bench-tracking',
+    'SNS_TOPIC': 'arn:aws:sns:us-east-1:000000000000:bench',
+    'ORDERS_TABLE': 'bench-orders',
+    'TRACKING_TABLE': 'bench-tracking',
+    'ROUTES_TABLE': 'bench-routes',
+    'NOTIFICATIONS_QUEUE': 'https://sqs.us-east-1.amazonaws.com/000000000000/bench',
+    'BLOOM_FILTER_ENABLED': 'false',
+    'LOG_LEVEL': 'WARNING',
+}
+
+# (nombre, archivo del handler, función, evento)
+CASES = [
+    ('tracking-health', os.path.join(ROOT, 'lambda', 'tracking', 'index.py'), 'handler', {
+        'requestContext': {'http': {'method': 'GET', 'path': '/health'}},
+        'queryStringParameters': {'shallow': 'true'},
+    }),
+    ('tracking-405', os.path.join(ROOT, 'lambda', 'tracking', 'index.py'), 'handler', {
+        'requestContext': {'http': {'method': 'DELETE', 'path': '/tracking'}},
+    }),
+    ('notifications-empty', os.path.join(ROOT, 'lambda', 'notifications', 'index.py'), 'handler', {
+        'Records': [],
+    }),
+    ('backup-ordenes-400', os.path.join(BACKEND_DIR, 'ordenes', 'main.py'), 'handler', {
+        'httpMethod': 'POST', 'body': '{}',
+    }),
+    ('backup-tracking-400', os.path.join(BACKEND_DIR, 'tracking', 'handler.py'), 'handler', {
+        'httpMethod': 'GET', 'queryStringParameters': None,
+    }),
+    ('backup-rutas-400', os.path.join(BACKEND_DIR, 'rutas', 'optimizer.py'), 'handler', {
+        'httpMethod': 'POST', 'body': '{}',
+    }),
+    ('backup-notificaciones-empty', os.path.join(BACKEND_DIR, 'notificaciones', 'notify.py'), 'handler', {
+        'Records': [],
+    }),
+]
+
+# Código que corre en el proceso hijo: importa el handler desde su archivo,
+# lo invoca una vez e imprime las mediciones en JSON
+_CHILD = r'''
+import importlib.util, io, json, sys, time, contextlib
+path, function, event = sys.argv[1], sys.argv[2], json.loads(sys.argv[3])
+sys.path[:0] = sys.argv[4:]
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location('bench_handler', path)
+module = importlib.util.module_from_spec(spec)
+with contextlib.redirect_stdout(io.StringIO()):
+    spec.loader.exec_module(module)
+imported = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    result = getattr(module, function)(event, None)
+invoked = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'first_invoke_ms': (invoked - imported) * 1000,
+    'status_code': result.get('statusCode') if isinstance(result, dict) else None,
+    'boto3': 'boto3' in sys.modules,
+}))
+'''
+
+
+def run_sample(path, function, event):
+    """Ejecuta una muestra en un intérprete nuevo"""
+    env = dict(os.environ, **ENV)
+    completed = subprocess.run(
+        [sys.executable, '-c', _CHILD, path, function, json.dumps(event),
+         os.path.dirname(path), COMMON_DIR, BACKEND_COMMON_DIR],
+        capture_output=True, text=True, env=env, check=True
+    )
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples):
+    summary = {}
+    for metric in ('import_ms', 'first_invoke_ms'):
+        values = [s[metric] for s in samples]
+        summary[metric] = {
+            'median': round(statistics.median(values), 2),
+            'p95': round(percentile(values, 95), 2),
+            'min': round(min(values), 2),
+        }
+    totals = [s['import_ms'] + s['first_invoke_ms'] for s in samples]
+    summary['total_ms'] = {
+        'median': round(statistics.median(totals), 2),
+        'p95': round(percentile(totals, 95), 2),
+    }
+    summary['status_code'] = samples[-1]['status_code']
+    summary['boto3_imported'] = any(s['boto3'] for s in samples)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de cold start de los handlers')
+    parser.add_argument('--runs', type=int, default=15, help='Muestras por caso')
+    parser.add_argument('--case', action='append', help='Ejecutar solo estos casos')
+    parser.add_argument('--output', help='Guardar resultados en JSON')
+    args = parser.parse_args()
+
+    cases = [c for c in CASES if not args.case or c[0] in args.case]
+    results = {
+        'generated_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'runs': args.runs,
+        'cases': {},
+    }
+
+    print(f"{'caso':30} {'import p50':>11} {'import p95':>11} {'invoke p50':>11} {'total p50':>10}  boto3")
+    for name, path, function, event in cases:
+        samples = [run_sample(path, function, event) for _ in range(args.runs)]
+        summary = summarize(samples)
+        results['cases'][name] = summary
+        print(f"{name:30} {summary['import_ms']['median']:>9.1f}ms {summary['import_ms']['p95']:>9.1f}ms "
+              f"{summary['first_invoke_ms']['median']:>9.1f}ms {summary['total_ms']['median']:>8.1f}ms  "
+              f"{'sí' if summary['boto3_imported'] else 'no'}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,409 @@
+"""
+Servicios AWS en memoria para el load test
+Sistema de Tracking DINEX Perú
+
+Implementan solo la parte de la API de boto3 que usan los handlers
+(get_item, put_item, query, scan, update_item, delete_item,
+batch_get_item, batch_write_item, transact_write_items, publish,
+publish_batch, send_message, get_object, put_object), con una latencia simulada configurable por
+llamada. No reemplazan a DynamoDB: no validan tipos ni capacidad, y de las
+expresiones solo entienden las formas que aparecen en el código.
+"""
+
+import copy
+import hashlib
+import io
+import random
+import re
+import time
+from decimal import Decimal
+
+try:
+    from botocore.exceptions import ClientError as _ClientError
+except ImportError:
+    _ClientError = Exception
+
+
+class SimulatedLatency:
+    """
+    Latencia simulada de cada llamada a un servicio
+
+    Args:
+        mean_ms: Latencia media por llamada
+        jitter_ms: Variación uniforme (+/-) alrededor de la media
+    """
+
+    def __init__(self, mean_ms=0.0, jitter_ms=0.0, seed=42):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self.calls = 0
+        self._random = random.Random(seed)
+
+    def wait(self):
+        self.calls += 1
+        if self.mean_ms <= 0:
+            return
+        delay = self.mean_ms + self._random.uniform(-self.jitter_ms, self.jitter_ms)
+        time.sleep(max(0.0, delay) / 1000)
+
+
+class ConditionalCheckFailed(_ClientError):
+    """
+    Equivalente a ConditionalCheckFailedException: si botocore está
+    instalado es un ClientError con el mismo código, como el de boto3
+    """
+
+    def __init__(self, expression):
+        super().__init__({'Error': {'Code': 'ConditionalCheckFailedException', 'Message': expression}},
+                         'ConditionCheck')
+
+
+class S3Error(_ClientError):
+    """Error de S3 con el código que devuelve boto3 (NoSuchKey, 304...)"""
+
+    def __init__(self, code, operation):
+        super().__init__({'Error': {'Code': code, 'Message': code}}, operation)
+
+
+_KEY_CONDITION = re.compile(
+    r'^\s*(?P<hash>[#\w]+)\s*=\s*(?P<hash_value>:\w+)'
+    r'(?:\s+AND\s+(?P<range>[#\w]+)\s*'
+    r'(?:BETWEEN\s+(?P<low>:\w+)\s+AND\s+(?P<high>:\w+)|(?P<op><=|>=|<|>|=)\s*(?P<value>:\w+)))?\s*$',
+    re.IGNORECASE
+)
+
+_SET_CLAUSE = re.compile(r'([#\w]+)\s*=\s*(:\w+)')
+
+_UPDATE_ASSIGNMENT = re.compile(
+    r'([#\w]+)\s*=\s*(?:if_not_exists\(\s*([#\w]+)\s*,\s*(:\w+)\s*\)|(:\w+))'
+)
+
+_CONDITION_TERM = re.compile(
+    r'^\s*(?:(?P<function>attribute_exists|attribute_not_exists)\(\s*(?P<attribute>[#\w]+)\s*\)'
+    r'|(?P<name>[#\w]+)\s*(?P<op><=|>=|<|>|=)\s*(?P<value>:\w+))\s*$'
+)
+
+_COMPARISONS = {
+    '=': lambda a, b: a == b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+
+def _resolve(name, attribute_names):
+    return (attribute_names or {}).get(name, name)
+
+
+def _condition_holds(item, expression, attribute_names, attribute_values):
+    """
+    Evalúa una ConditionExpression sobre el item actual (None si no existe)
+
+    Solo entiende términos attribute_exists(a), attribute_not_exists(a) y
+    "a <op> :v" unidos con OR / AND (sin paréntesis)
+    """
+    def term_holds(term):
+        match = _CONDITION_TERM.match(term)
+        if match.group('function'):
+            exists = item is not None and _resolve(match.group('attribute'), attribute_names) in item
+            return exists if match.group('function') == 'attribute_exists' else not exists
+        name = _resolve(match.group('name'), attribute_names)
+        if item is None or name not in item:
+            return False
+        return _COMPARISONS[match.group('op')](item[name], attribute_values[match.group('value')])
+
+    return any(all(term_holds(term) for term in re.split(r'\s+AND\s+', alternative))
+               for alternative in re.split(r'\s+OR\s+', expression))
+
+
+def _plain(value):
+    """Valor del formato tipado del cliente de bajo nivel ({'S': ...}) a Python"""
+    (kind, data), = value.items()
+    if kind == 'N':
+        return Decimal(data)
+    if kind == 'M':
+        return {k: _plain(v) for k, v in data.items()}
+    if kind == 'L':
+        return [_plain(v) for v in data]
+    if kind == 'NULL':
+        return None
+    return data
+
+
+def _project(item, projection, attribute_names):
+    if not projection:
+        return copy.deepcopy(item)
+    fields = [_resolve(f.strip(), attribute_names) for f in projection.split(',')]
+    return {f: copy.deepcopy(item[f]) for f in fields if f in item}
+
+
+class InMemoryTable:
+    """
+    Tabla DynamoDB en memoria
+
+    Args:
+        name: Nombre de la tabla
+        hash_key: Partition key
+        range_key: Sort key (opcional)
+        indexes: {nombre_gsi: (hash_key, range_key)}
+        latency: SimulatedLatency compartida con el resto de servicios
+    """
+
+    table_status = 'ACTIVE'
+
+    def __init__(self, name, hash_key, range_key=None, indexes=None, latency=None):
+        self.name = name
+        self.hash_key = hash_key
+        self.range_key = range_key
+        self.indexes = indexes or {}
+        self.latency = latency or SimulatedLatency()
+        self.items = {}
+
+    def _key(self, item):
+        return (item[self.hash_key], item.get(self.range_key) if self.range_key else None)
+
+    def get_item(self, Key, **kwargs):
+        self.latency.wait()
+        item = self.items.get(self._key(Key))
+        return {'Item': copy.deepcopy(item)} if item is not None else {}
+
+    def put_item(self, Item, ConditionExpression=None, ExpressionAttributeNames=None,
+                 ExpressionAttributeValues=None, **kwargs):
+        self.latency.wait()
+        key = self._key(Item)
+        existing = self.items.get(key)
+
+        if ConditionExpression and not _condition_holds(existing, ConditionExpression,
+                                                         ExpressionAttributeNames, ExpressionAttributeValues):
+            raise ConditionalCheckFailed(ConditionExpression)
+
+        self.items[key] = copy.deepcopy(Item)
+        return {}
+
+    def delete_item(self, Key, **kwargs):
+        self.latency.wait()
+        self.items.pop(self._key(Key), None)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeNames=None,
+                    ExpressionAttributeValues=None, ConditionExpression=None, ReturnValues='NONE', **kwargs):
+        """SET (con if_not_exists) y REMOVE; condición como en put_item; ReturnValues UPDATED_NEW/ALL_NEW"""
+        self.latency.wait()
+        key = self._key(Key)
+        if ConditionExpression and not _condition_holds(self.items.get(key), ConditionExpression,
+                                                         ExpressionAttributeNames, ExpressionAttributeValues):
+            raise ConditionalCheckFailed(ConditionExpression)
+
+        item = self.items.setdefault(key, copy.deepcopy(Key))
+        set_clause, _, remove_clause = UpdateExpression.partition(' REMOVE ')
+        updated = []
+        for name, existing, default, placeholder in _UPDATE_ASSIGNMENT.findall(set_clause.replace('SET', '', 1)):
+            name = _resolve(name, ExpressionAttributeNames)
+            updated.append(name)
+            if existing and _resolve(existing, ExpressionAttributeNames) in item:
+                continue
+            item[name] = copy.deepcopy(ExpressionAttributeValues[placeholder or default])
+        for name in filter(None, (n.strip() for n in remove_clause.split(','))):
+            item.pop(_resolve(name, ExpressionAttributeNames), None)
+
+        if ReturnValues == 'ALL_NEW':
+            return {'Attributes': copy.deepcopy(item)}
+        if ReturnValues == 'UPDATED_NEW':
+            return {'Attributes': {name: copy.deepcopy(item[name]) for name in updated}}
+        return {}
+
+    def query(self, KeyConditionExpression, ExpressionAttributeValues, ExpressionAttributeNames=None,
+              IndexName=None, ScanIndexForward=True, Limit=None, ExclusiveStartKey=None,
+              ProjectionExpression=None, **kwargs):
+        self.latency.wait()
+        hash_key, range_key = self.indexes[IndexName] if IndexName else (self.hash_key, self.range_key)
+
+        match = _KEY_CONDITION.match(KeyConditionExpression)
+        if not match:
+            raise ValueError(f'KeyConditionExpression no soportada: {KeyConditionExpression}')
+        if _resolve(match.group('hash'), ExpressionAttributeNames) != hash_key:
+            raise ValueError(f'La condición no usa el partition key {hash_key}')
+
+        values = ExpressionAttributeValues
+        hash_value = values[match.group('hash_value')]
+        items = [i for i in self.items.values() if i.get(hash_key) == hash_value]
+
+        if match.group('range'):
+            if match.group('low'):
+                low, high = values[match.group('low')], values[match.group('high')]
+                items = [i for i in items if low <= i.get(range_key) <= high]
+            else:
+                op, value = match.group('op'), values[match.group('value')]
+                compare = {'<': lambda a: a < value, '<=': lambda a: a <= value, '=': lambda a: a == value,
+                           '>': lambda a: a > value, '>=': lambda a: a >= value}[op]
+                items = [i for i in items if compare(i.get(range_key))]
+
+        items.sort(key=lambda i: i.get(range_key) if range_key else 0, reverse=not ScanIndexForward)
+
+        if ExclusiveStartKey:
+            start = self._key(ExclusiveStartKey)
+            positions = [n for n, i in enumerate(items) if self._key(i) == start]
+            items = items[positions[0] + 1:] if positions else items
+
+        result = {}
+        if Limit is not None and len(items) > Limit:
+            items = items[:Limit]
+            last = items[-1]
+            result['LastEvaluatedKey'] = {k: last[k] for k in {self.hash_key, self.range_key, hash_key, range_key}
+                                          if k and k in last}
+
+        result['Items'] = [_project(i, ProjectionExpression, ExpressionAttributeNames) for i in items]
+        result['Count'] = len(items)
+        return result
+
+    def scan(self, Limit=None, ExclusiveStartKey=None, ProjectionExpression=None,
+             ExpressionAttributeNames=None, **kwargs):
+        self.latency.wait()
+        items = list(self.items.values())
+
+        if ExclusiveStartKey:
+            keys = [self._key(i) for i in items]
+            start = self._key(ExclusiveStartKey)
+            items = items[keys.index(start) + 1:] if start in keys else items
+
+        result = {}
+        if Limit is not None and len(items) > Limit:
+            items = items[:Limit]
+            result['LastEvaluatedKey'] = {k: items[-1][k] for k in (self.hash_key, self.range_key) if k}
+
+        result['Items'] = [_project(i, ProjectionExpression, ExpressionAttributeNames) for i in items]
+        return result
+
+
+class InMemoryDynamoDB:
+    """
+    DynamoDB en memoria: Table(), batch_get_item(), batch_write_item() del
+    recurso y transact_write_items() del cliente (valores tipados)
+    """
+
+    def __init__(self, latency=None):
+        self.latency = latency or SimulatedLatency()
+        self.tables = {}
+
+    def create_table(self, name, hash_key, range_key=None, indexes=None):
+        self.tables[name] = InMemoryTable(name, hash_key, range_key, indexes, self.latency)
+        return self.tables[name]
+
+    def Table(self, name):
+        return self.tables[name]
+
+    def batch_get_item(self, RequestItems):
+        self.latency.wait()
+        responses = {}
+        for name, request in RequestItems.items():
+            table = self.tables[name]
+            responses[name] = [
+                copy.deepcopy(table.items[table._key(key)])
+                for key in request['Keys'] if table._key(key) in table.items
+            ]
+        return {'Responses': responses, 'UnprocessedKeys': {}}
+
+    def batch_write_item(self, RequestItems):
+        self.latency.wait()
+        for name, requests in RequestItems.items():
+            table = self.tables[name]
+            for request in requests:
+                if 'PutRequest' in request:
+                    item = request['PutRequest']['Item']
+                    table.items[table._key(item)] = copy.deepcopy(item)
+                elif 'DeleteRequest' in request:
+                    table.items.pop(table._key(request['DeleteRequest']['Key']), None)
+        return {'UnprocessedItems': {}}
+
+    def transact_write_items(self, TransactItems, ClientRequestToken=None):
+        """Put y Update con condiciones (ver _condition_holds), todo o nada"""
+        self.latency.wait()
+        writes = []
+        for request in TransactItems:
+            (kind, spec), = request.items()
+            table = self.tables[spec['TableName']]
+            key = table._key({k: _plain(v) for k, v in (spec.get('Item') or spec['Key']).items()})
+            condition = spec.get('ConditionExpression')
+            if condition and not _condition_holds(table.items.get(key), condition,
+                                                  spec.get('ExpressionAttributeNames'),
+                                                  {k: _plain(v) for k, v in
+                                                   spec.get('ExpressionAttributeValues', {}).items()}):
+                raise ConditionalCheckFailed(condition)
+            writes.append((kind, table, key, spec))
+
+        for kind, table, key, spec in writes:
+            if kind == 'Put':
+                table.items[key] = {k: _plain(v) for k, v in spec['Item'].items()}
+            elif kind == 'Update':
+                names = spec.get('ExpressionAttributeNames')
+                values = spec.get('ExpressionAttributeValues', {})
+                item = table.items.setdefault(key, {k: _plain(v) for k, v in spec['Key'].items()})
+                for name, placeholder in _SET_CLAUSE.findall(spec['UpdateExpression'].replace('SET', '', 1)):
+                    item[_resolve(name, names)] = _plain(values[placeholder])
+        return {}
+
+
+class InMemorySNS:
+    """Cliente SNS en memoria: guarda los mensajes publicados"""
+
+    def __init__(self, latency=None):
+        self.latency = latency or SimulatedLatency()
+        self.published = []
+
+    def publish(self, TopicArn, Message, Subject=None, **kwargs):
+        self.latency.wait()
+        self.published.append({'TopicArn': TopicArn, 'Subject': Subject, 'Message': Message})
+        return {'MessageId': f'msg-{len(self.published)}'}
+
+    def publish_batch(self, TopicArn, PublishBatchRequestEntries):
+        self.latency.wait()
+        for entry in PublishBatchRequestEntries:
+            self.published.append({'TopicArn': TopicArn, 'Subject': entry.get('Subject'),
+                                   'Message': entry['Message']})
+        return {'Successful': [{'Id': e['Id'], 'MessageId': f"msg-{e['Id']}"}
+                               for e in PublishBatchRequestEntries],
+                'Failed': []}
+
+
+class InMemorySQS:
+    """Cliente SQS en memoria: guarda los mensajes enviados por cola"""
+
+    def __init__(self, latency=None):
+        self.latency = latency or SimulatedLatency()
+        self.queues = {}
+
+    def send_message(self, QueueUrl, MessageBody, **kwargs):
+        self.latency.wait()
+        queue = self.queues.setdefault(QueueUrl, [])
+        queue.append(MessageBody)
+        return {'MessageId': f'msg-{len(queue)}'}
+
+    def send_message_batch(self, QueueUrl, Entries):
+        self.latency.wait()
+        self.queues.setdefault(QueueUrl, []).extend(e['MessageBody'] for e in Entries)
+        return {'Successful': [{'Id': e['Id']} for e in Entries], 'Failed': []}
+
+
+class InMemoryS3:
+    """Cliente S3 en memoria: objetos por (bucket, key), con ETag e IfNoneMatch"""
+
+    def __init__(self, latency=None):
+        self.latency = latency or SimulatedLatency()
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.latency.wait()
+        body = bytes(Body)
+        etag = '"' + hashlib.md5(body).hexdigest() + '"'
+        self.objects[(Bucket, Key)] = (body, etag)
+        return {'ETag': etag}
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        self.latency.wait()
+        if (Bucket, Key) not in self.objects:
+            raise S3Error('NoSuchKey', 'GetObject')
+        body, etag = self.objects[(Bucket, Key)]
+        if IfNoneMatch == etag:
+            raise S3Error('304', 'GetObject')
+        return {'Body': io.BytesIO(body), 'ETag': etag, 'ContentLength': len(body)}
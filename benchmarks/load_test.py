@@ -0,0 +1,406 @@
+"""
+Load test local de los handlers Lambda
+Sistema de Tracking DINEX Perú
+
+Invoca el `handler` de cada Lambda (proyecto individual y PROYECTO-BACKUP)
+con eventos sintéticos de API Gateway v1/v2, SQS y DynamoDB Streams contra
+los servicios en memoria de fakes.py, con latencia simulada configurable.
+
+Por escenario reporta:
+- rps: requests por segundo (secuencial, como un contenedor Lambda)
+- p50/p95/p99: latencia por request en ms
+- alloc_kb: memoria asignada por request (pico de tracemalloc, en una
+  pasada aparte para no distorsionar las latencias)
+- retained_b: bytes que quedan vivos por request (caches, fugas)
+
+Con --baseline compara contra un JSON anterior y termina con código 1 si
+algún escenario empeoró más que --tolerance (para correr antes de deploy).
+
+Uso:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --latency-ms 5 --jitter-ms 2 --requests 500
+    python benchmarks/load_test.py --output benchmarks/results/load.json
+    python benchmarks/load_test.py --baseline benchmarks/results/load.json --tolerance 0.25
+"""
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from cold_start import BACKEND_COMMON_DIR, BACKEND_DIR, COMMON_DIR, ENV, ROOT
+from fakes import InMemoryDynamoDB, InMemorySNS, InMemorySQS, SimulatedLatency
+
+# Datos sembrados en las tablas antes de cada escenario
+SEED_TRACKINGS = 500
+SEED_EVENTS_PER_TRACKING = 20
+SEED_ORDERS = 500
+SEED_CUSTOMERS = 50
+
+STATUSES = ['PROCESSING', 'IN_TRANSIT', 'OUT_FOR_DELIVERY', 'DELIVERED']
+DISTRICTS = ['Miraflores', 'San Isidro', 'Surco', 'La Molina', 'Barranco', 'Lince', 'Jesús María']
+
+HANDLERS = {
+    'tracking': os.path.join(ROOT, 'lambda', 'tracking', 'index.py'),
+    'notifications': os.path.join(ROOT, 'lambda', 'notifications', 'index.py'),
+    'ordenes': os.path.join(BACKEND_DIR, 'ordenes', 'main.py'),
+    'backup-tracking': os.path.join(BACKEND_DIR, 'tracking', 'handler.py'),
+    'rutas': os.path.join(BACKEND_DIR, 'rutas', 'optimizer.py'),
+    'notificaciones': os.path.join(BACKEND_DIR, 'notificaciones', 'notify.py'),
+}
+
+
+# ============================================
+# Eventos sintéticos
+# ============================================
+
+def api_v2_event(method, path, query=None, body=None):
+    """Evento de API Gateway HTTP API (payload v2), como lo recibe lambda/tracking"""
+    return {
+        'version': '2.0',
+        'rawPath': path,
+        'requestContext': {'http': {'method': method, 'path': path}},
+        'queryStringParameters': query,
+        'body': json.dumps(body) if body is not None else None,
+    }
+
+
+def api_v1_event(method, path, query=None, body=None):
+    """Evento de API Gateway REST API (payload v1), como lo reciben los módulos backup"""
+    return {
+        'httpMethod': method,
+        'path': path,
+        'queryStringParameters': query,
+        'body': json.dumps(body) if body is not None else None,
+    }
+
+
+def sqs_event(messages):
+    """Evento de SQS con un record por mensaje"""
+    return {'Records': [
+        {
+            'messageId': f'msg-{n}',
+            'eventSource': 'aws:sqs',
+            'body': json.dumps(message),
+        }
+        for n, message in enumerate(messages)
+    ]}
+
+
+def attribute_value(value):
+    """Serializa un valor Python al formato de DynamoDB Streams"""
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, (int, float)):
+        return {'N': str(value)}
+    return {'S': str(value)}
+
+
+def stream_record(event_name, new_image, old_image=None):
+    """Record de DynamoDB Stream con NEW_AND_OLD_IMAGES"""
+    data = {
+        'Keys': {k: attribute_value(new_image[k]) for k in ('tracking_id', 'timestamp')},
+        'NewImage': {k: attribute_value(v) for k, v in new_image.items()},
+        'StreamViewType': 'NEW_AND_OLD_IMAGES',
+    }
+    if old_image:
+        data['OldImage'] = {k: attribute_value(v) for k, v in old_image.items()}
+    return {'eventName': event_name, 'eventSource': 'aws:dynamodb', 'dynamodb': data}
+
+
+# ============================================
+# Servicios en memoria y datos sembrados
+# ============================================
+
+def tracking_services(latency):
+    """Tabla de tracking del proyecto individual (tracking_id + timestamp N)"""
+    dynamodb = InMemoryDynamoDB(latency)
+    table = dynamodb.create_table(ENV['TABLE_NAME'], 'tracking_id', 'timestamp',
+                                  indexes={'package-index': ('package_id', 'timestamp')})
+    base = int(time.time()) - SEED_EVENTS_PER_TRACKING * 3600
+
+    for n in range(SEED_TRACKINGS):
+        tracking_id = f'TRK{n:05d}'
+        for e in range(SEED_EVENTS_PER_TRACKING):
+            table.items[(tracking_id, base + e * 3600)] = {
+                'tracking_id': tracking_id, 'timestamp': base + e * 3600,
+                'package_id': f'PKG{n:05d}', 'location': f'Lima - {DISTRICTS[e % len(DISTRICTS)]}',
+                'status': STATUSES[min(e * len(STATUSES) // SEED_EVENTS_PER_TRACKING, len(STATUSES) - 1)],
+                'notes': '', 'expiry': base + 30 * 86400,
+            }
+        last = dict(table.items[(tracking_id, base + (SEED_EVENTS_PER_TRACKING - 1) * 3600)])
+        last.update(timestamp=0, last_update=base + (SEED_EVENTS_PER_TRACKING - 1) * 3600)
+        table.items[(tracking_id, 0)] = last
+
+    return {'dynamodb': dynamodb, 'table': table, 'sns': InMemorySNS(latency)}
+
+
+def orders_services(latency):
+    """Tablas de órdenes, rutas y tracking (legacy) del PROYECTO-BACKUP"""
+    dynamodb = InMemoryDynamoDB(latency)
+    orders = dynamodb.create_table(ENV['ORDERS_TABLE'], 'order_id', 'created_at',
+                                   indexes={'customer_index': ('customer_id', 'created_at')})
+    routes = dynamodb.create_table(ENV['ROUTES_TABLE'], 'route_id', 'created_at')
+    tracking = dynamodb.create_table(ENV['TRACKING_TABLE'], 'tracking_id', 'timestamp',
+                                     indexes={'order_index': ('order_id', 'timestamp')})
+
+    for n in range(SEED_ORDERS):
+        created_at = f'2026-01-{n % 28 + 1:02d}T10:{n % 60:02d}:00'
+        order_id = f'ORD{n:05d}'
+        orders.items[(order_id, created_at)] = {
+            'order_id': order_id, 'created_at': created_at,
+            'customer_id': f'CUST{n % SEED_CUSTOMERS:03d}', 'status': 'PENDING',
+            'delivery_address': f'Av. {n} {DISTRICTS[n % len(DISTRICTS)]}, Lima',
+            'products': [{'sku': 'PROD1', 'quantity': 1, 'price': 10}],
+        }
+        for e in range(5):
+            timestamp = f'2026-01-{n % 28 + 1:02d}T1{e}:00:00'
+            tracking.items[(f'TRK-{n:05d}-{e}', timestamp)] = {
+                'tracking_id': f'TRK-{n:05d}-{e}', 'timestamp': timestamp,
+                'order_id': order_id, 'status': STATUSES[e % len(STATUSES)],
+                'location': DISTRICTS[e % len(DISTRICTS)],
+            }
+
+    return {'dynamodb': dynamodb, 'dynamodb_client': dynamodb, 'orders_table': orders,
+            'routes_table': routes, 'tracking_table': tracking, 'sqs': InMemorySQS(latency)}
+
+
+# ============================================
+# Escenarios: (handler, servicios, generador de eventos)
+# ============================================
+
+def _tracking_post(rng, n, tracking_id=None):
+    return {'tracking_id': tracking_id or f'TRK{rng.randrange(SEED_TRACKINGS):05d}',
+            'location': f'Lima - {rng.choice(DISTRICTS)}', 'status': rng.choice(STATUSES),
+            'latitude': -12.1 + rng.random() / 10, 'longitude': -77.0 - rng.random() / 10}
+
+
+def _snapshot(tracking_id, status, location, last_update):
+    return {'tracking_id': tracking_id, 'timestamp': 0, 'status': status,
+            'location': location, 'last_update': last_update, 'package_id': 'PKG'}
+
+
+def _stream_batch(rng, n, size=10):
+    records = []
+    for _ in range(size // 2):
+        tracking_id = f'TRK{rng.randrange(SEED_TRACKINGS):05d}'
+        now = 1_700_000_000 + n
+        event = dict(_snapshot(tracking_id, rng.choice(STATUSES), rng.choice(DISTRICTS), now), timestamp=now)
+        records.append(stream_record('INSERT', event))
+        records.append(stream_record('MODIFY', _snapshot(tracking_id, event['status'], event['location'], now),
+                                     _snapshot(tracking_id, 'IN_TRANSIT', 'Lima - Almacén', now - 60)))
+    return {'Records': records}
+
+
+SCENARIOS = {
+    'tracking-get': ('tracking', tracking_services, lambda rng, n: api_v2_event(
+        'GET', '/tracking', {'tracking_id': f'TRK{rng.randrange(SEED_TRACKINGS):05d}'})),
+    'tracking-get-batch': ('tracking', tracking_services, lambda rng, n: api_v2_event(
+        'GET', '/tracking', {'tracking_ids': ','.join(
+            f'TRK{rng.randrange(SEED_TRACKINGS):05d}' for _ in range(20))})),
+    'tracking-history': ('tracking', tracking_services, lambda rng, n: api_v2_event(
+        'GET', '/tracking', {'tracking_id': f'TRK{rng.randrange(SEED_TRACKINGS):05d}',
+                             'history': 'true', 'limit': '10'})),
+    'tracking-post': ('tracking', tracking_services, lambda rng, n: api_v2_event(
+        'POST', '/tracking', body=_tracking_post(rng, n))),
+    'tracking-post-bulk': ('tracking', tracking_services, lambda rng, n: api_v2_event(
+        'POST', '/tracking', body={'events': [_tracking_post(rng, n, f'TRK{i:05d}')
+                                    for i in rng.sample(range(SEED_TRACKINGS), 25)]})),
+    'notifications-stream': ('notifications', tracking_services, _stream_batch),
+    'ordenes-post': ('ordenes', orders_services, lambda rng, n: api_v1_event(
+        'POST', '/orders', body={'customer_id': f'CUST{rng.randrange(SEED_CUSTOMERS):03d}',
+                                 'products': [{'sku': 'PROD1', 'quantity': 2, 'price': 25.5}],
+                                 'delivery_address': f'Av. {n} {rng.choice(DISTRICTS)}, Lima'})),
+    'ordenes-get': ('ordenes', orders_services, lambda rng, n: api_v1_event(
+        'GET', '/orders', {'customer_id': f'CUST{rng.randrange(SEED_CUSTOMERS):03d}'})),
+    'backup-tracking-get': ('backup-tracking', orders_services, lambda rng, n: api_v1_event(
+        'GET', '/tracking', {'order_id': f'ORD{rng.randrange(SEED_ORDERS):05d}'})),
+    'backup-tracking-put': ('backup-tracking', orders_services, lambda rng, n: api_v1_event(
+        'PUT', '/tracking', body={'order_id': f'ORD{rng.randrange(SEED_ORDERS):05d}',
+                                   'status': rng.choice(STATUSES), 'location': rng.choice(DISTRICTS)})),
+    'rutas-optimize': ('rutas', orders_services, lambda rng, n: api_v1_event(
+        'POST', '/routes', body={'driver_id': 'DRV001', 'order_ids': [
+            f'ORD{i:05d}' for i in rng.sample(range(SEED_ORDERS), 15)]})),
+    'notificaciones-sqs': ('notificaciones', orders_services, lambda rng, n: sqs_event([
+        {'type': rng.choice(['ORDER_CREATED', 'TRACKING_UPDATE']), 'order_id': f'ORD{n:05d}',
+         'customer_id': 'CUST001', 'total': 50.0, 'status': 'IN_TRANSIT', 'location': 'Surco'}
+        for _ in range(10)])),
+}
+
+
+# ============================================
+# Ejecución
+# ============================================
+
+def load_handler(name, module_key):
+    """Importa un módulo de handler nuevo (estado de contenedor limpio)"""
+    path = HANDLERS[module_key]
+    for directory in (COMMON_DIR, BACKEND_COMMON_DIR, os.path.dirname(path)):
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+
+    spec = importlib.util.spec_from_file_location(f'bench_{name.replace("-", "_")}', path)
+    module = importlib.util.module_from_spec(spec)
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_scenario(name, args):
+    module_key, services_factory, make_event = SCENARIOS[name]
+    latency = SimulatedLatency(args.latency_ms, args.jitter_ms)
+    services = services_factory(latency)
+
+    module = load_handler(name, module_key)
+    for attribute, service in services.items():
+        if hasattr(module, attribute):
+            setattr(module, attribute, service)
+
+    rng = random.Random(args.seed)
+    events = [make_event(rng, n) for n in range(args.warmup + args.requests + args.alloc_requests)]
+    devnull = open(os.devnull, 'w')
+    statuses = {}
+
+    def invoke(event):
+        result = module.handler(event, None)
+        code = result.get('statusCode') if isinstance(result, dict) else None
+        statuses[code] = statuses.get(code, 0) + 1
+
+    with contextlib.redirect_stdout(devnull):
+        for event in events[:args.warmup]:
+            invoke(event)
+        statuses.clear()
+        calls_before = latency.calls
+
+        latencies = []
+        started = time.perf_counter()
+        for event in events[args.warmup:args.warmup + args.requests]:
+            t0 = time.perf_counter()
+            invoke(event)
+            latencies.append((time.perf_counter() - t0) * 1000)
+        elapsed = time.perf_counter() - started
+        service_calls = latency.calls - calls_before
+        status_codes = dict(statuses)
+
+        # Pasada aparte con tracemalloc (agrega overhead a cada asignación)
+        allocated, retained = [], []
+        tracemalloc.start()
+        for event in events[args.warmup + args.requests:]:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            invoke(event)
+            current, peak = tracemalloc.get_traced_memory()
+            allocated.append(peak - before)
+            retained.append(current - before)
+        tracemalloc.stop()
+
+    return {
+        'requests': args.requests,
+        'rps': round(args.requests / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'service_calls_per_request': round(service_calls / args.requests, 2),
+        'alloc_kb': round(statistics.mean(allocated) / 1024, 1) if allocated else None,
+        'retained_b': round(statistics.mean(retained)) if retained else None,
+        'status_codes': {str(k): v for k, v in sorted(status_codes.items(), key=lambda kv: str(kv[0]))},
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compara contra un resultado anterior
+
+    Returns:
+        Lista de mensajes, uno por métrica que empeoró más que `tolerance`
+    """
+    regressions = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        if current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['rps'] < previous['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: rps {previous['rps']} -> {current['rps']}")
+        if previous.get('alloc_kb') and current.get('alloc_kb') and \
+                current['alloc_kb'] > previous['alloc_kb'] * (1 + tolerance):
+            regressions.append(f"{name}: alloc {previous['alloc_kb']}KB -> {current['alloc_kb']}KB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test local de los handlers Lambda')
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='Ejecutar solo estos escenarios (repetible)')
+    parser.add_argument('--requests', type=int, default=300, help='Requests medidos por escenario')
+    parser.add_argument('--warmup', type=int, default=30, help='Requests de calentamiento')
+    parser.add_argument('--alloc-requests', type=int, default=50,
+                        help='Requests de la pasada con tracemalloc (0 para omitirla)')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latencia simulada por llamada a AWS')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='Variación de la latencia simulada')
+    parser.add_argument('--seed', type=int, default=7, help='Semilla de los eventos sintéticos')
+    parser.add_argument('--output', help='Guardar resultados en JSON')
+    parser.add_argument('--baseline', help='JSON de una corrida anterior para detectar regresiones')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Empeoramiento relativo permitido frente al baseline')
+    args = parser.parse_args()
+
+    # Los handlers leen la configuración al importarse
+    for key, value in ENV.items():
+        os.environ.setdefault(key, value)
+    os.environ.setdefault('NOTIFICATION_MODE', 'sync')
+
+    results = {
+        'generated_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'latency_ms': args.latency_ms,
+        'jitter_ms': args.jitter_ms,
+        'scenarios': {},
+    }
+
+    print(f"{'escenario':24} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'calls':>6} {'alloc':>9}  status")
+    for name in args.scenario or SCENARIOS:
+        summary = run_scenario(name, args)
+        results['scenarios'][name] = summary
+        alloc = f"{summary['alloc_kb']:.1f}KB" if summary['alloc_kb'] is not None else '-'
+        print(f"{name:24} {summary['rps']:>9.1f} {summary['p50_ms']:>7.2f}ms {summary['p95_ms']:>7.2f}ms "
+              f"{summary['p99_ms']:>7.2f}ms {summary['service_calls_per_request']:>6} {alloc:>9}  "
+              f"{summary['status_codes']}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\nRegresiones (tolerancia {args.tolerance:.0%}):")
+            for message in regressions:
+                print(f"  - {message}")
+            sys.exit(1)
+        print(f"\nSin regresiones frente a {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
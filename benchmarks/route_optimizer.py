@@ -0,0 +1,272 @@
+"""
+Benchmark de calidad y tiempo del optimizador de rutas
+Sistema de Tracking DINEX Perú
+
+Resuelve instancias sintéticas con semilla fija (10 a 5000 paradas en el
+área de Lima) con optimizer.optimize_route(), el mismo camino que sigue
+POST /routes después de leer las órdenes, y por instancia reporta:
+- wall_ms: tiempo de optimize_route (mediana de --runs corridas)
+- peak_kb: pico de memoria de una corrida aparte con tracemalloc
+- length_km: largo de la ruta obtenida
+- nn_length_km: largo de la ruta de vecino más cercano (la construcción
+  inicial del solver, sin búsqueda local)
+- lower_bound_km: árbol de expansión mínima de las paradas; ningún camino
+  que las visite todas es más corto
+- gap_pct / vs_nn_pct: distancia de length_km a la cota y mejora frente a
+  vecino más cercano
+
+Layouts:
+- uniform: paradas uniformes en el rectángulo de Lima Metropolitana
+- clustered: paradas alrededor de centros de distrito (como los pedidos
+  reales, que se concentran en pocos distritos)
+
+Sin --time-budget-ms solo hay búsqueda local y los largos son
+deterministas: un cambio en solver.py que empeore length_km aparece aunque
+sea pequeño. La cache de rutas se desactiva para medir siempre el solver.
+
+Con --baseline compara contra un JSON anterior y termina con código 1 si
+alguna instancia empeoró más que --tolerance (tiempo, memoria) o
+--quality-tolerance (largo de la ruta).
+
+Uso:
+    python benchmarks/route_optimizer.py
+    python benchmarks/route_optimizer.py --sizes 10,100,1000 --layout clustered
+    python benchmarks/route_optimizer.py --time-budget-ms 2000
+    python benchmarks/route_optimizer.py --output benchmarks/results/route_optimizer.json
+    python benchmarks/route_optimizer.py --baseline benchmarks/results/route_optimizer.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from cold_start import BACKEND_DIR, ENV
+
+RUTAS_DIR = os.path.join(BACKEND_DIR, 'rutas')
+
+DEFAULT_SIZES = [10, 50, 100, 500, 1000, 2000, 5000]
+LAYOUTS = ['uniform', 'clustered']
+
+# Rectángulo de Lima Metropolitana (lat, lng)
+LIMA_BOUNDS = ((-12.28, -77.14), (-11.85, -76.80))
+
+# Distritos de los clusters y dispersión de cada cluster (grados, ~1.5 km)
+CLUSTER_DISTRICTS = ['miraflores', 'san isidro', 'surco', 'la molina', 'san juan de lurigancho',
+                     'los olivos', 'ate', 'callao', 'chorrillos', 'villa el salvador']
+CLUSTER_SPREAD_DEG = 0.014
+
+# Diferencias de tiempo menores no cuentan como regresión (ruido en
+# instancias chicas que se resuelven en ~1 ms)
+TIME_NOISE_MS = 5.0
+
+
+def load_rutas():
+    """Importa los módulos de rutas con la cache de rutas desactivada"""
+    for key, value in ENV.items():
+        os.environ.setdefault(key, value)
+    if RUTAS_DIR not in sys.path:
+        sys.path.insert(0, RUTAS_DIR)
+
+    import distance
+    import geocoding
+    import optimizer
+    import routecache
+    import solver
+
+    optimizer.route_cache = routecache.RouteCache(cache_size=0)
+    return distance, geocoding, optimizer, solver
+
+
+def make_instance(layout, size, seed, districts):
+    """
+    Paradas sintéticas reproducibles
+
+    Returns:
+        Lista de (lat, lng); la primera es el inicio de la ruta
+    """
+    rng = random.Random(f'{seed}:{layout}:{size}')
+    (lat_min, lng_min), (lat_max, lng_max) = LIMA_BOUNDS
+
+    if layout == 'uniform':
+        return [(rng.uniform(lat_min, lat_max), rng.uniform(lng_min, lng_max)) for _ in range(size)]
+
+    # Pesos desiguales entre clusters, como la demanda por distrito
+    centers = [districts[name] for name in CLUSTER_DISTRICTS]
+    weights = [rng.uniform(0.5, 3.0) for _ in centers]
+    coords = []
+    for lat, lng in rng.choices(centers, weights=weights, k=size):
+        coords.append((min(max(rng.gauss(lat, CLUSTER_SPREAD_DEG), lat_min), lat_max),
+                       min(max(rng.gauss(lng, CLUSTER_SPREAD_DEG), lng_min), lng_max)))
+    return coords
+
+
+def spanning_tree_length(distance, coords):
+    """
+    Largo en km del árbol de expansión mínima (Prim, O(n²) vectorizado)
+
+    Un camino que visita todas las paradas es un árbol de expansión, así que
+    nunca es más corto que este.
+    """
+    import numpy as np
+
+    if len(coords) < 2:
+        return 0.0
+    radians = np.radians(np.asarray(coords, dtype=float))
+    lat, lng = radians[:, 0], radians[:, 1]
+
+    best = distance.haversine(lat[0], lng[0], lat, lng)
+    in_tree = np.zeros(len(coords), dtype=bool)
+    in_tree[0] = True
+    best[0] = np.inf
+    total = 0.0
+    for _ in range(len(coords) - 1):
+        node = int(np.argmin(best))
+        total += float(best[node])
+        in_tree[node] = True
+        best = np.minimum(best, distance.haversine(lat[node], lng[node], lat, lng))
+        best[in_tree] = np.inf
+    return total
+
+
+def make_orders(coords):
+    return [{'order_id': f'ORD-{i}', 'latitude': lat, 'longitude': lng}
+            for i, (lat, lng) in enumerate(coords)]
+
+
+def run_instance(modules, coords, args):
+    distance, _, optimizer, solver = modules
+    budget = args.time_budget_ms / 1000 if args.time_budget_ms else None
+
+    def optimize():
+        deadline = time.monotonic() + budget if budget is not None else None
+        return optimizer.optimize_route(make_orders(coords), deadline=deadline)
+
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        route, length, stats = optimize()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    peak_kb = None
+    if args.memory:
+        # Pasada aparte con tracemalloc (agrega overhead a cada asignación)
+        tracemalloc.start()
+        optimize()
+        peak_kb = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+
+    engine = distance.DistanceEngine(coords)
+    nn_length = engine.route_length(solver.nearest_neighbor_tour(engine.planar_points(), 0))
+    bound = spanning_tree_length(distance, coords)
+
+    assert len(route) == len(coords), 'la ruta no visita todas las paradas'
+    return {
+        'stops': len(coords),
+        'wall_ms': round(statistics.median(timings), 2),
+        'wall_ms_min': round(min(timings), 2),
+        'peak_kb': peak_kb,
+        'length_km': round(length, 4),
+        'nn_length_km': round(nn_length, 4),
+        'lower_bound_km': round(bound, 4),
+        'gap_pct': round((length / bound - 1) * 100, 2) if bound else 0.0,
+        'vs_nn_pct': round((1 - length / nn_length) * 100, 2) if nn_length else 0.0,
+        'iterations': stats['iterations'],
+    }
+
+
+def compare(results, baseline, tolerance, quality_tolerance):
+    """
+    Compara contra un resultado anterior
+
+    Returns:
+        Lista de mensajes, uno por métrica que empeoró más que la tolerancia
+    """
+    regressions = []
+    for name, current in results['instances'].items():
+        previous = baseline.get('instances', {}).get(name)
+        if not previous:
+            continue
+        if current['length_km'] > previous['length_km'] * (1 + quality_tolerance):
+            regressions.append(f"{name}: largo {previous['length_km']}km -> {current['length_km']}km")
+        if current['wall_ms'] > previous['wall_ms'] * (1 + tolerance) + TIME_NOISE_MS:
+            regressions.append(f"{name}: tiempo {previous['wall_ms']}ms -> {current['wall_ms']}ms")
+        if previous.get('peak_kb') and current.get('peak_kb') and \
+                current['peak_kb'] > previous['peak_kb'] * (1 + tolerance):
+            regressions.append(f"{name}: memoria {previous['peak_kb']}KB -> {current['peak_kb']}KB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de calidad y tiempo del optimizador de rutas')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='Cantidades de paradas, separadas por coma')
+    parser.add_argument('--layout', action='append', choices=LAYOUTS,
+                        help='Ejecutar solo estos layouts (repetible)')
+    parser.add_argument('--runs', type=int, default=3, help='Corridas medidas por instancia')
+    parser.add_argument('--time-budget-ms', type=int, default=0,
+                        help='Presupuesto de búsqueda local iterada (0: solo búsqueda local)')
+    parser.add_argument('--no-memory', dest='memory', action='store_false',
+                        help='Omitir la pasada con tracemalloc')
+    parser.add_argument('--seed', type=int, default=7, help='Semilla de las instancias')
+    parser.add_argument('--output', help='Guardar resultados en JSON')
+    parser.add_argument('--baseline', help='JSON de una corrida anterior para detectar regresiones')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='Empeoramiento relativo permitido en tiempo y memoria')
+    parser.add_argument('--quality-tolerance', type=float, default=0.005,
+                        help='Empeoramiento relativo permitido en el largo de la ruta')
+    args = parser.parse_args()
+
+    modules = load_rutas()
+    districts = modules[1].LIMA_DISTRICTS
+    sizes = [int(size) for size in args.sizes.split(',')]
+
+    results = {
+        'generated_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'seed': args.seed,
+        'time_budget_ms': args.time_budget_ms,
+        'instances': {},
+    }
+
+    print(f"{'instancia':18} {'tiempo':>11} {'memoria':>11} {'largo':>11} {'NN':>11} "
+          f"{'cota':>11} {'gap':>7} {'vs NN':>7}")
+    for layout in args.layout or LAYOUTS:
+        for size in sizes:
+            name = f'{layout}-{size}'
+            summary = run_instance(modules, make_instance(layout, size, args.seed, districts), args)
+            results['instances'][name] = summary
+            peak = f"{summary['peak_kb'] / 1024:.1f}MB" if summary['peak_kb'] is not None else '-'
+            print(f"{name:18} {summary['wall_ms']:>9.1f}ms {peak:>11} {summary['length_km']:>9.1f}km "
+                  f"{summary['nn_length_km']:>9.1f}km {summary['lower_bound_km']:>9.1f}km "
+                  f"{summary['gap_pct']:>6.1f}% {summary['vs_nn_pct']:>6.1f}%")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('seed') != args.seed or baseline.get('time_budget_ms') != args.time_budget_ms:
+            print("\nEl baseline usa otra semilla o presupuesto; no se compara")
+            return
+        regressions = compare(results, baseline, args.tolerance, args.quality_tolerance)
+        if regressions:
+            print(f"\nRegresiones (tolerancia {args.tolerance:.0%}, largo {args.quality_tolerance:.1%}):")
+            for message in regressions:
+                print(f"  - {message}")
+            sys.exit(1)
+        print(f"\nSin regresiones frente a {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
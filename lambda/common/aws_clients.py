@@ -0,0 +1,50 @@
+"""
+Clientes AWS perezosos
+Sistema de Tracking DINEX Perú - Proyecto Individual
+
+Módulo compartido por las dos funciones Lambda (se empaqueta en ambos zip).
+
+Importar boto3 y crear recursos es la parte más cara del cold start. Con
+LazyClient el módulo de la Lambda declara sus clientes igual que antes
+(`table = ...` a nivel de módulo) pero boto3 recién se importa y el cliente
+recién se crea la primera vez que se usa. Los caminos que no tocan AWS
+(/health superficial, batches vacíos, errores de validación) no lo pagan, y
+una vez creado el cliente se reutiliza en todas las invocaciones del
+contenedor.
+"""
+
+
+class LazyClient:
+    """
+    Proxy que crea el objeto real (cliente, recurso o tabla de boto3) en el
+    primer acceso a cualquiera de sus atributos
+
+    Args:
+        factory: Función sin argumentos que crea el objeto real
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+
+    def __getattr__(self, name):
+        # Solo se llama para atributos que no existen en el proxy
+        if self._instance is None:
+            self._instance = self._factory()
+        return getattr(self._instance, name)
+
+
+def lazy_resource(service_name):
+    """boto3.resource(service_name), creado en el primer uso"""
+    def factory():
+        import boto3
+        return boto3.resource(service_name)
+    return LazyClient(factory)
+
+
+def lazy_client(service_name):
+    """boto3.client(service_name), creado en el primer uso"""
+    def factory():
+        import boto3
+        return boto3.client(service_name)
+    return LazyClient(factory)
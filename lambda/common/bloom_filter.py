@@ -0,0 +1,167 @@
+"""
+Bloom filter de tracking_ids conocidos
+Sistema de Tracking DINEX Perú - Proyecto Individual
+
+Módulo compartido por las dos funciones Lambda (se empaqueta en ambos zip)
+y por scripts/rebuild_bloom_filter.py:
+- el script construye el filtro offline con un Scan de la tabla y lo sube
+  a S3 (fuera de la tabla: no genera records en el stream ni consume WCU)
+- tracking: carga el filtro y, cuando garantiza que un tracking_id no
+  tenía eventos al construirse, omite el Query de respaldo para trackings
+  sin snapshot (el GetItem del snapshot se hace siempre)
+
+Un Bloom filter puede dar falsos positivos (dice "quizás existe" y se hace
+la consulta normal) pero nunca falsos negativos para IDs ya agregados.
+
+El filtro solo tiene que cubrir los trackings con eventos anteriores al
+snapshot, así que no se actualiza con cada evento: basta reconstruirlo
+cuando cambia la tabla de forma masiva (migraciones, restauraciones).
+"""
+
+import hashlib
+import math
+import struct
+
+# Objeto de S3 donde se guarda el filtro (dentro de BLOOM_FILTER_BUCKET)
+DEFAULT_OBJECT_KEY = 'bloom/tracking-ids.bin'
+
+# Prefijo reservado: ningún tracking real puede empezar así
+RESERVED_PREFIX = '__'
+
+# Cabecera de serialización: magic, número de hashes, número de bits, count
+_HEADER = struct.Struct('>4sBQQ')
+_MAGIC = b'BLM1'
+
+
+class BloomFilter:
+    """
+    Bloom filter con double hashing sobre BLAKE2b
+
+    Args:
+        num_bits: Tamaño del arreglo de bits (m)
+        num_hashes: Número de funciones hash (k)
+        bits: Contenido previo del arreglo (al deserializar)
+        count: Número de elementos agregados (al deserializar)
+    """
+
+    def __init__(self, num_bits, num_hashes, bits=None, count=0):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bytearray(bits) if bits is not None else bytearray((num_bits + 7) // 8)
+        self.count = count
+
+    @classmethod
+    def for_capacity(cls, capacity, false_positive_rate=0.01):
+        """
+        Crea un filtro dimensionado para `capacity` elementos
+
+        Usa las fórmulas estándar:
+            m = -n * ln(p) / ln(2)^2
+            k = m / n * ln(2)
+        """
+        capacity = max(1, capacity)
+        num_bits = int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2)))
+        num_hashes = max(1, int(round(num_bits / capacity * math.log(2))))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, key):
+        """
+        Agrega un elemento al filtro
+
+        Returns:
+            True si el elemento era nuevo (se encendió al menos un bit)
+        """
+        added = False
+        for position in self._positions(key):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self.bits[byte] & mask:
+                self.bits[byte] |= mask
+                added = True
+
+        if added:
+            self.count += 1
+        return added
+
+    def might_contain(self, key):
+        """False garantiza que el elemento nunca se agregó"""
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    __contains__ = might_contain
+
+    def estimated_false_positive_rate(self):
+        """Tasa de falsos positivos esperada: (1 - e^(-k*n/m))^k"""
+        if self.count == 0:
+            return 0.0
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+    def to_bytes(self):
+        return _HEADER.pack(_MAGIC, self.num_hashes, self.num_bits, self.count) + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, num_hashes, num_bits, count = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError('Formato de Bloom filter no reconocido')
+        return cls(num_bits, num_hashes, bits=data[_HEADER.size:], count=count)
+
+
+def is_reserved_id(tracking_id):
+    """True para los IDs reservados de la tabla (metadata, no son trackings)"""
+    return str(tracking_id).startswith(RESERVED_PREFIX)
+
+
+def load_filter(s3, bucket, key=DEFAULT_OBJECT_KEY, etag=None):
+    """
+    Lee el filtro guardado en S3
+
+    Args:
+        s3: Cliente de S3
+        bucket: Bucket del filtro
+        key: Key del objeto
+        etag: ETag de la copia que ya se tiene: si el objeto no cambió, S3
+            responde 304 sin transferir el filtro
+
+    Returns:
+        Tupla (BloomFilter, etag); (None, etag) si no cambió desde `etag`,
+        o (None, None) si todavía no se construyó
+    """
+    from botocore.exceptions import ClientError
+
+    kwargs = {'Bucket': bucket, 'Key': key}
+    if etag:
+        kwargs['IfNoneMatch'] = etag
+    try:
+        response = s3.get_object(**kwargs)
+    except ClientError as e:
+        code = e.response['Error']['Code']
+        if code in ('304', 'NotModified'):
+            return None, etag
+        if code in ('404', 'NoSuchKey'):
+            return None, None
+        raise
+
+    return BloomFilter.from_bytes(response['Body'].read()), response['ETag']
+
+
+def save_filter(s3, bucket, bloom, key=DEFAULT_OBJECT_KEY):
+    """
+    Sube el filtro a S3 (reemplaza el anterior en una sola escritura)
+
+    Returns:
+        ETag del objeto guardado
+    """
+    response = s3.put_object(
+        Bucket=bucket,
+        Key=key,
+        Body=bloom.to_bytes(),
+        ContentType='application/octet-stream',
+        Metadata={'count': str(bloom.count), 'num-bits': str(bloom.num_bits),
+                  'num-hashes': str(bloom.num_hashes)}
+    )
+    return response['ETag']
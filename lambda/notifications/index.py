@@ -10,25 +10,105 @@ Curso: Infraestructura como Código
 """
 
 import json
-import boto3
 import os
+import string
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
-# Cliente SNS para enviar notificaciones
-sns = boto3.client('sns')
+# Módulos compartidos (lambda/common), se empaquetan junto a index.py
+from aws_clients import LazyClient, lazy_client, lazy_resource
+from bloom_filter import is_reserved_id
+from dedupe import DedupeStore
+
+# Clientes AWS: se crean recién en su primer uso (un batch vacío o una
+# invocación sin records no importa boto3)
+sns = lazy_client('sns')
+dynamodb = lazy_resource('dynamodb')
 
 # Variables de entorno
 SNS_TOPIC = os.environ.get('SNS_TOPIC')
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'dev')
+TABLE_NAME = os.environ.get('TABLE_NAME')
+NOTIFICATION_DEDUPE_TABLE = os.environ.get('NOTIFICATION_DEDUPE_TABLE')
+
+# true cuando la Lambda de tracking corre con NOTIFICATION_MODE=deferred: las
+# notificaciones salen de aquí, fuera del camino crítico del POST. Si es
+# false, los records del stream se ignoran (tracking notifica en sync)
+NOTIFY_FROM_STREAM = os.environ.get('NOTIFY_FROM_STREAM', 'true').lower() == 'true'
+
+# PublishBatch acepta como máximo 10 mensajes por llamada
+SNS_BATCH_SIZE = 10
+
+# Llamadas PublishBatch simultáneas (un batch del stream trae hasta 100 records)
+SNS_PUBLISH_WORKERS = int(os.environ.get('SNS_PUBLISH_WORKERS', '4'))
+
+# Idioma de las notificaciones cuando el tracking no indica `language`
+DEFAULT_LANGUAGE = os.environ.get('NOTIFICATION_LANGUAGE', 'es')
+
+# Sort key reservado del snapshot del estado actual (ver Lambda de tracking)
+SNAPSHOT_TIMESTAMP = 0
+
+# Campos que le importan al cliente: si ninguno cambió no se notifica
+# (ej: pings de GPS que solo mueven latitude/longitude)
+NOTIFY_FIELDS = ('status', 'location', 'estimated_delivery')
+
+
+def _create_deserializer():
+    from boto3.dynamodb.types import TypeDeserializer
+    return TypeDeserializer()
+
+
+# Plantillas por idioma: asunto, cuerpo (email) y texto corto (SMS). Se
+# compilan una vez por contenedor
+NOTIFICATION_TEMPLATES = {
+    language: {part: string.Template(text) for part, text in parts.items()}
+    for language, parts in {
+        'es': {
+            'subject': 'DINEX - Tracking $tracking_id: $status',
+            'body': """
+Actualización de Tracking - DINEX
+
+Tracking ID: $tracking_id
+Estado: $status
+Ubicación: $location
+Fecha/Hora: $timestamp
+
+Este es un mensaje automático del Sistema de Tracking DINEX.
+""",
+            'sms': 'DINEX: $tracking_id - $status ($location)',
+        },
+        'en': {
+            'subject': 'DINEX - Tracking $tracking_id: $status',
+            'body': """
+Tracking Update - DINEX
+
+Tracking ID: $tracking_id
+Status: $status
+Location: $location
+Date/Time: $timestamp
+
+This is an automated message from the DINEX Tracking System.
+""",
+            'sms': 'DINEX: $tracking_id - $status ($location)',
+        },
+    }.items()
+}
+
+
+# Convierte el formato del stream ({'S': ...}, {'N': ...}) a tipos Python
+deserializer = LazyClient(_create_deserializer)
+
+table = LazyClient(lambda: dynamodb.Table(TABLE_NAME))
+
+# Notificaciones ya publicadas (los reintentos del stream no las repiten)
+sent_registry = DedupeStore(dynamodb=dynamodb, table_name=NOTIFICATION_DEDUPE_TABLE)
 
 
 def handler(event, context):
     """
     Handler principal para procesamiento de notificaciones
 
-    Esta función puede ser invocada de dos formas:
-    1. Manualmente via API (no implementado en este proyecto simple)
-    2. Automáticamente via DynamoDB Stream (futuro)
+    Se invoca automáticamente via DynamoDB Stream
 
     Args:
         event: Evento con información del cambio en DynamoDB
@@ -38,24 +118,34 @@ def handler(event, context):
         Response con resultado del procesamiento
     """
 
-    print(f"Evento de notificación recibido: {json.dumps(event)}")
+    # Solo el tamaño del batch: las imágenes completas de hasta 100 records
+    # inflarían los logs de CloudWatch
+    print(f"Evento de notificación recibido: {len(event.get('Records', []))} records")
 
     try:
-        # Por ahora, esta función es un placeholder
-        # En una implementación completa, procesaría DynamoDB Stream events
-
         # Contar records procesados
         records_count = len(event.get('Records', []))
 
         if records_count > 0:
-            # Procesar cada record
-            for record in event['Records']:
-                process_notification_record(record)
+            # Extraer la notificación de cada record (se descartan los que no
+            # cambian nada relevante) y quedarse con la más reciente de cada
+            # tracking_id
+            notifications = coalesce_notifications(
+                process_notification_record(record) for record in event['Records']
+            )
+            print(f"{records_count} records, {len(notifications)} notificaciones "
+                  f"con cambios relevantes")
+
+            sent = 0
+            if NOTIFY_FROM_STREAM:
+                sent = publish_notifications(notifications)
 
             return {
                 'statusCode': 200,
                 'body': json.dumps({
                     'message': f'{records_count} notificaciones procesadas',
+                    'notifications': len(notifications),
+                    'sent': sent,
                     'environment': ENVIRONMENT
                 })
             }
@@ -84,92 +174,241 @@ def process_notification_record(record):
     """
     Procesa un record individual de DynamoDB Stream
 
+    Las notificaciones salen del snapshot del estado actual (sort key
+    timestamp = 0): la Lambda de tracking lo actualiza en cada evento, así
+    que su MODIFY trae la imagen anterior y la nueva y se puede saber si algo
+    relevante cambió. Los eventos del historial solo se insertan y se ignoran.
+
     Args:
         record: Record de DynamoDB Stream con información del cambio
+
+    Returns:
+        Diccionario con tracking_id, location, status, estimated_delivery,
+        timestamp y los campos que cambiaron, o None si el record no genera
+        notificación
     """
 
     try:
         # Tipo de evento: INSERT, MODIFY, REMOVE
         event_name = record.get('eventName')
 
-        print(f"Procesando evento: {event_name}")
+        # Solo INSERT y MODIFY generan notificación
+        if event_name not in ['INSERT', 'MODIFY']:
+            return None
+
+        stream_data = record.get('dynamodb', {})
+        new_image = deserialize_image(stream_data.get('NewImage'))
+        old_image = deserialize_image(stream_data.get('OldImage'))
+
+        tracking_id = new_image.get('tracking_id')
+
+        # IDs reservados (metadata de la tabla) no son trackings
+        if not tracking_id or is_reserved_id(tracking_id):
+            return None
 
-        # En una implementación completa, aquí se procesaría el evento
-        # y se enviaría la notificación correspondiente
+        if new_image.get('timestamp') != SNAPSHOT_TIMESTAMP:
+            return None
 
-        # Ejemplo: Si es INSERT o MODIFY, enviar notificación
-        if event_name in ['INSERT', 'MODIFY']:
-            # Extraer nueva imagen (nuevo estado del item)
-            new_image = record.get('dynamodb', {}).get('NewImage', {})
+        # El cliente pidió no notificar este evento ("notify": false)
+        if new_image.get('notify') is False:
+            return None
 
-            # Convertir formato DynamoDB a dict normal
-            tracking_id = new_image.get('tracking_id', {}).get('S', 'UNKNOWN')
-            location = new_image.get('location', {}).get('S', 'Unknown')
-            status = new_image.get('status', {}).get('S', 'UNKNOWN')
+        # INSERT del snapshot: primer estado del paquete, siempre se notifica
+        changed = [field for field in NOTIFY_FIELDS
+                   if new_image.get(field) != old_image.get(field)]
+        if old_image and not changed:
+            return None
 
-            # Enviar notificación
-            send_tracking_notification(tracking_id, location, status)
+        return {
+            'tracking_id': tracking_id,
+            'location': new_image.get('location', 'Unknown'),
+            'status': new_image.get('status', 'UNKNOWN'),
+            'estimated_delivery': new_image.get('estimated_delivery'),
+            'timestamp': int(new_image.get('last_update', 0)),
+            'language': new_image.get('language', DEFAULT_LANGUAGE),
+            'changed': changed,
+            # Identifica el record en el stream (igual en cada reintento)
+            'dedupe_key': stream_data.get('SequenceNumber') or record.get('eventID')
+        }
 
     except Exception as e:
         print(f"Error procesando record: {str(e)}")
         # En producción, podríamos enviar a DLQ (Dead Letter Queue)
+        return None
+
+
+def deserialize_image(image):
+    """
+    Convierte una imagen del stream a un dict de Python
+
+    Args:
+        image: NewImage u OldImage en formato DynamoDB, o None
+
+    Returns:
+        Diccionario con tipos Python (str, Decimal, bool, list, dict...)
+    """
+    return {key: deserializer.deserialize(value) for key, value in (image or {}).items()}
 
 
-def send_tracking_notification(tracking_id, location, status):
+def coalesce_notifications(notifications):
     """
-    Envía notificación SNS sobre actualización de tracking
+    Agrupa las notificaciones por tracking_id y conserva la más reciente
+
+    Durante el escaneo masivo un mismo batch del stream trae varios updates
+    del mismo paquete; el cliente solo necesita el último estado.
+
+    Args:
+        notifications: Iterable de resultados de process_notification_record
+            (en el orden del stream; los None se ignoran)
+
+    Returns:
+        Lista con una notificación por tracking_id
+    """
+    latest = {}
+    for notification in notifications:
+        if notification is None:
+            continue
+
+        current = latest.get(notification['tracking_id'])
+        # A igual timestamp gana el que llegó después en el stream
+        if current is None or notification['timestamp'] >= current['timestamp']:
+            latest[notification['tracking_id']] = notification
+
+    return list(latest.values())
+
+
+def build_notification_message(tracking_id, location, status, language=DEFAULT_LANGUAGE):
+    """
+    Construye el asunto y el mensaje de una notificación de tracking
 
     Args:
         tracking_id: ID del tracking
         location: Ubicación actual
         status: Estado actual
+        language: 'es' o 'en' (otro idioma usa DEFAULT_LANGUAGE)
+
+    Returns:
+        Tupla (subject, message); message es el JSON por protocolo de SNS
+        (MessageStructure='json'): email recibe el cuerpo completo y sms el
+        texto corto
     """
+    templates = NOTIFICATION_TEMPLATES.get(language) or NOTIFICATION_TEMPLATES[DEFAULT_LANGUAGE]
+    values = {
+        'tracking_id': tracking_id,
+        'status': status,
+        'location': location,
+        'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+    }
+    body = templates['body'].safe_substitute(values)
 
-    try:
-        # Construir mensaje de notificación
-        message = f"""
-Actualización de Tracking - DINEX
+    message = json.dumps({
+        'default': body,
+        'email': body,
+        'sms': templates['sms'].safe_substitute(values)
+    })
+    return templates['subject'].safe_substitute(values), message
 
-Tracking ID: {tracking_id}
-Estado: {status}
-Ubicación: {location}
-Fecha/Hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
-Este es un mensaje automático del Sistema de Tracking DINEX.
-        """
+def publish_notifications(notifications):
+    """
+    Publica las notificaciones en SNS con PublishBatch (hasta 10 por llamada,
+    hasta SNS_PUBLISH_WORKERS llamadas a la vez)
 
-        subject = f"DINEX - Tracking {tracking_id}: {status}"
+    Las que ya se publicaron en un intento anterior del mismo batch se
+    saltan (ver dedupe.py) y las publicadas quedan registradas.
 
-        # Publicar a SNS Topic
-        if SNS_TOPIC:
-            response = sns.publish(
-                TopicArn=SNS_TOPIC,
-                Subject=subject,
-                Message=message
-            )
+    Args:
+        notifications: Lista de notificaciones (ver process_notification_record)
 
-            print(f"Notificación enviada: MessageId={response.get('MessageId')}")
-        else:
-            print("SNS_TOPIC no configurado, saltando envío de notificación")
+    Returns:
+        Número de mensajes publicados correctamente
+    """
+    if not notifications:
+        return 0
+
+    if not SNS_TOPIC:
+        print("SNS_TOPIC no configurado, saltando envío de notificaciones")
+        return 0
+
+    already_sent = sent_registry.already_sent(n.get('dedupe_key') for n in notifications)
+    if already_sent:
+        print(f"{len(already_sent)} notificaciones ya enviadas en un intento anterior")
+        notifications = [n for n in notifications if n.get('dedupe_key') not in already_sent]
+        if not notifications:
+            return 0
+
+    chunks = [notifications[start:start + SNS_BATCH_SIZE]
+              for start in range(0, len(notifications), SNS_BATCH_SIZE)]
+    if len(chunks) == 1:
+        published = publish_chunk(chunks[0])
+    else:
+        with ThreadPoolExecutor(max_workers=min(SNS_PUBLISH_WORKERS, len(chunks))) as executor:
+            published = [n for result in executor.map(publish_chunk, chunks) for n in result]
+
+    sent_registry.mark_sent(n.get('dedupe_key') for n in published)
+
+    print(f"Notificaciones enviadas: {len(published)}/{len(notifications)} "
+          f"en {len(chunks)} llamadas PublishBatch")
+    return len(published)
+
+
+def publish_chunk(chunk):
+    """
+    Una llamada PublishBatch con hasta SNS_BATCH_SIZE notificaciones
+
+    Returns:
+        Lista de las notificaciones publicadas correctamente
+    """
+    entries = []
+    for index, notification in enumerate(chunk):
+        subject, message = build_notification_message(
+            notification['tracking_id'], notification['location'], notification['status'],
+            notification.get('language', DEFAULT_LANGUAGE)
+        )
+        entries.append({'Id': str(index), 'Subject': subject, 'Message': message,
+                        'MessageStructure': 'json'})
+
+    try:
+        response = sns.publish_batch(TopicArn=SNS_TOPIC, PublishBatchRequestEntries=entries)
+
+        for failure in response.get('Failed', []):
+            tracking_id = chunk[int(failure['Id'])]['tracking_id']
+            print(f"Error enviando notificación de {tracking_id}: "
+                  f"{failure.get('Code')} {failure.get('Message', '')}")
+
+        return [chunk[int(success['Id'])] for success in response.get('Successful', [])]
 
     except Exception as e:
-        print(f"Error enviando notificación SNS: {str(e)}")
         # No fallar la función si la notificación falla
+        print(f"Error enviando notificaciones SNS: {str(e)}")
+        return []
 
 
 # Testing local
 if __name__ == '__main__':
-    # Evento de prueba simulando DynamoDB Stream
+    # Evento de prueba simulando DynamoDB Stream (MODIFY del snapshot)
     test_event = {
         'Records': [
             {
-                'eventName': 'INSERT',
+                'eventName': 'MODIFY',
                 'dynamodb': {
+                    'Keys': {
+                        'tracking_id': {'S': 'TRK001'},
+                        'timestamp': {'N': '0'}
+                    },
+                    'OldImage': {
+                        'tracking_id': {'S': 'TRK001'},
+                        'location': {'S': 'Lima - Almacén'},
+                        'status': {'S': 'PROCESSING'},
+                        'timestamp': {'N': '0'},
+                        'last_update': {'N': '1699990000'}
+                    },
                     'NewImage': {
                         'tracking_id': {'S': 'TRK001'},
                         'location': {'S': 'Lima - Centro de Distribución'},
                         'status': {'S': 'IN_TRANSIT'},
-                        'timestamp': {'N': '1699999999'}
+                        'timestamp': {'N': '0'},
+                        'last_update': {'N': '1699999999'}
                     }
                 }
             }
@@ -0,0 +1,242 @@
+"""
+Tests unitarios para la función Lambda de Notificaciones
+Usan los servicios en memoria de benchmarks/fakes.py en lugar de AWS
+"""
+
+import json
+import pytest
+import sys
+import os
+
+# Configurar path para importar el módulo, los compartidos (lambda/common)
+# y los fakes de benchmarks/
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(1, os.path.join(ROOT, 'lambda', 'common'))
+sys.path.insert(2, os.path.join(ROOT, 'benchmarks'))
+
+# Mock de variables de entorno
+os.environ['TABLE_NAME'] = 'test-tracking'
+os.environ['ENVIRONMENT'] = 'test'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+# Importar después de configurar env vars
+import index
+from dedupe import DedupeStore
+from fakes import InMemoryDynamoDB, InMemorySNS
+from boto3.dynamodb.types import TypeSerializer
+
+serializer = TypeSerializer()
+
+
+@pytest.fixture(autouse=True)
+def fake_aws(monkeypatch):
+    """Topic y registro de envíos en memoria en cada test"""
+    db = InMemoryDynamoDB()
+    db.create_table('test-dedupe', 'dedupe_key')
+    sns = InMemorySNS()
+    sns.calls = []
+    publish_batch = sns.publish_batch
+
+    def record_batch(TopicArn, PublishBatchRequestEntries):
+        sns.calls.append(len(PublishBatchRequestEntries))
+        return publish_batch(TopicArn=TopicArn, PublishBatchRequestEntries=PublishBatchRequestEntries)
+
+    sns.publish_batch = record_batch
+
+    monkeypatch.setattr(index, 'sns', sns)
+    monkeypatch.setattr(index, 'SNS_TOPIC', 'arn:aws:sns:us-east-1:000000000000:test')
+    monkeypatch.setattr(index, 'NOTIFY_FROM_STREAM', True)
+    monkeypatch.setattr(index, 'sent_registry', DedupeStore(dynamodb=db, table_name='test-dedupe'))
+    return db, sns
+
+
+def stream_record(sequence, new_image, old_image=None, event_name=None):
+    """Record del DynamoDB Stream con las imágenes dadas (NEW_AND_OLD_IMAGES)"""
+    data = {
+        'SequenceNumber': str(sequence),
+        'NewImage': {k: serializer.serialize(v) for k, v in new_image.items()}
+    }
+    if old_image:
+        data['OldImage'] = {k: serializer.serialize(v) for k, v in old_image.items()}
+    return {
+        'eventID': f'event-{sequence}',
+        'eventName': event_name or ('MODIFY' if old_image else 'INSERT'),
+        'dynamodb': data
+    }
+
+
+def snapshot_image(tracking_id, status, location='Lima', last_update=1700000000, **fields):
+    """Imagen del snapshot del estado actual (sort key 0)"""
+    return dict({'tracking_id': tracking_id, 'timestamp': 0, 'status': status,
+                 'location': location, 'last_update': last_update}, **fields)
+
+
+def invoke(records):
+    response = index.handler({'Records': records}, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+class TestStreamNotifications:
+    """Tests para las notificaciones que salen del DynamoDB Stream"""
+
+    def test_status_change_is_published(self, fake_aws):
+        """Test: Un MODIFY del snapshot con otro status publica una notificación"""
+
+        _, sns = fake_aws
+        old = snapshot_image('TRK-1', 'IN_TRANSIT')
+        new = snapshot_image('TRK-1', 'OUT_FOR_DELIVERY', last_update=1700000100)
+
+        status, body = invoke([stream_record(1, new, old)])
+
+        assert status == 200
+        assert body['sent'] == 1
+        assert sns.calls == [1]
+        assert sns.published[0]['Subject'] == 'DINEX - Tracking TRK-1: OUT_FOR_DELIVERY'
+        assert json.loads(sns.published[0]['Message'])['sms'] == 'DINEX: TRK-1 - OUT_FOR_DELIVERY (Lima)'
+
+    def test_records_without_relevant_changes_are_skipped(self, fake_aws):
+        """Test: Eventos del historial, pings de solo coordenadas y notify=false no notifican"""
+
+        _, sns = fake_aws
+        old = snapshot_image('TRK-1', 'IN_TRANSIT', latitude=1)
+        records = [
+            # Evento del historial (solo INSERT, sort key distinto de 0)
+            stream_record(1, dict(snapshot_image('TRK-2', 'IN_TRANSIT'), timestamp=1700000000)),
+            # Solo cambian las coordenadas
+            stream_record(2, snapshot_image('TRK-1', 'IN_TRANSIT', latitude=2), old),
+            # El cliente pidió no notificar
+            stream_record(3, snapshot_image('TRK-3', 'DELIVERED', notify=False),
+                          snapshot_image('TRK-3', 'IN_TRANSIT')),
+            stream_record(4, snapshot_image('TRK-4', 'DELIVERED'), event_name='REMOVE'),
+            stream_record(5, snapshot_image('__meta', 'IN_TRANSIT'))
+        ]
+
+        status, body = invoke(records)
+
+        assert status == 200
+        assert body['notifications'] == 0
+        assert sns.published == []
+
+    def test_updates_of_same_tracking_are_coalesced(self, fake_aws):
+        """Test: Varios updates del mismo paquete en un batch generan solo el último"""
+
+        _, sns = fake_aws
+        records = [
+            stream_record(1, snapshot_image('TRK-1', 'IN_TRANSIT', last_update=100)),
+            stream_record(2, snapshot_image('TRK-1', 'OUT_FOR_DELIVERY', last_update=200),
+                          snapshot_image('TRK-1', 'IN_TRANSIT', last_update=100)),
+            stream_record(3, snapshot_image('TRK-1', 'DELIVERED', last_update=300),
+                          snapshot_image('TRK-1', 'OUT_FOR_DELIVERY', last_update=200))
+        ]
+
+        status, body = invoke(records)
+
+        assert body['notifications'] == 1
+        assert [m['Subject'] for m in sns.published] == ['DINEX - Tracking TRK-1: DELIVERED']
+
+    def test_publish_batch_chunks_of_ten(self, fake_aws):
+        """Test: Las notificaciones se publican con PublishBatch de hasta 10 mensajes"""
+
+        _, sns = fake_aws
+        records = [stream_record(n, snapshot_image(f'TRK-{n}', 'IN_TRANSIT')) for n in range(23)]
+
+        status, body = invoke(records)
+
+        assert body['sent'] == 23
+        assert sorted(sns.calls) == [3, 10, 10]
+
+    def test_stream_disabled_does_not_publish(self, fake_aws, monkeypatch):
+        """Test: Con NOTIFY_FROM_STREAM=false (tracking en modo sync) no se publica nada"""
+
+        _, sns = fake_aws
+        monkeypatch.setattr(index, 'NOTIFY_FROM_STREAM', False)
+
+        status, body = invoke([stream_record(1, snapshot_image('TRK-1', 'IN_TRANSIT'))])
+
+        assert body['notifications'] == 1
+        assert body['sent'] == 0
+        assert sns.published == []
+
+
+class TestNotificationDedupe:
+    """Tests para los reintentos del stream (registro de envíos)"""
+
+    def test_retry_does_not_publish_again(self, fake_aws):
+        """Test: Un reintento del mismo batch no vuelve a publicar lo que ya salió"""
+
+        _, sns = fake_aws
+        records = [stream_record(n, snapshot_image(f'TRK-{n}', 'IN_TRANSIT')) for n in range(3)]
+        invoke(records)
+
+        status, body = invoke(records)
+
+        assert body['sent'] == 0
+        assert len(sns.published) == 3
+
+    def test_retry_in_another_container_reads_the_table(self, fake_aws, monkeypatch):
+        """Test: Sin la memoria del contenedor anterior, el registro sale de la tabla"""
+
+        db, sns = fake_aws
+        records = [stream_record(1, snapshot_image('TRK-1', 'IN_TRANSIT'))]
+        invoke(records)
+
+        monkeypatch.setattr(index, 'sent_registry', DedupeStore(dynamodb=db, table_name='test-dedupe'))
+        status, body = invoke(records)
+
+        assert body['sent'] == 0
+        assert len(sns.published) == 1
+
+    def test_failed_entries_are_retried(self, fake_aws):
+        """Test: Las entradas que PublishBatch rechazó no se registran y salen en el reintento"""
+
+        _, sns = fake_aws
+        publish_batch = sns.publish_batch
+
+        def partial_failure(TopicArn, PublishBatchRequestEntries):
+            response = publish_batch(TopicArn=TopicArn, PublishBatchRequestEntries=PublishBatchRequestEntries[:1])
+            response['Failed'] = [{'Id': e['Id'], 'Code': 'Throttled'} for e in PublishBatchRequestEntries[1:]]
+            return response
+
+        sns.publish_batch = partial_failure
+        records = [stream_record(n, snapshot_image(f'TRK-{n}', 'IN_TRANSIT')) for n in range(2)]
+        assert invoke(records)[1]['sent'] == 1
+
+        sns.publish_batch = publish_batch
+        status, body = invoke(records)
+
+        assert body['sent'] == 1
+        assert [m['Subject'] for m in sns.published] == ['DINEX - Tracking TRK-0: IN_TRANSIT',
+                                                         'DINEX - Tracking TRK-1: IN_TRANSIT']
+
+
+class TestNotificationLanguage:
+    """Tests para las plantillas por idioma"""
+
+    def test_snapshot_language_selects_template(self, fake_aws):
+        """Test: El language del snapshot elige la plantilla; sin él se usa la por defecto"""
+
+        _, sns = fake_aws
+        records = [
+            stream_record(1, snapshot_image('TRK-1', 'DELIVERED', language='en')),
+            stream_record(2, snapshot_image('TRK-2', 'DELIVERED'))
+        ]
+
+        invoke(records)
+
+        bodies = {m['Subject']: json.loads(m['Message'])['email'] for m in sns.published}
+        assert 'Status: DELIVERED' in bodies['DINEX - Tracking TRK-1: DELIVERED']
+        assert 'Estado: DELIVERED' in bodies['DINEX - Tracking TRK-2: DELIVERED']
+
+    def test_unknown_language_uses_default(self):
+        """Test: Un idioma sin plantilla usa la del idioma por defecto"""
+
+        subject, message = index.build_notification_message('TRK-1', 'Lima', 'IN_TRANSIT', 'fr')
+
+        assert 'Estado: IN_TRANSIT' in json.loads(message)['email']
+
+
+# Para ejecutar tests:
+# pytest tests/test_index.py -v
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
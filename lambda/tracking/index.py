@@ -12,24 +12,114 @@ Curso: Infraestructura como Código
 """
 
 import json
-import boto3
+import base64
+import math
 import os
+import time
+import random
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import uuid
 from decimal import Decimal
 
-# Inicialización de clientes AWS
-# Se ejecuta una vez cuando Lambda se inicia (warm start)
-dynamodb = boto3.resource('dynamodb')
-sns = boto3.client('sns')
+# Módulos compartidos (lambda/common), se empaquetan junto a index.py
+from aws_clients import LazyClient, lazy_client, lazy_resource
+from bloom_filter import DEFAULT_OBJECT_KEY, load_filter, is_reserved_id
+
+# Clientes AWS: boto3 se importa y cada cliente se crea recién en su primer
+# uso, y se reutiliza en las invocaciones siguientes (warm start)
+dynamodb = lazy_resource('dynamodb')
+sns = lazy_client('sns')
+s3 = lazy_client('s3')
 
 # Obtener variables de entorno configuradas en Terraform
 TABLE_NAME = os.environ.get('TABLE_NAME')
 ENVIRONMENT = os.environ.get('ENVIRONMENT', 'dev')
 SNS_TOPIC = os.environ.get('SNS_TOPIC')
 
+# Modo de notificación:
+# - sync: se publica en SNS antes de responder el POST
+# - deferred: el POST solo persiste el evento y la Lambda de notificaciones
+#   publica de forma asíncrona al consumir el DynamoDB Stream
+NOTIFICATION_MODE = os.environ.get('NOTIFICATION_MODE', 'sync').lower()
+
+# Idiomas de las plantillas de la Lambda de notificaciones: el campo opcional
+# "language" se guarda en el snapshot y se conserva en los eventos siguientes
+NOTIFICATION_LANGUAGES = ('es', 'en')
+
 # Referencia a la tabla DynamoDB
-table = dynamodb.Table(TABLE_NAME)
+table = LazyClient(lambda: dynamodb.Table(TABLE_NAME))
+
+# Configuración del modo bulk (POST /tracking con un array de eventos)
+# BatchWriteItem acepta como máximo 25 items por llamada
+BATCH_WRITE_SIZE = 25
+MAX_BULK_EVENTS = int(os.environ.get('MAX_BULK_EVENTS', '500'))
+BATCH_WRITE_MAX_RETRIES = int(os.environ.get('BATCH_WRITE_MAX_RETRIES', '5'))
+BATCH_WRITE_BACKOFF_BASE = 0.05  # segundos
+BATCH_WRITE_BACKOFF_CAP = 2.0    # segundos
+
+# Margen para el reloj de los escáneres: un "timestamp" más adelantado (o en
+# milisegundos) ganaría la condición del snapshot a todos los eventos reales
+MAX_CLOCK_SKEW_SECONDS = int(os.environ.get('MAX_CLOCK_SKEW_SECONDS', '300'))
+
+# Los snapshots se escriben con UpdateItem condicional (BatchWriteItem no
+# acepta condiciones ni updates): en bulk, hasta SNAPSHOT_WRITE_WORKERS a la vez
+SNAPSHOT_WRITE_WORKERS = int(os.environ.get('SNAPSHOT_WRITE_WORKERS', '8'))
+
+# Snapshot del estado actual: cada tracking_id tiene un item con el sort key
+# reservado timestamp = 0 que se actualiza en cada evento. Consultar el
+# estado actual es un GetItem (o un BatchGetItem para varios IDs)
+SNAPSHOT_TIMESTAMP = 0
+MAX_TRACKING_IDS = 100
+SNAPSHOT_FALLBACK_QUERY = os.environ.get('SNAPSHOT_FALLBACK_QUERY', 'true').lower() == 'true'
+
+# Campos que build_tracking_item() completa si el request no los trae: en
+# el snapshot no reemplazan el valor que ya estaba
+DEFAULTED_FIELDS = ('package_id', 'notes')
+
+# Historial paginado (GET /tracking?tracking_id=X&history=true)
+HISTORY_DEFAULT_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 100
+
+# Atributos que devuelve el historial (el resto del item no se lee)
+HISTORY_ATTRIBUTES = ['timestamp', 'status', 'location', 'latitude', 'longitude', 'notes']
+
+# Cache en memoria del estado actual (vive mientras el contenedor esté warm)
+# CACHE_TTL_SECONDS = 0 desactiva el cache
+CACHE_TTL_SECONDS = float(os.environ.get('CACHE_TTL_SECONDS', '5'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '1000'))
+
+# Bloom filter de tracking_ids con eventos, en S3 (lo construye
+# scripts/rebuild_bloom_filter.py). Se revisa cada BLOOM_REFRESH_SECONDS con
+# un GET condicional por ETag. No tiene los trackings creados después de
+# construirse: un negativo no evita leer el snapshot, solo la consulta de
+# respaldo (get_latest_event) para trackings anteriores al snapshot
+BLOOM_FILTER_ENABLED = os.environ.get('BLOOM_FILTER_ENABLED', 'true').lower() == 'true'
+BLOOM_FILTER_BUCKET = os.environ.get('BLOOM_FILTER_BUCKET')
+BLOOM_FILTER_OBJECT = os.environ.get('BLOOM_FILTER_OBJECT', DEFAULT_OBJECT_KEY)
+BLOOM_REFRESH_SECONDS = float(os.environ.get('BLOOM_REFRESH_SECONDS', '60'))
+
+# Coalescing de pings GPS (POST /tracking de la app del conductor cada pocos
+# segundos, solo con posición). Un ping con el mismo status que la última
+# posición guardada, a menos de GPS_DEADBAND_METERS de ella y dentro de
+# GPS_DEADBAND_SECONDS, no se guarda en el historial:
+# - off: todos los pings se guardan como cualquier evento
+# - drop: el ping se descarta
+# - merge: solo se actualiza la posición del snapshot (GET /tracking ve la
+#   más reciente), sin evento en el historial
+# La última posición guardada vive en la memoria del contenedor: con varios
+# contenedores warm se guarda a lo sumo un punto por contenedor y ventana
+GPS_COALESCE_MODE = os.environ.get('GPS_COALESCE_MODE', 'off').lower()
+GPS_DEADBAND_METERS = float(os.environ.get('GPS_DEADBAND_METERS', '50'))
+GPS_DEADBAND_SECONDS = float(os.environ.get('GPS_DEADBAND_SECONDS', '60'))
+
+# Campos de un ping de posición pura; con cualquier otro (notes,
+# estimated_delivery...) el POST se guarda como evento completo
+POSITION_PING_FIELDS = {'tracking_id', 'package_id', 'location', 'latitude', 'longitude',
+                        'status', 'notify'}
+
+EARTH_RADIUS_METERS = 6371000.0
 
 
 class DecimalEncoder(json.JSONEncoder):
@@ -43,6 +133,109 @@ class DecimalEncoder(json.JSONEncoder):
         return super(DecimalEncoder, self).default(obj)
 
 
+class TTLCache:
+    """
+    Cache LRU con tamaño máximo y TTL por entrada
+
+    Se instancia a nivel de módulo, así que sobrevive entre invocaciones del
+    mismo contenedor. Cada contenedor tiene su propio cache: un update
+    procesado por otro contenedor se ve cuando expira el TTL.
+    """
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()  # key -> (expira_en, valor)
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Retorna el valor cacheado, o None si no existe o expiró"""
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+
+        # Marcar como usado recientemente
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+
+        self.entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self.entries.move_to_end(key)
+
+        # Desalojar la entrada menos usada recientemente
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        self.entries.pop(key, None)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.entries)}
+
+
+# Cache del estado actual por tracking_id
+tracking_cache = TTLCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+
+# Última posición guardada por tracking_id (vence a los GPS_DEADBAND_SECONDS)
+gps_anchors = TTLCache(CACHE_MAX_ENTRIES, GPS_DEADBAND_SECONDS if GPS_COALESCE_MODE != 'off' else 0)
+
+# Copia del Bloom filter cargada por este contenedor
+_known_ids = {'bloom': None, 'etag': None, 'loaded_at': None}
+
+
+def get_known_ids_filter():
+    """
+    Retorna el Bloom filter de tracking_ids conocidos, cargándolo la primera
+    vez que se necesita y recargándolo cada BLOOM_REFRESH_SECONDS
+
+    Returns:
+        BloomFilter, o None si está desactivado, no se construyó todavía o
+        no se pudo leer (en ese caso se hace siempre el Query de respaldo)
+    """
+    if not BLOOM_FILTER_ENABLED or not BLOOM_FILTER_BUCKET:
+        return None
+
+    now = time.monotonic()
+    loaded_at = _known_ids['loaded_at']
+    if loaded_at is None or now - loaded_at >= BLOOM_REFRESH_SECONDS:
+        try:
+            bloom, etag = load_filter(s3, BLOOM_FILTER_BUCKET, BLOOM_FILTER_OBJECT, _known_ids['etag'])
+            if bloom:
+                print(f"Bloom filter {etag} cargado: {bloom.count} tracking_ids, "
+                      f"FPR estimada {bloom.estimated_false_positive_rate():.4%}")
+            elif etag:
+                # Sin cambios desde la última carga (304)
+                bloom = _known_ids['bloom']
+        except Exception as e:
+            print(f"Error cargando Bloom filter: {str(e)}")
+            bloom, etag = None, None
+
+        _known_ids.update(bloom=bloom, etag=etag, loaded_at=now)
+
+    return _known_ids['bloom']
+
+
+def may_have_legacy_events(tracking_id):
+    """
+    False cuando el Bloom filter garantiza que el tracking no tenía eventos
+    al construirse el filtro
+
+    Los eventos sin snapshot son anteriores al snapshot, y por lo tanto al
+    filtro; un tracking creado después (aunque la copia del contenedor no lo
+    tenga todavía) siempre tiene snapshot. Con un negativo basta el GetItem
+    del snapshot y se omite el Query de respaldo.
+    """
+    bloom = get_known_ids_filter()
+    return bloom is None or bloom.might_contain(tracking_id)
+
+
 def handler(event, context):
     """
     Handler principal de la función Lambda
@@ -67,7 +260,8 @@ def handler(event, context):
         # Router: Dirigir a la función apropiada según el método HTTP y path
         if path.endswith('/health'):
             # Health check del sistema
-            return health_check()
+            query_params = event.get('queryStringParameters') or {}
+            return health_check(shallow=query_params.get('shallow') == 'true')
 
         elif http_method == 'GET':
             # Consultar tracking
@@ -99,14 +293,29 @@ def handler(event, context):
         )
 
 
-def health_check():
+def health_check(shallow=False):
     """
     Health check del sistema
     Verifica que Lambda y DynamoDB estén funcionando
 
+    Args:
+        shallow: Solo verificar que la Lambda responde (GET /health?shallow=true),
+            sin llamar a DynamoDB ni crear el cliente
+
     Returns:
         Response con estado del sistema
     """
+    if shallow:
+        return create_response(
+            status_code=200,
+            body={
+                'status': 'healthy',
+                'service': 'dinex-tracking',
+                'environment': ENVIRONMENT,
+                'timestamp': int(datetime.now().timestamp())
+            }
+        )
+
     try:
         # Intentar leer información de la tabla (sin hacer query real)
         table_info = table.table_status
@@ -134,10 +343,14 @@ def health_check():
 
 def get_tracking(event):
     """
-    Obtiene el estado actual de un paquete
+    Obtiene el estado actual de uno o varios paquetes
 
     Query Parameters esperados:
         tracking_id: ID del tracking a consultar
+        tracking_ids: Lista separada por comas (máximo MAX_TRACKING_IDS),
+            alternativa a tracking_id para consultar varios paquetes a la vez
+        history: "true" para obtener el historial paginado de tracking_id
+            (ver get_tracking_history)
 
     Returns:
         Response con información del tracking o error si no existe
@@ -148,6 +361,10 @@ def get_tracking(event):
     query_params = event.get('queryStringParameters') or {}
     tracking_id = query_params.get('tracking_id')
 
+    # Consulta de varios paquetes en un solo request
+    if query_params.get('tracking_ids'):
+        return get_tracking_batch(query_params['tracking_ids'])
+
     # Validación: tracking_id es requerido
     if not tracking_id:
         return create_response(
@@ -158,19 +375,26 @@ def get_tracking(event):
             }
         )
 
+    if str(query_params.get('history', '')).lower() == 'true':
+        return get_tracking_history(tracking_id, query_params)
+
     try:
-        # Consultar DynamoDB por tracking_id
-        # Query es más eficiente que Scan porque usa el partition key
-        response = table.query(
-            KeyConditionExpression='tracking_id = :tid',
-            ExpressionAttributeValues={':tid': tracking_id},
-            ScanIndexForward=False,  # Orden descendente (más reciente primero)
-            Limit=1  # Solo necesitamos el registro más reciente
-        )
+        # Cache del contenedor primero; si no está, leer el snapshot del
+        # estado actual (un GetItem por key completa)
+        item = tracking_cache.get(tracking_id)
+        cache_status = 'HIT' if item else 'MISS'
+        if not item and is_reserved_id(tracking_id):
+            # IDs reservados (metadata de la tabla), no son trackings
+            cache_status = 'RESERVED'
+        elif not item:
+            item = get_current_state(tracking_id)
+            if item:
+                tracking_cache.put(tracking_id, item)
+
+        print(f"Cache {cache_status} {tracking_id}: {json.dumps(tracking_cache.stats())}")
 
         # Verificar si se encontró el tracking
-        items = response.get('Items', [])
-        if not items:
+        if not item:
             return create_response(
                 status_code=404,
                 body={
@@ -179,28 +403,9 @@ def get_tracking(event):
                 }
             )
 
-        # Obtener el primer item (más reciente)
-        item = items[0]
-
-        # Formatear respuesta con información relevante
-        tracking_info = {
-            'tracking_id': item['tracking_id'],
-            'package_id': item.get('package_id', 'N/A'),
-            'status': item.get('status', 'UNKNOWN'),
-            'location': item.get('location', 'Ubicación desconocida'),
-            'latitude': item.get('latitude'),
-            'longitude': item.get('longitude'),
-            'last_update': item.get('timestamp'),
-            'last_update_human': datetime.fromtimestamp(
-                int(item.get('timestamp', 0))
-            ).strftime('%Y-%m-%d %H:%M:%S') if item.get('timestamp') else 'N/A',
-            'notes': item.get('notes', ''),
-            'estimated_delivery': item.get('estimated_delivery', 'No especificado')
-        }
-
         return create_response(
             status_code=200,
-            body=tracking_info,
+            body=format_tracking_info(item),
             use_decimal_encoder=True
         )
 
@@ -216,6 +421,344 @@ def get_tracking(event):
         )
 
 
+def get_tracking_batch(tracking_ids_param):
+    """
+    Obtiene el estado actual de varios paquetes con un solo BatchGetItem
+
+    Args:
+        tracking_ids_param: Valor de ?tracking_ids=A,B,C
+
+    Returns:
+        Response con los trackings encontrados (en el orden pedido) y la
+        lista de IDs que no existen
+    """
+
+    # Eliminar vacíos y duplicados conservando el orden
+    tracking_ids = list(dict.fromkeys(
+        tid.strip() for tid in tracking_ids_param.split(',') if tid.strip()
+    ))
+
+    if not tracking_ids:
+        return create_response(
+            status_code=400,
+            body={
+                'error': 'Parámetro tracking_ids es requerido',
+                'example': '/tracking?tracking_ids=TRK001,TRK002'
+            }
+        )
+
+    if len(tracking_ids) > MAX_TRACKING_IDS:
+        return create_response(
+            status_code=400,
+            body={
+                'error': f'Máximo {MAX_TRACKING_IDS} tracking_ids por request',
+                'received': len(tracking_ids)
+            }
+        )
+
+    try:
+        items = {}
+        for tid in tracking_ids:
+            cached = tracking_cache.get(tid)
+            if cached:
+                items[tid] = cached
+
+        # Solo los IDs que no están en cache van a DynamoDB
+        hits = len(items)
+        missing = [tid for tid in tracking_ids if tid not in items and not is_reserved_id(tid)]
+        if missing:
+            fetched = batch_get_current_state(missing)
+            for tid, item in fetched.items():
+                tracking_cache.put(tid, item)
+            items.update(fetched)
+
+        print(f"Cache batch: {hits} hits, {len(missing)} misses: "
+              f"{json.dumps(tracking_cache.stats())}")
+
+        return create_response(
+            status_code=200,
+            body={
+                'trackings': [format_tracking_info(items[tid])
+                              for tid in tracking_ids if tid in items],
+                'not_found': [tid for tid in tracking_ids if tid not in items],
+                'count': len(items)
+            },
+            use_decimal_encoder=True
+        )
+
+    except Exception as e:
+        print(f"Error consultando DynamoDB: {str(e)}")
+        return create_response(
+            status_code=500,
+            body={
+                'error': 'Error consultando los trackings',
+                'detail': str(e) if ENVIRONMENT == 'dev' else 'Database error'
+            }
+        )
+
+
+def get_tracking_history(tracking_id, query_params):
+    """
+    Obtiene una página del historial de eventos de un tracking
+
+    Cada página es un Query acotado por Limit y con ProjectionExpression,
+    así que el tamaño de la respuesta y las unidades de lectura no dependen
+    de la antigüedad del envío.
+
+    Query Parameters:
+        limit: Eventos por página (por defecto 50, máximo 100)
+        from / to: Rango de Unix timestamps (inclusive)
+        cursor: Valor de next_cursor de la página anterior
+        order: "desc" (por defecto, más reciente primero) o "asc"
+
+    Returns:
+        Response con los eventos y next_cursor (None en la última página)
+    """
+    if is_reserved_id(tracking_id):
+        return create_response(
+            status_code=404,
+            body={'error': 'Tracking no encontrado', 'tracking_id': tracking_id}
+        )
+
+    try:
+        limit = int(query_params.get('limit') or HISTORY_DEFAULT_PAGE_SIZE)
+        # El sort key 0 es el snapshot del estado actual, no un evento
+        time_from = int(query_params.get('from') or SNAPSHOT_TIMESTAMP + 1)
+        time_to = int(query_params.get('to') or 2 ** 63 - 1)
+    except ValueError:
+        return create_response(
+            status_code=400,
+            body={'error': 'limit, from y to deben ser números enteros'}
+        )
+
+    if not 1 <= limit <= HISTORY_MAX_PAGE_SIZE:
+        return create_response(
+            status_code=400,
+            body={'error': f'limit debe estar entre 1 y {HISTORY_MAX_PAGE_SIZE}'}
+        )
+
+    time_from = max(time_from, SNAPSHOT_TIMESTAMP + 1)
+    if time_from > time_to:
+        return create_response(
+            status_code=400,
+            body={'error': 'from debe ser menor o igual que to'}
+        )
+
+    # Los nombres van en ExpressionAttributeNames: timestamp, status y
+    # location son palabras reservadas de DynamoDB
+    attribute_names = {f'#{name}': name for name in HISTORY_ATTRIBUTES + ['tracking_id']}
+
+    query_kwargs = {
+        'KeyConditionExpression': '#tracking_id = :tid AND #timestamp BETWEEN :from AND :to',
+        'ExpressionAttributeNames': attribute_names,
+        'ExpressionAttributeValues': {':tid': tracking_id, ':from': time_from, ':to': time_to},
+        'ProjectionExpression': ', '.join(f'#{name}' for name in HISTORY_ATTRIBUTES),
+        'ScanIndexForward': query_params.get('order') == 'asc',
+        'Limit': limit
+    }
+
+    if query_params.get('cursor'):
+        try:
+            query_kwargs['ExclusiveStartKey'] = decode_cursor(query_params['cursor'], tracking_id)
+        except ValueError:
+            return create_response(
+                status_code=400,
+                body={'error': 'cursor inválido'}
+            )
+
+    try:
+        response = table.query(**query_kwargs)
+    except Exception as e:
+        print(f"Error consultando historial: {str(e)}")
+        return create_response(
+            status_code=500,
+            body={
+                'error': 'Error consultando el historial',
+                'detail': str(e) if ENVIRONMENT == 'dev' else 'Database error'
+            }
+        )
+
+    events = response.get('Items', [])
+    last_key = response.get('LastEvaluatedKey')
+
+    return create_response(
+        status_code=200,
+        body={
+            'tracking_id': tracking_id,
+            'events': events,
+            'count': len(events),
+            'next_cursor': encode_cursor(last_key) if last_key else None
+        },
+        use_decimal_encoder=True
+    )
+
+
+def encode_cursor(last_evaluated_key):
+    """
+    Codifica LastEvaluatedKey como un cursor opaco (base64 url-safe)
+
+    Args:
+        last_evaluated_key: {'tracking_id': ..., 'timestamp': Decimal}
+
+    Returns:
+        String para devolver al cliente como next_cursor
+    """
+    payload = json.dumps({
+        'tid': last_evaluated_key['tracking_id'],
+        'ts': int(last_evaluated_key['timestamp'])
+    }, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, tracking_id):
+    """
+    Decodifica un cursor generado por encode_cursor()
+
+    Args:
+        cursor: Valor recibido en ?cursor=
+        tracking_id: Tracking consultado; el cursor debe pertenecer a él
+
+    Returns:
+        ExclusiveStartKey para el Query
+
+    Raises:
+        ValueError: Si el cursor está malformado o es de otro tracking
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        key = {'tracking_id': payload['tid'], 'timestamp': int(payload['ts'])}
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f'Cursor malformado: {e}')
+
+    if key['tracking_id'] != tracking_id:
+        raise ValueError('El cursor pertenece a otro tracking_id')
+
+    return key
+
+
+def get_current_state(tracking_id):
+    """
+    Lee el snapshot del estado actual de un tracking
+
+    Args:
+        tracking_id: ID del tracking
+
+    Returns:
+        Item de DynamoDB, o None si el tracking no existe
+    """
+    response = table.get_item(
+        Key={'tracking_id': tracking_id, 'timestamp': SNAPSHOT_TIMESTAMP}
+    )
+    item = response.get('Item')
+
+    if not item and SNAPSHOT_FALLBACK_QUERY and may_have_legacy_events(tracking_id):
+        item = get_latest_event(tracking_id)
+
+    return item
+
+
+def batch_get_current_state(tracking_ids):
+    """
+    Lee los snapshots de varios trackings con BatchGetItem
+
+    Las keys que DynamoDB devuelve en UnprocessedKeys se reintentan con
+    backoff, igual que en batch_write_items().
+
+    Args:
+        tracking_ids: Lista de IDs únicos (máximo 100, límite de BatchGetItem)
+
+    Returns:
+        Diccionario tracking_id -> item con los trackings encontrados
+    """
+    found = {}
+    request = {TABLE_NAME: {
+        'Keys': [{'tracking_id': tid, 'timestamp': SNAPSHOT_TIMESTAMP} for tid in tracking_ids]
+    }}
+    attempt = 0
+
+    while request:
+        response = dynamodb.batch_get_item(RequestItems=request)
+
+        for item in response.get('Responses', {}).get(TABLE_NAME, []):
+            found[item['tracking_id']] = item
+
+        request = response.get('UnprocessedKeys') or {}
+        if not request:
+            break
+
+        attempt += 1
+        if attempt > BATCH_WRITE_MAX_RETRIES:
+            raise RuntimeError('BatchGetItem con keys sin procesar tras agotar los reintentos')
+
+        delay = min(BATCH_WRITE_BACKOFF_CAP, BATCH_WRITE_BACKOFF_BASE * (2 ** attempt))
+        time.sleep(random.uniform(0, delay))
+
+    if SNAPSHOT_FALLBACK_QUERY:
+        for tid in tracking_ids:
+            if tid not in found and may_have_legacy_events(tid):
+                item = get_latest_event(tid)
+                if item:
+                    found[tid] = item
+
+    return found
+
+
+def get_latest_event(tracking_id):
+    """
+    Consulta el evento más reciente de un tracking (camino anterior al snapshot)
+
+    Solo se usa para trackings escritos antes de que existiera el snapshot;
+    se puede desactivar con SNAPSHOT_FALLBACK_QUERY=false una vez que esos
+    registros expiren por TTL.
+
+    Args:
+        tracking_id: ID del tracking
+
+    Returns:
+        Item más reciente, o None si no hay eventos
+    """
+    # Query es más eficiente que Scan porque usa el partition key
+    response = table.query(
+        KeyConditionExpression='tracking_id = :tid',
+        ExpressionAttributeValues={':tid': tracking_id},
+        ScanIndexForward=False,  # Orden descendente (más reciente primero)
+        Limit=1  # Solo necesitamos el registro más reciente
+    )
+    items = response.get('Items', [])
+    return items[0] if items else None
+
+
+def format_tracking_info(item):
+    """
+    Formatea un item (snapshot o evento) con la información relevante
+
+    Args:
+        item: Item de DynamoDB
+
+    Returns:
+        Diccionario para el body de la respuesta
+    """
+    # En el snapshot, "timestamp" es el sort key reservado y la hora real
+    # del último evento está en "last_update"
+    last_update = item.get('last_update', item.get('timestamp'))
+
+    return {
+        'tracking_id': item['tracking_id'],
+        'package_id': item.get('package_id', 'N/A'),
+        'status': item.get('status', 'UNKNOWN'),
+        'location': item.get('location', 'Ubicación desconocida'),
+        'latitude': item.get('latitude'),
+        'longitude': item.get('longitude'),
+        'last_update': last_update,
+        'last_update_human': datetime.fromtimestamp(
+            int(last_update)
+        ).strftime('%Y-%m-%d %H:%M:%S') if last_update else 'N/A',
+        'notes': item.get('notes', ''),
+        'estimated_delivery': item.get('estimated_delivery', 'No especificado')
+    }
+
+
 def update_tracking(event):
     """
     Actualiza la ubicación y estado de un paquete
@@ -229,9 +772,16 @@ def update_tracking(event):
             "longitude": -77.0428,  (opcional)
             "status": "IN_TRANSIT",  (opcional)
             "notes": "Paquete en ruta",  (opcional)
-            "estimated_delivery": "2024-12-25"  (opcional)
+            "estimated_delivery": "2024-12-25",  (opcional)
+            "language": "en"  (opcional, idioma de las notificaciones)
         }
 
+    También acepta un array de eventos (o {"events": [...]}) para ingesta
+    masiva desde los escáneres del hub, ver update_tracking_bulk()
+
+    Con GPS_COALESCE_MODE activo, los pings de solo posición pasan por
+    update_position()
+
     Returns:
         Response confirmando la actualización o error si falla
     """
@@ -244,68 +794,51 @@ def update_tracking(event):
         if isinstance(body, str):
             body = json.loads(body)
 
-        # Validar campos requeridos
-        tracking_id = body.get('tracking_id')
-        location = body.get('location')
+        # Modo bulk: array de eventos
+        if isinstance(body, list):
+            return update_tracking_bulk(body)
+        if isinstance(body, dict) and isinstance(body.get('events'), list):
+            return update_tracking_bulk(body['events'], notify=body.get('notify', False))
 
-        if not tracking_id:
+        # Validar campos requeridos
+        error = validate_tracking_event(body)
+        if error:
             return create_response(
                 status_code=400,
-                body={'error': 'tracking_id es requerido'}
+                body={'error': error}
             )
 
-        if not location:
-            return create_response(
-                status_code=400,
-                body={'error': 'location es requerido'}
-            )
+        tracking_id = body['tracking_id']
+        location = body['location']
 
         # Generar timestamp actual
         timestamp = int(datetime.now().timestamp())
 
-        # Generar package_id si no viene en el request
-        package_id = body.get('package_id', f"PKG-{uuid.uuid4().hex[:8].upper()}")
+        position = position_ping(body) if GPS_COALESCE_MODE != 'off' else None
+        if position:
+            return update_position(body, position, timestamp)
 
         # Construir el item para DynamoDB
-        item = {
-            # Keys (partition + sort)
-            'tracking_id': tracking_id,
-            'timestamp': timestamp,
-
-            # Atributos
-            'package_id': package_id,
-            'location': location,
-            'status': body.get('status', 'IN_TRANSIT'),
-
-            # Coordenadas GPS (opcional)
-            'latitude': Decimal(str(body['latitude'])) if body.get('latitude') else None,
-            'longitude': Decimal(str(body['longitude'])) if body.get('longitude') else None,
-
-            # Información adicional
-            'notes': body.get('notes', ''),
-            'estimated_delivery': body.get('estimated_delivery'),
+        notify = body.get('notify', True)
+        item = build_tracking_item(body, timestamp, notify)
+        package_id = item['package_id']
 
-            # TTL: Eliminar automáticamente después de 30 días
-            'expiry': timestamp + (30 * 24 * 60 * 60),
-
-            # Metadata
-            'environment': ENVIRONMENT,
-            'updated_by': 'system'
-        }
-
-        # Remover campos None (DynamoDB no acepta null)
-        item = {k: v for k, v in item.items() if v is not None}
-
-        # Guardar en DynamoDB
+        # Primero el evento: el snapshot solo refleja eventos guardados
         table.put_item(Item=item)
+        write_snapshot(item, defaulted_fields(body))
+        tracking_cache.invalidate(tracking_id)
+        if 'latitude' in item and 'longitude' in item:
+            gps_anchors.put(tracking_id, {'position': (float(item['latitude']), float(item['longitude'])),
+                                          'status': item['status']})
 
         # Log de éxito
         print(f"Tracking actualizado exitosamente: {tracking_id}")
 
-        # Enviar notificación (opcional, si SNS está configurado)
-        if SNS_TOPIC and body.get('notify', True):
+        # Enviar notificación (opcional, si SNS está configurado). En modo
+        # deferred la envía la Lambda de notificaciones desde el stream
+        if NOTIFICATION_MODE == 'sync' and SNS_TOPIC and notify:
             try:
-                send_notification(tracking_id, location, body.get('status', 'IN_TRANSIT'))
+                send_notification(tracking_id, location, item['status'])
             except Exception as e:
                 # Si falla la notificación, no afecta la actualización
                 print(f"Error enviando notificación: {str(e)}")
@@ -342,6 +875,471 @@ def update_tracking(event):
         )
 
 
+def position_ping(body):
+    """
+    Coordenadas de un ping de solo posición
+
+    Returns:
+        (latitude, longitude), o None si el body trae otros campos o no
+        trae coordenadas válidas
+    """
+    if not set(body) <= POSITION_PING_FIELDS:
+        return None
+    try:
+        return float(body['latitude']), float(body['longitude'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def distance_meters(a, b):
+    """Distancia haversine entre dos (latitude, longitude)"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * math.asin(math.sqrt(h))
+
+
+def update_position(body, position, timestamp):
+    """
+    Guarda un ping GPS aplicando el dead-band de GPS_COALESCE_MODE
+
+    Los pings fuera del dead-band (o con otro status) se guardan como
+    evento compacto, sin los metadatos de build_tracking_item(); los de
+    dentro se descartan o solo actualizan el snapshot. En ambos casos el
+    snapshot recibe solo los campos del ping (ver write_snapshot): notes,
+    estimated_delivery y el package_id del último evento completo se
+    conservan.
+
+    Un ping sin status tiene el de la última posición guardada: no cambia el
+    del snapshot, y la respuesta informa el que quedó guardado ahí.
+
+    La última posición guardada (gps_anchors) vive en la memoria del
+    contenedor, sin lecturas extra: un ping que cae en otro contenedor no
+    se coalesce con ella, así que con N contenedores warm se guardan hasta N
+    puntos por ventana en vez de uno.
+
+    Args:
+        body: Evento ya validado, de solo posición (ver position_ping)
+        position: (latitude, longitude) del ping
+        timestamp: Unix timestamp del ping
+
+    Returns:
+        201 si el ping se guardó en el historial, 200 si se coalesció
+    """
+    tracking_id = body['tracking_id']
+    anchor = gps_anchors.get(tracking_id)
+    status = body.get('status') or (anchor['status'] if anchor else 'IN_TRANSIT')
+    item = build_position_item(body, position, timestamp, status)
+    defaulted = () if body.get('status') else ('status',)
+
+    coalesced = anchor is not None and anchor['status'] == status and \
+        distance_meters(anchor['position'], position) < GPS_DEADBAND_METERS
+
+    # Campos del snapshot después de escribirlo (ver write_snapshot)
+    state = {}
+    if coalesced:
+        if GPS_COALESCE_MODE == 'merge':
+            # Sin notificación: ni el status ni la posición cambiaron de verdad
+            write_snapshot(dict(item, notify=False), defaulted, state)
+            tracking_cache.invalidate(tracking_id)
+
+        return create_response(
+            status_code=200,
+            body={
+                'message': 'Posición dentro del dead-band, no se guardó en el historial',
+                'tracking_id': tracking_id,
+                'timestamp': timestamp,
+                'status': state.get('status', status),
+                'coalesced': 'merged' if GPS_COALESCE_MODE == 'merge' else 'dropped'
+            }
+        )
+
+    table.put_item(Item=item)
+    write_snapshot(item, defaulted, state)
+    tracking_cache.invalidate(tracking_id)
+    status = state.get('status', status)
+    gps_anchors.put(tracking_id, {'position': position, 'status': status})
+
+    if NOTIFICATION_MODE == 'sync' and SNS_TOPIC and body.get('notify', True):
+        try:
+            send_notification(tracking_id, item['location'], status)
+        except Exception as e:
+            print(f"Error enviando notificación: {str(e)}")
+
+    return create_response(
+        status_code=201,
+        body={
+            'message': 'Tracking actualizado exitosamente',
+            'tracking_id': tracking_id,
+            'package_id': item.get('package_id'),
+            'timestamp': timestamp,
+            'location': item['location'],
+            'status': status
+        }
+    )
+
+
+def build_position_item(body, position, timestamp, status):
+    """
+    Item compacto de un ping de posición: solo keys, posición, status y TTL
+
+    A diferencia de build_tracking_item() no genera package_id ni guarda
+    notes, environment ni updated_by, que en un ping cada pocos segundos
+    ocupaban más que la posición.
+    """
+    item = {
+        'tracking_id': body['tracking_id'],
+        'timestamp': timestamp,
+        'package_id': body.get('package_id'),
+        'location': body['location'],
+        'status': status,
+        'latitude': Decimal(str(position[0])),
+        'longitude': Decimal(str(position[1])),
+        'expiry': timestamp + (30 * 24 * 60 * 60),
+        'notify': None if body.get('notify', True) else False
+    }
+    return {k: v for k, v in item.items() if v is not None}
+
+
+def validate_tracking_event(body):
+    """
+    Valida los campos requeridos de un evento de tracking
+
+    Args:
+        body: Diccionario con el evento recibido
+
+    Returns:
+        Mensaje de error, o None si el evento es válido
+    """
+    if not isinstance(body, dict):
+        return 'Cada evento debe ser un objeto JSON'
+
+    if not body.get('tracking_id'):
+        return 'tracking_id es requerido'
+
+    if is_reserved_id(body['tracking_id']):
+        return 'tracking_id no puede empezar con "__" (reservado)'
+
+    if not body.get('location'):
+        return 'location es requerido'
+
+    if body.get('language') is not None and body['language'] not in NOTIFICATION_LANGUAGES:
+        return f"language debe ser uno de: {', '.join(NOTIFICATION_LANGUAGES)}"
+
+    return None
+
+
+def build_tracking_item(body, timestamp, notify=True):
+    """
+    Construye el item de DynamoDB para un evento de tracking
+
+    Args:
+        body: Evento ya validado con validate_tracking_event()
+        timestamp: Unix timestamp del evento (sort key)
+        notify: Si el evento debe notificarse. Solo se guarda cuando es
+            False, para que el consumidor del stream (modo deferred) lo omita
+
+    Returns:
+        Diccionario listo para put_item / BatchWriteItem
+    """
+
+    # Generar package_id si no viene en el request
+    package_id = body.get('package_id', f"PKG-{uuid.uuid4().hex[:8].upper()}")
+
+    item = {
+        # Keys (partition + sort)
+        'tracking_id': body['tracking_id'],
+        'timestamp': timestamp,
+
+        # Atributos
+        'package_id': package_id,
+        'location': body['location'],
+        'status': body.get('status', 'IN_TRANSIT'),
+
+        # Coordenadas GPS (opcional)
+        'latitude': Decimal(str(body['latitude'])) if body.get('latitude') else None,
+        'longitude': Decimal(str(body['longitude'])) if body.get('longitude') else None,
+
+        # Información adicional
+        'notes': body.get('notes', ''),
+        'estimated_delivery': body.get('estimated_delivery'),
+        'language': body.get('language'),
+
+        # TTL: Eliminar automáticamente después de 30 días
+        'expiry': timestamp + (30 * 24 * 60 * 60),
+
+        # Metadata
+        'environment': ENVIRONMENT,
+        'updated_by': 'system',
+        'notify': None if notify else False
+    }
+
+    # Remover campos None (DynamoDB no acepta null)
+    return {k: v for k, v in item.items() if v is not None}
+
+
+def defaulted_fields(body):
+    """Campos que build_tracking_item() completó con un valor por defecto"""
+    return tuple(field for field in DEFAULTED_FIELDS if field not in body)
+
+
+def write_snapshot(item, defaulted=(), state=None):
+    """
+    Actualiza el snapshot con los campos de un evento, si es al menos tan
+    reciente como el estado guardado: un escaneo en buffer que llega tarde
+    queda en el historial pero no pisa un estado más nuevo
+
+    Solo se escriben los campos que trae el evento: los opcionales que no
+    trae (estimated_delivery, coordenadas...) conservan el valor anterior,
+    en vez de desaparecer del estado actual (y contar como un cambio para
+    las notificaciones)
+
+    Args:
+        item: Evento ya guardado (ver build_tracking_item y
+            build_position_item)
+        defaulted: Campos del evento que no venían en el request (ver
+            defaulted_fields): solo se escriben si el snapshot no los tiene
+        state: Diccionario opcional que recibe los campos escritos tal como
+            quedaron en el snapshot (ej: el status que conservó un ping)
+
+    Returns:
+        'written', 'stale' (había un estado más reciente) o 'failed'
+    """
+    from botocore.exceptions import ClientError
+
+    fields = {k: v for k, v in item.items() if k not in ('tracking_id', 'timestamp')}
+    fields['last_update'] = item['timestamp']
+    names = {f'#f{n}': field for n, field in enumerate(fields)}
+    values = {f':v{n}': value for n, value in enumerate(fields.values())}
+    assignments = [
+        f'#f{n} = if_not_exists(#f{n}, :v{n})' if field in defaulted else f'#f{n} = :v{n}'
+        for n, field in enumerate(fields)
+    ]
+    update = 'SET ' + ', '.join(assignments)
+
+    # "notify" solo se guarda cuando es False: no debe quedar del evento anterior
+    if 'notify' not in fields:
+        names['#notify'] = 'notify'
+        update += ' REMOVE #notify'
+
+    names['#last_update'] = 'last_update'
+    values[':ts'] = item['timestamp']
+
+    try:
+        response = table.update_item(
+            Key={'tracking_id': item['tracking_id'], 'timestamp': SNAPSHOT_TIMESTAMP},
+            UpdateExpression=update,
+            ConditionExpression='attribute_not_exists(#last_update) OR #last_update <= :ts',
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
+            ReturnValues='UPDATED_NEW' if state is not None else 'NONE'
+        )
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            print(f"Snapshot de {item['tracking_id']} más reciente que el evento {item['timestamp']}")
+            return 'stale'
+        print(f"Advertencia: snapshot de {item['tracking_id']} no actualizado: {str(e)}")
+        return 'failed'
+    except Exception as e:
+        print(f"Advertencia: snapshot de {item['tracking_id']} no actualizado: {str(e)}")
+        return 'failed'
+    if state is not None:
+        state.update(response.get('Attributes', {}))
+    return 'written'
+
+
+def update_tracking_bulk(events, notify=False):
+    """
+    Ingesta masiva de eventos de tracking (escáneres del hub)
+
+    Cada evento tiene el mismo formato que el body de POST /tracking y
+    puede traer su propio "timestamp" (Unix, en segundos) con la hora real
+    del escaneo; uno posterior a ahora + MAX_CLOCK_SKEW_SECONDS se rechaza.
+    Los eventos válidos se escriben con BatchWriteItem en lotes de 25.
+
+    Args:
+        events: Lista de eventos
+        notify: Valor por defecto de "notify" para los eventos que no lo
+            traen (por defecto no, para no pagar un publish por paquete)
+
+    Returns:
+        Response con el estado de cada evento, en el mismo orden recibido
+    """
+
+    if not events:
+        return create_response(
+            status_code=400,
+            body={'error': 'El array de eventos está vacío'}
+        )
+
+    if len(events) > MAX_BULK_EVENTS:
+        return create_response(
+            status_code=400,
+            body={
+                'error': f'Máximo {MAX_BULK_EVENTS} eventos por request',
+                'received': len(events)
+            }
+        )
+
+    now = int(datetime.now().timestamp())
+    results = [None] * len(events)
+
+    # BatchWriteItem rechaza el lote completo si dos items tienen la misma key,
+    # así que para (tracking_id, timestamp) repetidos gana el último evento
+    index_by_key = {}
+    items = {}
+
+    for index, body in enumerate(events):
+        error = validate_tracking_event(body)
+        if not error:
+            try:
+                timestamp = int(body.get('timestamp') or now)
+            except (TypeError, ValueError):
+                timestamp = None
+            if not timestamp or timestamp <= SNAPSHOT_TIMESTAMP:
+                error = 'timestamp debe ser un Unix timestamp entero positivo'
+            elif timestamp > now + MAX_CLOCK_SKEW_SECONDS:
+                error = 'timestamp en el futuro (debe ser un Unix timestamp en segundos)'
+
+        if error:
+            results[index] = {'index': index, 'status': 'rejected', 'error': error}
+            continue
+
+        key = (body['tracking_id'], timestamp)
+        if key in index_by_key:
+            previous = index_by_key[key]
+            results[previous] = {
+                'index': previous,
+                'tracking_id': key[0],
+                'status': 'superseded',
+                'superseded_by': index
+            }
+            del items[previous]
+
+        index_by_key[key] = index
+        items[index] = build_tracking_item(body, timestamp, body.get('notify', notify))
+
+    failed = batch_write_items(list(items.values()))
+    failed_keys = {(item['tracking_id'], item['timestamp']) for item in failed}
+
+    # Un snapshot por tracking_id, con el evento guardado más reciente del
+    # request (write_snapshot no pisa un estado guardado más nuevo)
+    latest = {}
+    for index, item in items.items():
+        if (item['tracking_id'], item['timestamp']) in failed_keys:
+            continue
+        current = latest.get(item['tracking_id'])
+        if current is None or item['timestamp'] >= items[current]['timestamp']:
+            latest[item['tracking_id']] = index
+
+    def write_latest(index):
+        return write_snapshot(items[index], defaulted_fields(events[index]))
+
+    snapshot_results = {}
+    if latest:
+        with ThreadPoolExecutor(max_workers=min(SNAPSHOT_WRITE_WORKERS, len(latest))) as executor:
+            snapshot_results = dict(zip(latest, executor.map(write_latest, latest.values())))
+    for tracking_id in latest:
+        tracking_cache.invalidate(tracking_id)
+
+    written_items = []
+    for index, item in items.items():
+        key = (item['tracking_id'], item['timestamp'])
+        status = 'failed' if key in failed_keys else 'written'
+        results[index] = {
+            'index': index,
+            'tracking_id': item['tracking_id'],
+            'package_id': item['package_id'],
+            'timestamp': item['timestamp'],
+            'status': status
+        }
+        if status == 'written':
+            written_items.append(item)
+
+    failed_events = len(items) - len(written_items)
+    failed_snapshots = sum(1 for result in snapshot_results.values() if result == 'failed')
+    print(f"Bulk tracking: {len(written_items)} escritos, {failed_events} fallidos, "
+          f"{len(events) - len(items)} rechazados/reemplazados")
+    if failed_snapshots:
+        print(f"Advertencia: {failed_snapshots} snapshots no actualizados")
+
+    if NOTIFICATION_MODE == 'sync' and SNS_TOPIC:
+        # Solo el último evento de cada tracking_id, si pasó a ser el estado actual
+        for item in (items[index] for index in latest.values()):
+            if not item.get('notify', True):
+                continue
+            if snapshot_results.get(item['tracking_id']) != 'written':
+                continue
+            try:
+                send_notification(item['tracking_id'], item['location'], item['status'])
+            except Exception as e:
+                print(f"Error enviando notificación: {str(e)}")
+
+    summary = {
+        'received': len(events),
+        'written': len(written_items),
+        'failed': failed_events,
+        'rejected': sum(1 for r in results if r['status'] == 'rejected'),
+        'superseded': sum(1 for r in results if r['status'] == 'superseded')
+    }
+
+    # 201 si todo se escribió, 207 (Multi-Status) si hubo eventos con problemas
+    all_written = summary['written'] == len(events)
+
+    return create_response(
+        status_code=201 if all_written else 207,
+        body={
+            'message': 'Eventos de tracking procesados',
+            'summary': summary,
+            'results': results
+        }
+    )
+
+
+def batch_write_items(items):
+    """
+    Escribe items con BatchWriteItem en lotes de BATCH_WRITE_SIZE
+
+    DynamoDB puede devolver parte del lote en UnprocessedItems (throttling);
+    esos items se reintentan con backoff exponencial y jitter completo.
+
+    Args:
+        items: Lista de items a escribir (keys únicas)
+
+    Returns:
+        Lista de items que no se pudieron escribir tras agotar los reintentos
+    """
+    failed = []
+
+    for start in range(0, len(items), BATCH_WRITE_SIZE):
+        pending = [{'PutRequest': {'Item': item}}
+                   for item in items[start:start + BATCH_WRITE_SIZE]]
+        attempt = 0
+
+        while pending:
+            try:
+                response = dynamodb.batch_write_item(RequestItems={TABLE_NAME: pending})
+            except Exception as e:
+                print(f"Error en BatchWriteItem: {str(e)}")
+                failed.extend(request['PutRequest']['Item'] for request in pending)
+                break
+
+            pending = response.get('UnprocessedItems', {}).get(TABLE_NAME, [])
+            if not pending:
+                break
+
+            attempt += 1
+            if attempt > BATCH_WRITE_MAX_RETRIES:
+                print(f"{len(pending)} items sin procesar tras {BATCH_WRITE_MAX_RETRIES} reintentos")
+                failed.extend(request['PutRequest']['Item'] for request in pending)
+                break
+
+            delay = min(BATCH_WRITE_BACKOFF_CAP, BATCH_WRITE_BACKOFF_BASE * (2 ** attempt))
+            time.sleep(random.uniform(0, delay))
+
+    return failed
+
+
 def send_notification(tracking_id, location, status):
     """
     Envía notificación via SNS cuando se actualiza un tracking
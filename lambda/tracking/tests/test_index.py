@@ -0,0 +1,567 @@
+"""
+Tests unitarios para la función Lambda de Tracking
+Usan los servicios en memoria de benchmarks/fakes.py en lugar de AWS
+"""
+
+import json
+import pytest
+import sys
+import os
+
+# Configurar path para importar el módulo, los compartidos (lambda/common)
+# y los fakes de benchmarks/
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(1, os.path.join(ROOT, 'lambda', 'common'))
+sys.path.insert(2, os.path.join(ROOT, 'benchmarks'))
+
+# Mock de variables de entorno
+os.environ['TABLE_NAME'] = 'test-tracking'
+os.environ['ENVIRONMENT'] = 'test'
+os.environ['BLOOM_FILTER_ENABLED'] = 'false'
+os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+
+# Importar después de configurar env vars
+import index
+from bloom_filter import BloomFilter, save_filter
+from fakes import InMemoryDynamoDB, InMemoryS3, InMemorySNS
+
+
+@pytest.fixture(autouse=True)
+def fake_aws(monkeypatch):
+    """Tabla y topic en memoria, y caches del contenedor vacíos en cada test"""
+    db = InMemoryDynamoDB()
+    table = db.create_table('test-tracking', 'tracking_id', 'timestamp')
+    sns = InMemorySNS()
+
+    monkeypatch.setattr(index, 'dynamodb', db)
+    monkeypatch.setattr(index, 'table', table)
+    monkeypatch.setattr(index, 'sns', sns)
+    monkeypatch.setattr(index, 'SNS_TOPIC', 'arn:aws:sns:us-east-1:000000000000:test')
+    monkeypatch.setattr(index, 'NOTIFICATION_MODE', 'sync')
+    monkeypatch.setattr(index, 'tracking_cache', index.TTLCache(100, 5))
+    return db, table, sns
+
+
+def post(body):
+    """POST /tracking con el body dado"""
+    response = index.handler({
+        'requestContext': {'http': {'method': 'POST', 'path': '/tracking'}},
+        'body': json.dumps(body)
+    }, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def get(query_params):
+    """GET /tracking con los query parameters dados"""
+    response = index.handler({
+        'requestContext': {'http': {'method': 'GET', 'path': '/tracking'}},
+        'queryStringParameters': query_params
+    }, None)
+    return response['statusCode'], json.loads(response['body'])
+
+
+def snapshot(table, tracking_id):
+    """Snapshot del estado actual guardado en la tabla"""
+    return table.items.get((tracking_id, index.SNAPSHOT_TIMESTAMP))
+
+
+class TestBulkIngestion:
+    """Tests para POST /tracking con un array de eventos"""
+
+    def test_bulk_writes_events_and_snapshots(self, fake_aws):
+        """Test: Todos los eventos válidos se guardan y cada tracking queda con su último estado"""
+
+        _, table, _ = fake_aws
+        now = int(index.datetime.now().timestamp())
+        events = [
+            {'tracking_id': 'TRK-1', 'location': 'Callao', 'status': 'IN_TRANSIT', 'timestamp': now - 20},
+            {'tracking_id': 'TRK-1', 'location': 'Lima', 'status': 'OUT_FOR_DELIVERY', 'timestamp': now - 10},
+            {'tracking_id': 'TRK-2', 'location': 'Arequipa', 'timestamp': now - 5}
+        ]
+
+        status, body = post(events)
+
+        assert status == 201
+        assert body['summary'] == {'received': 3, 'written': 3, 'failed': 0, 'rejected': 0, 'superseded': 0}
+        assert [r['status'] for r in body['results']] == ['written'] * 3
+        assert ('TRK-1', now - 20) in table.items
+        assert snapshot(table, 'TRK-1')['status'] == 'OUT_FOR_DELIVERY'
+        assert snapshot(table, 'TRK-1')['last_update'] == now - 10
+        assert snapshot(table, 'TRK-2')['location'] == 'Arequipa'
+
+    def test_bulk_more_than_one_batch(self, fake_aws):
+        """Test: Más de 25 eventos se reparten en varios BatchWriteItem"""
+
+        db, table, _ = fake_aws
+        calls = []
+        write = db.batch_write_item
+        db.batch_write_item = lambda RequestItems: calls.append(len(RequestItems['test-tracking'])) or \
+            write(RequestItems=RequestItems)
+
+        now = int(index.datetime.now().timestamp())
+        events = [{'tracking_id': f'TRK-{n}', 'location': 'Lima', 'timestamp': now} for n in range(60)]
+
+        status, body = post({'events': events})
+
+        assert status == 201
+        assert calls == [25, 25, 10]
+        assert body['summary']['written'] == 60
+
+    def test_unprocessed_items_are_reported_as_failed(self, fake_aws, monkeypatch):
+        """Test: Los items que siguen en UnprocessedItems tras los reintentos quedan como failed (207)"""
+
+        db, table, sns = fake_aws
+        monkeypatch.setattr(index, 'BATCH_WRITE_MAX_RETRIES', 2)
+        monkeypatch.setattr(index, 'BATCH_WRITE_BACKOFF_BASE', 0)
+        write = db.batch_write_item
+        attempts = []
+
+        def throttled_write(RequestItems):
+            # TRK-THROTTLED nunca se procesa, el resto sí
+            requests = RequestItems['test-tracking']
+            attempts.append(len(requests))
+            throttled = [r for r in requests if r['PutRequest']['Item']['tracking_id'] == 'TRK-THROTTLED']
+            write(RequestItems={'test-tracking': [r for r in requests if r not in throttled]})
+            return {'UnprocessedItems': {'test-tracking': throttled} if throttled else {}}
+
+        db.batch_write_item = throttled_write
+
+        status, body = post({'events': [
+            {'tracking_id': 'TRK-OK', 'location': 'Lima'},
+            {'tracking_id': 'TRK-THROTTLED', 'location': 'Lima'}
+        ], 'notify': True})
+
+        assert status == 207
+        assert [r['status'] for r in body['results']] == ['written', 'failed']
+        assert body['summary']['failed'] == 1
+        assert attempts == [2, 1, 1]
+        # Sin snapshot ni notificación para el evento que no se guardó
+        assert snapshot(table, 'TRK-THROTTLED') is None
+        assert snapshot(table, 'TRK-OK') is not None
+        assert [m['Subject'] for m in sns.published] == ['Tracking TRK-OK - IN_TRANSIT']
+
+    def test_invalid_events_are_rejected_individually(self, fake_aws):
+        """Test: Un evento inválido se rechaza con su error sin afectar a los demás"""
+
+        _, table, _ = fake_aws
+
+        status, body = post([
+            {'tracking_id': 'TRK-1', 'location': 'Lima'},
+            {'tracking_id': 'TRK-2'},
+            'no es un objeto',
+            {'tracking_id': 'TRK-3', 'location': 'Lima', 'timestamp': 'ayer'}
+        ])
+
+        assert status == 207
+        assert [r['status'] for r in body['results']] == ['written', 'rejected', 'rejected', 'rejected']
+        assert body['results'][1]['error'] == 'location es requerido'
+        assert body['summary']['rejected'] == 3
+        assert snapshot(table, 'TRK-2') is None
+
+    def test_future_timestamp_is_rejected(self, fake_aws):
+        """Test: Un timestamp más allá del margen de reloj (o en milisegundos) se rechaza con 400 por item"""
+
+        _, table, _ = fake_aws
+        now = int(index.datetime.now().timestamp())
+
+        status, body = post([
+            {'tracking_id': 'TRK-1', 'location': 'Lima', 'timestamp': now + 60},
+            {'tracking_id': 'TRK-2', 'location': 'Lima', 'timestamp': now + index.MAX_CLOCK_SKEW_SECONDS + 60},
+            {'tracking_id': 'TRK-3', 'location': 'Lima', 'timestamp': now * 1000}
+        ])
+
+        assert status == 207
+        assert [r['status'] for r in body['results']] == ['written', 'rejected', 'rejected']
+        assert body['results'][1]['error'].startswith('timestamp en el futuro')
+        assert snapshot(table, 'TRK-2') is None
+        assert snapshot(table, 'TRK-3') is None
+
+    def test_duplicate_keys_keep_last_event(self, fake_aws):
+        """Test: Para (tracking_id, timestamp) repetidos se guarda el último evento"""
+
+        _, table, _ = fake_aws
+        now = int(index.datetime.now().timestamp())
+
+        status, body = post([
+            {'tracking_id': 'TRK-1', 'location': 'Callao', 'timestamp': now},
+            {'tracking_id': 'TRK-1', 'location': 'Lima', 'timestamp': now}
+        ])
+
+        assert status == 207
+        assert body['results'][0] == {'index': 0, 'tracking_id': 'TRK-1', 'status': 'superseded',
+                                      'superseded_by': 1}
+        assert table.items[('TRK-1', now)]['location'] == 'Lima'
+
+    def test_empty_and_oversized_requests(self, monkeypatch):
+        """Test: Un array vacío o con más de MAX_BULK_EVENTS eventos devuelve 400"""
+
+        monkeypatch.setattr(index, 'MAX_BULK_EVENTS', 2)
+
+        assert post([])[0] == 400
+        assert post([{'tracking_id': 'TRK-1', 'location': 'Lima'}] * 3)[0] == 400
+
+
+class TestSnapshot:
+    """Tests para el snapshot del estado actual y la consulta de varios IDs"""
+
+    def test_older_event_does_not_overwrite_snapshot(self, fake_aws):
+        """Test: Un escaneo que llega tarde queda en el historial pero no pisa el estado actual"""
+
+        _, table, _ = fake_aws
+        now = int(index.datetime.now().timestamp())
+        post([{'tracking_id': 'TRK-1', 'location': 'Lima', 'status': 'DELIVERED', 'timestamp': now}])
+
+        status, body = post([{'tracking_id': 'TRK-1', 'location': 'Callao', 'timestamp': now - 300}])
+
+        assert status == 201
+        assert ('TRK-1', now - 300) in table.items
+        assert snapshot(table, 'TRK-1')['status'] == 'DELIVERED'
+        assert snapshot(table, 'TRK-1')['last_update'] == now
+
+    def test_write_snapshot_reports_stale(self, fake_aws):
+        """Test: write_snapshot distingue un estado más reciente de un error"""
+
+        _, table, _ = fake_aws
+        newer = index.build_tracking_item({'tracking_id': 'TRK-1', 'location': 'Lima'}, 2000)
+        older = index.build_tracking_item({'tracking_id': 'TRK-1', 'location': 'Callao'}, 1000)
+
+        assert index.write_snapshot(newer) == 'written'
+        assert index.write_snapshot(older) == 'stale'
+        assert snapshot(table, 'TRK-1')['location'] == 'Lima'
+
+    def test_missing_optional_fields_keep_previous_values(self, fake_aws):
+        """Test: Los campos que no trae el evento conservan el valor del snapshot"""
+
+        _, table, _ = fake_aws
+        post({'tracking_id': 'TRK-1', 'package_id': 'PKG-1', 'location': 'Lima',
+              'notes': 'Frágil', 'estimated_delivery': '2024-12-25'})
+
+        post({'tracking_id': 'TRK-1', 'location': 'Miraflores', 'status': 'OUT_FOR_DELIVERY'})
+
+        state = snapshot(table, 'TRK-1')
+        assert state['location'] == 'Miraflores'
+        assert state['package_id'] == 'PKG-1'
+        assert state['notes'] == 'Frágil'
+        assert state['estimated_delivery'] == '2024-12-25'
+
+    def test_get_reads_snapshot_with_one_call(self, fake_aws):
+        """Test: GET /tracking es un solo GetItem, sin Query del historial"""
+
+        db, _, _ = fake_aws
+        post({'tracking_id': 'TRK-1', 'location': 'Lima', 'status': 'IN_TRANSIT'})
+        post({'tracking_id': 'TRK-1', 'location': 'Surco', 'status': 'OUT_FOR_DELIVERY'})
+        index.tracking_cache.invalidate('TRK-1')
+        calls = db.latency.calls
+
+        status, body = get({'tracking_id': 'TRK-1'})
+
+        assert status == 200
+        assert body['status'] == 'OUT_FOR_DELIVERY'
+        assert body['location'] == 'Surco'
+        assert db.latency.calls - calls == 1
+
+    def test_get_falls_back_to_latest_event_without_snapshot(self, fake_aws):
+        """Test: Un tracking anterior al snapshot se resuelve con el evento más reciente"""
+
+        _, table, _ = fake_aws
+        table.put_item(Item={'tracking_id': 'TRK-OLD', 'timestamp': 1000, 'location': 'Callao',
+                             'status': 'IN_TRANSIT'})
+        table.put_item(Item={'tracking_id': 'TRK-OLD', 'timestamp': 2000, 'location': 'Lima',
+                             'status': 'DELIVERED'})
+
+        status, body = get({'tracking_id': 'TRK-OLD'})
+
+        assert status == 200
+        assert body['status'] == 'DELIVERED'
+        assert body['last_update'] == 2000
+
+    def test_batch_lookup(self, fake_aws):
+        """Test: ?tracking_ids devuelve los encontrados en orden y lista los que no existen"""
+
+        post({'tracking_id': 'TRK-1', 'location': 'Lima'})
+        post({'tracking_id': 'TRK-2', 'location': 'Cusco'})
+
+        status, body = get({'tracking_ids': 'TRK-2, TRK-X,TRK-1,TRK-2,__meta'})
+
+        assert status == 200
+        assert [t['tracking_id'] for t in body['trackings']] == ['TRK-2', 'TRK-1']
+        assert body['not_found'] == ['TRK-X', '__meta']
+        assert body['count'] == 2
+
+    def test_batch_lookup_limit(self):
+        """Test: Más de MAX_TRACKING_IDS IDs devuelve 400"""
+
+        ids = ','.join(f'TRK-{n}' for n in range(index.MAX_TRACKING_IDS + 1))
+
+        assert get({'tracking_ids': ids})[0] == 400
+
+
+class TestNotificationMode:
+    """Tests para la publicación en SNS según NOTIFICATION_MODE"""
+
+    def test_sync_publishes_before_responding(self, fake_aws):
+        """Test: En modo sync el POST publica la notificación"""
+
+        _, _, sns = fake_aws
+
+        assert post({'tracking_id': 'TRK-1', 'location': 'Lima', 'status': 'DELIVERED'})[0] == 201
+        assert [m['Subject'] for m in sns.published] == ['Tracking TRK-1 - DELIVERED']
+
+    def test_deferred_only_persists(self, fake_aws, monkeypatch):
+        """Test: En modo deferred el POST no llama a SNS; el snapshot queda para el stream"""
+
+        _, table, sns = fake_aws
+        monkeypatch.setattr(index, 'NOTIFICATION_MODE', 'deferred')
+
+        assert post({'tracking_id': 'TRK-1', 'location': 'Lima', 'status': 'DELIVERED'})[0] == 201
+        assert post([{'tracking_id': 'TRK-2', 'location': 'Lima', 'notify': True}])[0] == 201
+        assert sns.published == []
+        assert 'notify' not in snapshot(table, 'TRK-1')
+
+    def test_notify_false_is_stored_for_the_stream(self, fake_aws, monkeypatch):
+        """Test: notify=false queda en el snapshot y se borra con el siguiente evento"""
+
+        _, table, _ = fake_aws
+        monkeypatch.setattr(index, 'NOTIFICATION_MODE', 'deferred')
+
+        post({'tracking_id': 'TRK-1', 'location': 'Lima', 'notify': False})
+        assert snapshot(table, 'TRK-1')['notify'] is False
+
+        post({'tracking_id': 'TRK-1', 'location': 'Surco'})
+        assert 'notify' not in snapshot(table, 'TRK-1')
+
+    def test_bulk_notifies_latest_event_only_when_requested(self, fake_aws):
+        """Test: El modo bulk no notifica por defecto, y con notify solo el último estado de cada paquete"""
+
+        _, _, sns = fake_aws
+        now = int(index.datetime.now().timestamp())
+        events = [
+            {'tracking_id': 'TRK-1', 'location': 'Callao', 'timestamp': now - 10},
+            {'tracking_id': 'TRK-1', 'location': 'Lima', 'status': 'OUT_FOR_DELIVERY', 'timestamp': now}
+        ]
+
+        post(events)
+        assert sns.published == []
+
+        post({'events': events, 'notify': True})
+        assert [m['Subject'] for m in sns.published] == ['Tracking TRK-1 - OUT_FOR_DELIVERY']
+
+
+class TestGpsCoalescing:
+    """Tests para el dead-band de los pings de solo posición (GPS_COALESCE_MODE)"""
+
+    @pytest.fixture(autouse=True)
+    def coalesce(self, monkeypatch):
+        monkeypatch.setattr(index, 'GPS_COALESCE_MODE', 'merge')
+        monkeypatch.setattr(index, 'gps_anchors', index.TTLCache(100, 60))
+
+    def history(self, table, tracking_id):
+        return [item for key, item in table.items.items()
+                if key[0] == tracking_id and key[1] != index.SNAPSHOT_TIMESTAMP]
+
+    def test_coalesced_ping_keeps_status_and_advances_last_update(self, fake_aws):
+        """Test: Un ping dentro del dead-band no cambia el status y sí avanza last_update"""
+
+        _, table, sns = fake_aws
+        post({'tracking_id': 'TRK-1', 'location': 'Lima', 'status': 'OUT_FOR_DELIVERY',
+              'latitude': -12.1, 'longitude': -77.03})
+        table.items[('TRK-1', index.SNAPSHOT_TIMESTAMP)]['last_update'] -= 10
+        previous = snapshot(table, 'TRK-1')['last_update']
+        published = len(sns.published)
+
+        status, body = post({'tracking_id': 'TRK-1', 'location': 'Lima',
+                             'latitude': -12.1001, 'longitude': -77.03})
+
+        state = snapshot(table, 'TRK-1')
+        assert status == 200
+        assert body['coalesced'] == 'merged'
+        assert body['status'] == 'OUT_FOR_DELIVERY'
+        assert state['status'] == 'OUT_FOR_DELIVERY'
+        assert state['last_update'] == body['timestamp'] > previous
+        assert state['latitude'] == index.Decimal('-12.1001')
+        assert state['notify'] is False
+        assert len(self.history(table, 'TRK-1')) == 1
+        assert len(sns.published) == published
+
+    def test_drop_mode_leaves_snapshot_untouched(self, fake_aws, monkeypatch):
+        """Test: En modo drop un ping dentro del dead-band no escribe nada"""
+
+        _, table, _ = fake_aws
+        monkeypatch.setattr(index, 'GPS_COALESCE_MODE', 'drop')
+        post({'tracking_id': 'TRK-1', 'location': 'Lima', 'latitude': -12.1, 'longitude': -77.03})
+        before = dict(snapshot(table, 'TRK-1'))
+
+        status, body = post({'tracking_id': 'TRK-1', 'location': 'Lima',
+                             'latitude': -12.1001, 'longitude': -77.03})
+
+        assert status == 200
+        assert body['coalesced'] == 'dropped'
+        assert snapshot(table, 'TRK-1') == before
+
+    def test_ping_outside_deadband_is_recorded_compact(self, fake_aws):
+        """Test: Un ping fuera del dead-band se guarda como evento compacto con el status anterior"""
+
+        _, table, _ = fake_aws
+        post({'tracking_id': 'TRK-1', 'location': 'Lima', 'status': 'OUT_FOR_DELIVERY',
+              'notes': 'Frágil', 'latitude': -12.1, 'longitude': -77.03})
+
+        status, body = post({'tracking_id': 'TRK-1', 'location': 'Surco',
+                             'latitude': -12.2, 'longitude': -77.03})
+
+        assert status == 201
+        assert body['status'] == 'OUT_FOR_DELIVERY'
+        event = table.items[('TRK-1', body['timestamp'])]
+        assert event['status'] == 'OUT_FOR_DELIVERY'
+        assert 'notes' not in event and 'environment' not in event
+        assert snapshot(table, 'TRK-1')['location'] == 'Surco'
+        assert snapshot(table, 'TRK-1')['notes'] == 'Frágil'
+
+    def test_status_change_is_never_coalesced(self, fake_aws):
+        """Test: Un ping con otro status se guarda aunque no se haya movido"""
+
+        _, table, _ = fake_aws
+        post({'tracking_id': 'TRK-1', 'location': 'Lima', 'latitude': -12.1, 'longitude': -77.03})
+
+        status, body = post({'tracking_id': 'TRK-1', 'location': 'Lima', 'status': 'DELIVERED',
+                             'latitude': -12.1, 'longitude': -77.03})
+
+        assert status == 201
+        assert snapshot(table, 'TRK-1')['status'] == 'DELIVERED'
+
+    def test_ping_without_anchor_keeps_stored_status(self, fake_aws):
+        """Test: Sin posición en memoria (otro contenedor) el ping conserva el status del snapshot"""
+
+        _, table, _ = fake_aws
+        post({'tracking_id': 'TRK-1', 'location': 'Lima', 'status': 'OUT_FOR_DELIVERY',
+              'latitude': -12.1, 'longitude': -77.03})
+        index.gps_anchors.invalidate('TRK-1')
+
+        status, body = post({'tracking_id': 'TRK-1', 'location': 'Lima',
+                             'latitude': -12.1001, 'longitude': -77.03})
+
+        assert status == 201
+        assert body['status'] == 'OUT_FOR_DELIVERY'
+        assert snapshot(table, 'TRK-1')['status'] == 'OUT_FOR_DELIVERY'
+        # La próxima posición se compara contra el status guardado
+        assert index.gps_anchors.get('TRK-1')['status'] == 'OUT_FOR_DELIVERY'
+
+    def test_mode_off_records_every_ping(self, fake_aws, monkeypatch):
+        """Test: Con GPS_COALESCE_MODE=off cada ping es un evento completo"""
+
+        _, table, _ = fake_aws
+        monkeypatch.setattr(index, 'GPS_COALESCE_MODE', 'off')
+        post({'tracking_id': 'TRK-1', 'location': 'Lima', 'latitude': -12.1, 'longitude': -77.03})
+        table.items[('TRK-1', index.SNAPSHOT_TIMESTAMP)]['last_update'] -= 10
+
+        status, body = post({'tracking_id': 'TRK-1', 'location': 'Lima',
+                             'latitude': -12.1001, 'longitude': -77.03})
+
+        assert status == 201
+        assert table.items[('TRK-1', body['timestamp'])]['environment'] == 'test'
+
+
+class TestKnownIdsFilter:
+    """Tests para el Bloom filter que evita el Query de respaldo"""
+
+    @pytest.fixture
+    def s3(self, monkeypatch):
+        s3 = InMemoryS3()
+        monkeypatch.setattr(index, 's3', s3)
+        monkeypatch.setattr(index, 'BLOOM_FILTER_ENABLED', True)
+        monkeypatch.setattr(index, 'BLOOM_FILTER_BUCKET', 'test-bloom')
+        monkeypatch.setattr(index, 'BLOOM_REFRESH_SECONDS', 0)
+        monkeypatch.setattr(index, '_known_ids', {'bloom': None, 'etag': None, 'loaded_at': None})
+        return s3
+
+    def save(self, s3, *tracking_ids):
+        bloom = BloomFilter.for_capacity(100)
+        for tracking_id in tracking_ids:
+            bloom.add(tracking_id)
+        save_filter(s3, 'test-bloom', bloom)
+        return bloom
+
+    def test_tracking_created_after_the_filter_is_found(self, fake_aws, s3):
+        """Test: Un negativo del filtro no oculta un tracking nuevo (siempre tiene snapshot)"""
+
+        self.save(s3, 'TRK-OLD')
+        post({'tracking_id': 'TRK-NEW', 'location': 'Lima'})
+        index.tracking_cache.invalidate('TRK-NEW')
+
+        assert get({'tracking_id': 'TRK-NEW'})[0] == 200
+        assert get({'tracking_ids': 'TRK-NEW'})[1]['count'] == 1
+
+    def test_negative_skips_fallback_query(self, fake_aws, s3):
+        """Test: Para un ID que no está en el filtro basta el GetItem del snapshot"""
+
+        db, _, _ = fake_aws
+        self.save(s3, 'TRK-OLD')
+        calls = db.latency.calls
+
+        assert get({'tracking_id': 'TRK-X'})[0] == 404
+        assert db.latency.calls - calls == 1
+
+    def test_legacy_tracking_uses_fallback_query(self, fake_aws, s3):
+        """Test: Un tracking del filtro sin snapshot se resuelve con el Query de respaldo"""
+
+        _, table, _ = fake_aws
+        self.save(s3, 'TRK-OLD')
+        table.put_item(Item={'tracking_id': 'TRK-OLD', 'timestamp': 1000, 'location': 'Callao',
+                             'status': 'IN_TRANSIT'})
+
+        assert get({'tracking_id': 'TRK-OLD'})[0] == 200
+
+    def test_unchanged_filter_is_not_downloaded_again(self, fake_aws, s3):
+        """Test: La recarga usa el ETag y con un 304 conserva la copia del contenedor"""
+
+        self.save(s3, 'TRK-OLD')
+        first = index.get_known_ids_filter()
+
+        assert index.get_known_ids_filter() is first
+        assert first.might_contain('TRK-OLD')
+
+    def test_without_filter_always_queries(self, fake_aws, s3):
+        """Test: Si el filtro todavía no se construyó se hace siempre el Query de respaldo"""
+
+        db, _, _ = fake_aws
+        calls = db.latency.calls
+
+        assert get({'tracking_id': 'TRK-X'})[0] == 404
+        assert db.latency.calls - calls == 2
+
+    def test_reserved_ids_are_not_trackings(self, fake_aws):
+        """Test: Los IDs reservados devuelven 404 sin leer la tabla y no se aceptan en un POST"""
+
+        db, _, _ = fake_aws
+        calls = db.latency.calls
+
+        assert get({'tracking_id': '__meta'})[0] == 404
+        assert db.latency.calls == calls
+        assert post({'tracking_id': '__meta', 'location': 'Lima'})[0] == 400
+
+
+class TestNotificationLanguage:
+    """Tests para el idioma de las notificaciones guardado en el snapshot"""
+
+    def test_language_persists_across_events(self, fake_aws):
+        """Test: El idioma se guarda en el snapshot y se conserva en los eventos que no lo traen"""
+
+        _, table, _ = fake_aws
+        post({'tracking_id': 'TRK-1', 'location': 'Lima', 'language': 'en'})
+        post({'tracking_id': 'TRK-1', 'location': 'Surco', 'status': 'OUT_FOR_DELIVERY'})
+
+        assert snapshot(table, 'TRK-1')['language'] == 'en'
+
+    def test_unsupported_language_is_rejected(self, fake_aws):
+        """Test: Un idioma sin plantilla devuelve 400"""
+
+        status, body = post({'tracking_id': 'TRK-1', 'location': 'Lima', 'language': 'fr'})
+
+        assert status == 400
+        assert body['error'] == 'language debe ser uno de: es, en'
+
+
+# Para ejecutar tests:
+# pytest tests/test_index.py -v
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,87 @@
+"""
+Reconstrucción offline del Bloom filter de tracking_ids
+Sistema de Tracking DINEX Perú
+
+Escanea la tabla de tracking (Scan paralelo por segmentos, solo la key) y
+sube el filtro a S3, donde lo lee la Lambda de tracking. Corre fuera de
+Lambda: el Scan completo no entra en el timeout de una función, y el filtro
+no se guarda en la tabla para no generar records en el DynamoDB Stream.
+
+Conviene correrlo una vez al desplegar el snapshot del estado actual y
+después de cambios masivos en la tabla (migraciones, restauraciones). Los
+trackings nuevos no hace falta agregarlos: siempre tienen snapshot.
+
+Uso:
+    python scripts/rebuild_bloom_filter.py --table dinex-tracking-dev --bucket <bucket>
+    python scripts/rebuild_bloom_filter.py --table dinex-tracking-dev --bucket <bucket> --segments 8
+"""
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambda', 'common'))
+
+from bloom_filter import DEFAULT_OBJECT_KEY, BloomFilter, is_reserved_id, save_filter  # noqa: E402
+
+
+def scan_segment(table_name, segment, total_segments):
+    """tracking_ids de un segmento del Scan paralelo (paginado)"""
+    import boto3
+
+    # Un recurso por hilo: los recursos de boto3 no son thread-safe
+    table = boto3.session.Session().resource('dynamodb').Table(table_name)
+    tracking_ids = set()
+    scan_kwargs = {'ProjectionExpression': 'tracking_id', 'Segment': segment,
+                   'TotalSegments': total_segments}
+    while True:
+        response = table.scan(**scan_kwargs)
+        tracking_ids.update(
+            item['tracking_id'] for item in response.get('Items', [])
+            if not is_reserved_id(item['tracking_id'])
+        )
+        if 'LastEvaluatedKey' not in response:
+            return tracking_ids
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reconstruye el Bloom filter de tracking_ids en S3')
+    parser.add_argument('--table', required=True, help='Tabla DynamoDB de tracking')
+    parser.add_argument('--bucket', required=True, help='Bucket S3 del filtro (BLOOM_FILTER_BUCKET)')
+    parser.add_argument('--key', default=DEFAULT_OBJECT_KEY, help='Key del objeto (BLOOM_FILTER_OBJECT)')
+    parser.add_argument('--capacity', type=int, default=100000,
+                        help='Capacidad mínima del filtro (se usa el doble de los IDs si es mayor)')
+    parser.add_argument('--false-positive-rate', type=float, default=0.01, help='FPR objetivo')
+    parser.add_argument('--segments', type=int, default=4, help='Segmentos del Scan paralelo')
+    args = parser.parse_args()
+
+    with ThreadPoolExecutor(max_workers=args.segments) as executor:
+        segments = executor.map(lambda segment: scan_segment(args.table, segment, args.segments),
+                                range(args.segments))
+        tracking_ids = set().union(*segments)
+
+    # Espacio para crecer hasta la próxima reconstrucción
+    bloom = BloomFilter.for_capacity(max(args.capacity, 2 * len(tracking_ids)), args.false_positive_rate)
+    for tracking_id in tracking_ids:
+        bloom.add(tracking_id)
+
+    import boto3
+    etag = save_filter(boto3.client('s3'), args.bucket, bloom, args.key)
+
+    print(json.dumps({
+        'message': 'Bloom filter reconstruido',
+        'location': f's3://{args.bucket}/{args.key}',
+        'etag': etag,
+        'tracking_ids': len(tracking_ids),
+        'num_bits': bloom.num_bits,
+        'num_hashes': bloom.num_hashes,
+        'size_bytes': len(bloom.to_bytes()),
+        'estimated_false_positive_rate': bloom.estimated_false_positive_rate()
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
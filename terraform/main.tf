@@ -84,6 +84,11 @@ resource "aws_dynamodb_table" "tracking" {
     projection_type = "ALL" # Incluye todos los atributos en el índice
   }
 
+  # DynamoDB Stream: Cada cambio en la tabla dispara la Lambda de notificaciones
+  # NEW_AND_OLD_IMAGES incluye el item antes y después del cambio
+  stream_enabled   = true
+  stream_view_type = "NEW_AND_OLD_IMAGES"
+
   # Time To Live: Elimina automáticamente registros antiguos
   # Ahorro de costos: No pago por almacenar datos innecesarios
   # Los registros se eliminan cuando expiry < current_time
@@ -110,6 +115,68 @@ resource "aws_dynamodb_table" "tracking" {
   }
 }
 
+# Registro de notificaciones ya enviadas: si Lambda reintenta un batch del
+# stream, las que ya salieron no se vuelven a publicar
+resource "aws_dynamodb_table" "notification_dedupe" {
+  name         = "${var.project}-notification-dedupe-${var.environment}"
+  billing_mode = "PAY_PER_REQUEST"
+
+  # SequenceNumber del record del stream que generó la notificación
+  hash_key = "dedupe_key"
+
+  attribute {
+    name = "dedupe_key"
+    type = "S"
+  }
+
+  # Los registros solo sirven mientras el stream puede reintentar (24 horas)
+  ttl {
+    attribute_name = "expiry"
+    enabled        = true
+  }
+
+  server_side_encryption {
+    enabled = true
+  }
+
+  tags = {
+    Name        = "${var.project}-notification-dedupe-table"
+    Description = "Notificaciones enviadas, para no repetirlas en reintentos"
+  }
+}
+
+# Bloom filter de tracking_ids con eventos: lo sube
+# scripts/rebuild_bloom_filter.py y lo lee la Lambda de tracking. Va en S3 y
+# no en la tabla para que sus reescrituras no consuman WCU ni generen records
+# en el stream
+resource "aws_s3_bucket" "bloom_filter" {
+  bucket = "${var.project}-bloom-filter-${var.environment}-${data.aws_caller_identity.current.account_id}"
+
+  tags = {
+    Name        = "${var.project}-bloom-filter-bucket"
+    Description = "Bloom filter de tracking_ids conocidos"
+  }
+}
+
+resource "aws_s3_bucket_public_access_block" "bloom_filter" {
+  bucket = aws_s3_bucket.bloom_filter.id
+
+  block_public_acls       = true
+  block_public_policy     = true
+  ignore_public_acls      = true
+  restrict_public_buckets = true
+}
+
+resource "aws_s3_bucket_server_side_encryption_configuration" "bloom_filter" {
+  bucket = aws_s3_bucket.bloom_filter.id
+
+  rule {
+    apply_server_side_encryption_by_default {
+      sse_algorithm = "AES256"
+    }
+  }
+}
+
 # ============================================================================
 # IAM ROLE - Rol para las funciones Lambda
 # ============================================================================
@@ -149,18 +216,38 @@ resource "aws_iam_role_policy" "lambda_policy" {
       {
         Effect = "Allow"
         Action = [
-          "dynamodb:GetItem",    # Leer un item específico
-          "dynamodb:PutItem",    # Crear/actualizar item
-          "dynamodb:Query",      # Buscar items por clave
-          "dynamodb:UpdateItem", # Actualizar item parcialmente
-          "dynamodb:Scan"        # Escanear tabla (usar con precaución)
+          "dynamodb:GetItem",        # Leer un item específico
+          "dynamodb:BatchGetItem",   # Consulta de varios trackings (?tracking_ids=)
+          "dynamodb:PutItem",        # Crear/actualizar item
+          "dynamodb:BatchWriteItem", # Ingesta masiva (POST /tracking con array)
+          "dynamodb:Query",          # Buscar items por clave
+          "dynamodb:UpdateItem",     # Actualizar item parcialmente
+          "dynamodb:Scan"            # Escanear tabla (usar con precaución)
         ]
         # Solo en esta tabla específica (principio de menor privilegio)
         Resource = [
           aws_dynamodb_table.tracking.arn,
-          "${aws_dynamodb_table.tracking.arn}/index/*" # Incluye GSI
+          "${aws_dynamodb_table.tracking.arn}/index/*", # Incluye GSI
+          aws_dynamodb_table.notification_dedupe.arn
         ]
       },
+      # Permisos para leer el DynamoDB Stream (Lambda de notificaciones)
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:DescribeStream",
+          "dynamodb:GetRecords",
+          "dynamodb:GetShardIterator",
+          "dynamodb:ListStreams"
+        ]
+        Resource = "${aws_dynamodb_table.tracking.arn}/stream/*"
+      },
+      # Lectura del Bloom filter (la Lambda no lo escribe)
+      {
+        Effect   = "Allow"
+        Action   = ["s3:GetObject"]
+        Resource = "${aws_s3_bucket.bloom_filter.arn}/*"
+      },
       # Permisos para CloudWatch Logs
       {
         Effect = "Allow"
@@ -222,9 +309,14 @@ resource "aws_lambda_function" "tracking" {
   # Se acceden con: os.environ['TABLE_NAME']
   environment {
     variables = {
-      TABLE_NAME  = aws_dynamodb_table.tracking.name
-      ENVIRONMENT = var.environment
-      SNS_TOPIC   = aws_sns_topic.notifications.arn
+      TABLE_NAME        = aws_dynamodb_table.tracking.name
+      ENVIRONMENT       = var.environment
+      SNS_TOPIC         = aws_sns_topic.notifications.arn
+      NOTIFICATION_MODE = var.notification_mode
+      GPS_COALESCE_MODE = var.gps_coalesce_mode
+      # Sin el objeto del filtro (antes de make bloom-filter) se hace
+      # siempre el Query de respaldo para trackings sin snapshot
+      BLOOM_FILTER_BUCKET = aws_s3_bucket.bloom_filter.id
     }
   }
 
@@ -266,9 +358,9 @@ resource "aws_cloudwatch_log_group" "tracking" {
 resource "aws_lambda_function" "notifications" {
   filename         = "${path.module}/../lambda/notifications/deployment.zip"
   function_name    = "${var.project}-notifications-${var.environment}"
-  role            = aws_iam_role.lambda_role.arn
-  handler         = "index.handler"
-  runtime         = "python3.11"
+  role             = aws_iam_role.lambda_role.arn
+  handler          = "index.handler"
+  runtime          = "python3.11"
   source_code_hash = filebase64sha256("${path.module}/../lambda/notifications/deployment.zip")
 
   # Menor timeout y memoria porque solo envía notificaciones
@@ -277,9 +369,13 @@ resource "aws_lambda_function" "notifications" {
 
   environment {
     variables = {
-      TABLE_NAME  = aws_dynamodb_table.tracking.name
-      SNS_TOPIC   = aws_sns_topic.notifications.arn
-      ENVIRONMENT = var.environment
+      TABLE_NAME                = aws_dynamodb_table.tracking.name
+      SNS_TOPIC                 = aws_sns_topic.notifications.arn
+      ENVIRONMENT               = var.environment
+      NOTIFICATION_DEDUPE_TABLE = aws_dynamodb_table.notification_dedupe.name
+      # En modo deferred las notificaciones salen del stream; en modo sync
+      # ya las envió la Lambda de tracking y los records se ignoran
+      NOTIFY_FROM_STREAM = var.notification_mode == "deferred" ? "true" : "false"
     }
   }
 
@@ -299,6 +395,17 @@ resource "aws_lambda_function" "notifications" {
   ]
 }
 
+# Conecta el DynamoDB Stream con la Lambda de notificaciones
+resource "aws_lambda_event_source_mapping" "tracking_stream" {
+  event_source_arn  = aws_dynamodb_table.tracking.stream_arn
+  function_name     = aws_lambda_function.notifications.arn
+  starting_position = "LATEST"
+
+  # Hasta 100 records por invocación (menos invocaciones en horas pico)
+  batch_size                         = 100
+  maximum_batching_window_in_seconds = 1
+}
+
 resource "aws_cloudwatch_log_group" "notifications" {
   name              = "/aws/lambda/${var.project}-notifications-${var.environment}"
   retention_in_days = var.environment == "prod" ? 30 : 7
@@ -47,6 +47,12 @@ output "dynamodb_table_arn" {
   value       = aws_dynamodb_table.tracking.arn
 }
 
+# Bucket del Bloom filter de tracking_ids (make bloom-filter)
+output "bloom_filter_bucket" {
+  description = "Bucket S3 donde se guarda el Bloom filter de tracking_ids"
+  value       = aws_s3_bucket.bloom_filter.id
+}
+
 # Nombre de la función Lambda de tracking
 output "lambda_tracking_function_name" {
   description = "Nombre de la función Lambda de tracking"
@@ -77,6 +77,30 @@ variable "alarm_error_threshold" {
   }
 }
 
+# Configuración de notificaciones
+
+variable "notification_mode" {
+  description = "sync: el POST /tracking publica en SNS antes de responder; deferred: publica la Lambda de notificaciones desde el DynamoDB Stream"
+  type        = string
+  default     = "deferred"
+
+  validation {
+    condition     = contains(["sync", "deferred"], var.notification_mode)
+    error_message = "El modo de notificación debe ser: sync o deferred"
+  }
+}
+
+variable "gps_coalesce_mode" {
+  description = "Pings GPS dentro del dead-band (misma posición y status que el último punto guardado por el mismo contenedor): off los guarda todos; drop los descarta; merge solo actualiza el snapshot"
+  type        = string
+  default     = "merge"
+
+  validation {
+    condition     = contains(["off", "drop", "merge"], var.gps_coalesce_mode)
+    error_message = "El modo de coalescing debe ser: off, drop o merge"
+  }
+}
+
 # Tags adicionales (opcional)
 
 variable "additional_tags" {